@@ -0,0 +1,70 @@
+"""
+Benchmark bytes transferred and stored per body policy
+
+BQ side body policies are emulated locally on synthetic bodies, transferred bytes are approximated by the UTF-8 size
+of the retrieved body columns.
+
+    python -m benchmarks.bench_body_policy --rows 100000 --max-chars 1024 4096
+"""
+import argparse
+import gzip
+import hashlib
+import re
+
+import pandas as pd
+
+from benchmarks.synthetic_events import make_events, sample_bodies
+
+
+def normalize(text: str) -> str:
+    """
+    Whitespace normalization done by event query
+    """
+    return re.sub(r'\s{2,}', ' ', re.sub(r'\r\n|\r|\n', ' ', text)).strip()
+
+
+def apply_body_policy(events: pd.DataFrame, bodies, policy: str, max_chars: int = 0) -> pd.DataFrame:
+    """
+    Emulate body column(s) retrieved from BQ for given body policy
+    """
+    events = events.drop(columns='body')
+    if policy == 'hash':
+        return events.assign(body_sha256=[hashlib.sha256(body.encode('utf-8')).hexdigest() for body in bodies],
+                             body_length=[len(body) for body in bodies])
+    if policy == 'truncate':
+        bodies = [body[:max_chars] for body in bodies]
+    return events.assign(body=[normalize(body) for body in bodies])
+
+
+def get_column_bytes(data_frame: pd.DataFrame, columns) -> int:
+    """
+    Get UTF-8 size of given columns
+    """
+    return sum(len(str(value).encode('utf-8')) for column in columns for value in data_frame[column])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark body policies')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--max-chars', type=int, nargs='+', default=[1024, 4096])
+    args = parser.parse_args()
+
+    events = make_events(args.rows, ['org/repo{n}'.format(n=n) for n in range(500)])
+    bodies = sample_bodies(args.rows)
+    policies = [('full', 0)] + [('truncate', n) for n in args.max_chars] + [('hash', 0)]
+
+    print('{:>14} {:>16} {:>14} {:>14} {:>10}'.format('policy', 'body bytes', 'csv bytes', 'csv.gz bytes', 'saved'))
+    full_csv_size = None
+    for policy, max_chars in policies:
+        data_frame = apply_body_policy(events, bodies, policy, max_chars)
+        body_columns = [column for column in data_frame.columns if column.startswith('body')]
+        csv = data_frame.to_csv(index=False).encode('utf-8')
+        full_csv_size = full_csv_size or len(csv)
+        name = '{p}({n})'.format(p=policy, n=max_chars) if max_chars else policy
+        print('{:>14} {:>16} {:>14} {:>14} {:>9.0%}'.format(
+            name, get_column_bytes(data_frame, body_columns), len(csv), len(gzip.compress(csv)),
+            1 - len(csv) / full_csv_size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark BigQueryDataCollector end to end on synthetic events, with BigQuery and S3 replaced by local stand-ins
+
+Times each stage of a collection (query building, fetch, date parsing, deduplication, concat, ecosystem tagging,
+compact dtypes, serialization, upload) and records peak memory. Results are written as JSON, so runs of different
+commits can be compared with --baseline.
+
+    python -m benchmarks.bench_collector --rows 1000000 --output bench.json
+    python -m benchmarks.bench_collector --rows 1000000 --baseline bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+import daiquiri
+import pandas as pd
+
+import src.bq_data_collector as bq_data_collector
+from benchmarks.fakes import FakeBigQueryHelper, StageTimer, local_s3
+from benchmarks.synthetic_events import make_events
+import src.utils.cloud_constants as cc
+from src.utils import bq_client_helper, event_processing, event_schema, output_writer, s3_upload
+
+daiquiri.setup(level=logging.WARNING)
+
+# Ecosystems synthetic repos are spread over
+ECOSYSTEMS = ['openshift', 'knative', 'kubevirt']
+
+
+def patch_stages(timer: StageTimer) -> None:
+    """
+    Time collector stages by patching the functions implementing them
+    """
+    collector = bq_data_collector.BigQueryDataCollector
+    timer.patch('query_building', collector, '_build_event_query')
+    timer.patch('fetch', FakeBigQueryHelper, 'query_to_pandas')
+    timer.patch('date_parsing', event_processing, 'parse_event_dates')
+    timer.patch('deduplication', event_processing, 'deduplicate_events')
+    timer.patch('concat', pd, 'concat')
+    timer.patch('ecosystem_tagging', bq_client_helper, 'tag_eco_system')
+    timer.patch('compact_dtypes', event_schema, 'apply_event_schema')
+    timer.patch('serialization', output_writer, 'write_data_frame')
+    timer.patch('upload', s3_upload, 'upload_file')
+
+
+def write_repo_list(path: str, repo_count: int):
+    """
+    Write repo-list.json with repo_count synthetic repos spread over ECOSYSTEMS, returns repo names
+    """
+    repo_names = ['org{o}/repo{n}'.format(o=n % 50, n=n) for n in range(repo_count)]
+    with open(path, 'w') as file:
+        json.dump([{'ecosystem': eco, 'urls': ['https://github.com/' + name for name in repo_names[i::len(ECOSYSTEMS)]]}
+                   for i, eco in enumerate(ECOSYSTEMS)], file)
+    return repo_names
+
+
+def run_collection(events: pd.DataFrame, repo_list_path: str, mode: str, args) -> dict:
+    """
+    Collect and upload events once with given mode, returns stage timings, peak memory and output size
+    """
+    fake_bq_client = FakeBigQueryHelper(events)
+    timer = StageTimer()
+    patch_stages(timer)
+    if args.tracemalloc:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    try:
+        with mock.patch.object(bq_client_helper, 'create_github_bq_client', return_value=fake_bq_client), \
+                local_s3(cc.AWS_S3_BUCKET_NAME):
+            collector = bq_data_collector.BigQueryDataCollector(
+                ecosystems=ECOSYSTEMS, repo_list_url=repo_list_path, days=args.days,
+                combined_query=mode == 'combined', concurrent_queries=mode == 'concurrent',
+                process_workers=args.process_workers, compact_dtypes=args.compact_dtypes)
+            data_frame = collector.get_github_data()
+            collector.upload_data_frame(data_frame, args.output_format)
+        wall_seconds = time.perf_counter() - start_time
+        peak_traced = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    finally:
+        tracemalloc.stop()
+        timer.restore()
+
+    return {'mode': mode,
+            'wall_seconds': round(wall_seconds, 4),
+            'stages': timer.summary(),
+            'queries': len(fake_bq_client.queries),
+            'rows_in': len(events),
+            'rows_out': len(data_frame),
+            'output_bytes': collector.metrics.to_dict()['stages']['upload']['bytes_written'],
+            'peak_traced_mb': round(peak_traced / 2 ** 20, 1) if peak_traced is not None else None,
+            # process wide high water mark, only grows between runs
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10, 1)}
+
+
+def get_commit() -> str:
+    """
+    Get current git commit, empty when not in a git checkout
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def print_results(results: dict, baseline: dict = None):
+    """
+    Print stage timings per run, compared with matching baseline run when given
+    """
+    baseline_runs = {(run['mode'], run['rows_in']): run for run in (baseline or {}).get('runs', [])}
+    for run in results['runs']:
+        base = baseline_runs.get((run['mode'], run['rows_in']))
+        print('\n{mode}: {rows_in} events -> {rows_out} rows, {wall_seconds:.2f}s, peak traced {peak_traced_mb} MB, '
+              'max RSS {max_rss_mb} MB, output {output_bytes} bytes'.format(**run))
+        print('{:>20} {:>10} {:>8} {:>10}'.format('stage', 'seconds', 'calls', 'vs base'))
+        stages = dict(run['stages'], total={'seconds': run['wall_seconds'], 'calls': 1})
+        for stage, timing in stages.items():
+            base_seconds = base and (base['stages'].get(stage, {}).get('seconds') if stage != 'total'
+                                     else base['wall_seconds'])
+            ratio = '{:.2f}x'.format(timing['seconds'] / base_seconds) if base_seconds else '-'
+            print('{:>20} {:>10.3f} {:>8} {:>10}'.format(stage, timing['seconds'], timing['calls'], ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark collector stages with local BigQuery and S3 stand-ins')
+    parser.add_argument('--rows', type=int, nargs='+', default=[200000], help='No of events matched by the queries')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.67,
+                        help='Share of events that are updates of an issue/PR seen before')
+    parser.add_argument('--body-median-chars', type=int, default=600,
+                        help='Median body length, body lengths are lognormal around it. 0 gives fixed 500 chars')
+    parser.add_argument('--repo-count', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--modes', type=str, nargs='+', default=['sequential', 'combined'],
+                        choices=['sequential', 'concurrent', 'combined'])
+    parser.add_argument('--process-workers', type=int, default=1)
+    parser.add_argument('--compact-dtypes', action='store_true')
+    parser.add_argument('-f', '--output-format', type=str, default='csv', choices=output_writer.OUTPUT_FORMATS)
+    parser.add_argument('--no-tracemalloc', dest='tracemalloc', action='store_false',
+                        help='Skip tracing allocations, which slows down the run, only max RSS is reported then')
+    parser.add_argument('--output', type=str, default='', help='Write results as JSON to given path')
+    parser.add_argument('--baseline', type=str, default='', help='Compare with results JSON of an earlier run')
+    args = parser.parse_args()
+
+    results = {'commit': get_commit(), 'python': platform.python_version(), 'pandas': pd.__version__,
+               'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}, 'runs': []}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        repo_list_path = os.path.join(tmp_dir, 'repo-list.json')
+        repo_names = write_repo_list(repo_list_path, args.repo_count)
+        for rows in args.rows:
+            events = make_events(rows, repo_names, updates_per_item=1 / max(1 - args.duplicate_ratio, 1e-3),
+                                 body_median_chars=args.body_median_chars)
+            for mode in args.modes:
+                results['runs'].append(run_collection(events, repo_list_path, mode, args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark ecosystem tagging of collected events
+
+Compares the previous row wise DataFrame.apply tagging against the vectorized index lookup.
+
+    python -m benchmarks.bench_eco_system_tagging --rows 10000 100000 1000000 5000000
+"""
+import argparse
+import logging
+import time
+
+import daiquiri
+import pandas as pd
+
+from benchmarks.synthetic_events import sample_repo_names
+from src.utils import bq_client_helper
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+
+def tag_row_wise(data_frame, repo_list):
+    """
+    Tagging as done before, a linear scan of every ecosystem repo list per row
+    """
+    def _update_eco_system(repo_name):
+        return ",".join({k: v for (k, v) in repo_list.items() if repo_name in v}.keys())
+
+    return data_frame.apply(lambda x: _update_eco_system(x['repo_name']), axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ecosystem tagging')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000, 5000000])
+    parser.add_argument('--repo-list', type=str, default='src/utils/data_assets/repo-list.json')
+    parser.add_argument('--max-row-wise-rows', type=int, default=100000,
+                        help='Skip row wise tagging above this many rows, it gets too slow')
+    args = parser.parse_args()
+
+    repo_list = bq_client_helper.get_eco_system_with_repo_list(args.repo_list)
+    repo_names = sorted({repo for repos in repo_list.values() for repo in repos})
+
+    start_time = time.perf_counter()
+    index = bq_client_helper.get_repo_eco_system_index(repo_list)
+    _logger.info('Built index of {n} repos in {s:.4f} seconds'.format(n=len(index), s=time.perf_counter() - start_time))
+
+    print('{:>10} {:>14} {:>14} {:>10}'.format('rows', 'row wise (s)', 'vectorized (s)', 'speedup'))
+    for rows in args.rows:
+        data_frame = pd.DataFrame({'repo_name': sample_repo_names(rows, repo_names)})
+
+        start_time = time.perf_counter()
+        vectorized = bq_client_helper.tag_eco_system(data_frame.repo_name, index)
+        vectorized_time = time.perf_counter() - start_time
+
+        row_wise_time = None
+        if rows <= args.max_row_wise_rows:
+            start_time = time.perf_counter()
+            row_wise = tag_row_wise(data_frame, repo_list)
+            row_wise_time = time.perf_counter() - start_time
+            assert row_wise.equals(vectorized), 'Tagging results differ'
+
+        print('{:>10} {:>14} {:>14.4f} {:>10}'.format(
+            rows, '-' if row_wise_time is None else '{:.4f}'.format(row_wise_time), vectorized_time,
+            '-' if row_wise_time is None else '{:.0f}x'.format(row_wise_time / vectorized_time)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark post processing (date parsing and deduplication) of collected events
+
+Compares processing all events in process against processing repo name shards in a process pool.
+
+    python -m benchmarks.bench_event_processing --rows 1000000 --workers 2 4
+"""
+import argparse
+import logging
+import time
+
+import daiquiri
+
+from benchmarks.synthetic_events import make_events
+from src.utils import bq_client_helper, event_processing
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark event post processing')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--repo-list', type=str, default='src/utils/data_assets/repo-list.json')
+    args = parser.parse_args()
+
+    repo_list = bq_client_helper.get_eco_system_with_repo_list(args.repo_list)
+    repo_names = sorted({repo for repos in repo_list.values() for repo in repos})
+
+    print('{:>10} {:>8} {:>12} {:>10}'.format('rows', 'workers', 'seconds', 'speedup'))
+    for rows in args.rows:
+        events = make_events(rows, repo_names)
+
+        start_time = time.perf_counter()
+        expected = event_processing.process_events(events.copy(), workers=1)
+        baseline = time.perf_counter() - start_time
+        print('{:>10} {:>8} {:>12.2f} {:>10}'.format(rows, 1, baseline, '-'))
+
+        for workers in args.workers:
+            start_time = time.perf_counter()
+            result = event_processing.process_events(events.copy(), workers=workers, min_rows=0)
+            seconds = time.perf_counter() - start_time
+            assert len(result) == len(expected) and result.url.equals(expected.url), 'Processing results differ'
+            print('{:>10} {:>8} {:>12.2f} {:>9.1f}x'.format(rows, workers, seconds, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
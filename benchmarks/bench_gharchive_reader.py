@@ -0,0 +1,52 @@
+"""
+Benchmark reading hourly GH archive files, in events scanned per second and per core
+
+Synthetic hourly files are written to a temporary directory and read in process and with process pools.
+
+    python -m benchmarks.bench_gharchive_reader --files 8 --events 100000 --workers 2 4
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic_events import make_gharchive_lines
+from src.utils import bq_client_helper, gharchive_reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GH archive reader')
+    parser.add_argument('--files', type=int, default=8, help='No of hourly files')
+    parser.add_argument('--events', type=int, default=100000, help='No of events per hourly file')
+    parser.add_argument('--tracked-ratio', type=float, default=0.05,
+                        help='Share of events which are issue/PR events of tracked repos')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--repo-list', type=str, default='src/utils/data_assets/repo-list.json')
+    args = parser.parse_args()
+
+    repo_list = bq_client_helper.get_eco_system_with_repo_list(args.repo_list)
+    repo_names = sorted({repo for repos in repo_list.values() for repo in repos})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        lines = make_gharchive_lines(args.events, repo_names, args.tracked_ratio)
+        days = ['20200301']
+        paths = gharchive_reader.get_hour_file_paths(tmp_dir, days)[:args.files]
+        for path in paths:
+            with gzip.open(path, 'wb') as file:
+                file.write(b'\n'.join(lines) + b'\n')
+        mb = sum(os.path.getsize(path) for path in paths) / 2 ** 20
+        print('{n} files, {e} events, {mb:.1f} MB compressed'.format(n=len(paths), e=len(paths) * args.events, mb=mb))
+
+        print('{:>8} {:>10} {:>10} {:>14} {:>16}'.format('workers', 'seconds', 'rows', 'events/sec', 'events/sec/core'))
+        for workers in [1] + args.workers:
+            start_time = time.perf_counter()
+            rows = sum(len(df) for df in gharchive_reader.read_events(paths, set(repo_names),
+                                                                      ['IssuesEvent', 'PullRequestEvent'], workers))
+            seconds = time.perf_counter() - start_time
+            rate = len(paths) * args.events / seconds
+            print('{:>8} {:>10.2f} {:>10} {:>14.0f} {:>16.0f}'.format(workers, seconds, rows, rate,
+                                                                      rate / min(workers, os.cpu_count() or 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark upload throughput of s3_upload.upload_file against an in process moto S3
+
+Uploads random files of given sizes once through fsspec (s3fs, a single stream as the collector used to) and then
+with parallel multipart uploads of each given concurrency. moto runs in the same process, so throughput without
+--latency-ms mostly reflects checksumming and request handling; --latency-ms delays every request to approximate the
+round trip to a remote object store, which is where concurrent parts pay off.
+
+    python -m benchmarks.bench_s3_upload --mb 64 256 --part-size-mb 8 --concurrency 1 4 8 --latency-ms 50
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import daiquiri
+import fsspec
+
+from benchmarks.fakes import local_s3
+from src.utils import s3_upload
+
+daiquiri.setup(level=logging.WARNING)
+
+BUCKET = 'bench-upload'
+
+
+def upload_fsspec(path: str, url: str) -> None:
+    with open(path, 'rb') as src_file, fsspec.open(url, 'wb') as dst_file:
+        while True:
+            block = src_file.read(2 ** 20)
+            if not block:
+                return
+            dst_file.write(block)
+
+
+def run_upload(path: str, url: str, concurrency: int, args) -> dict:
+    """
+    Upload file once, with fsspec when concurrency is 0. Returns wall time and throughput
+    """
+    start_time = time.perf_counter()
+    if concurrency:
+        parts = s3_upload.upload_file(path, url, args.part_size_mb * 2 ** 20, concurrency)['parts']
+    else:
+        upload_fsspec(path, url)
+        parts = None
+    seconds = time.perf_counter() - start_time
+    size_mb = os.path.getsize(path) / 2 ** 20
+    return {'mode': 'multipart' if concurrency else 'fsspec', 'concurrency': concurrency, 'mb': round(size_mb, 1),
+            'parts': parts, 'seconds': round(seconds, 3), 'mb_per_second': round(size_mb / seconds, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multipart upload throughput with a local S3 stand-in')
+    parser.add_argument('--mb', type=int, nargs='+', default=[64], help='Sizes of uploaded files in MB')
+    parser.add_argument('--part-size-mb', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay of every S3 request')
+    parser.add_argument('--no-fsspec', dest='fsspec', action='store_false', help='Skip single stream fsspec upload')
+    parser.add_argument('--output', type=str, default='', help='Write results as JSON to given path')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir, local_s3(BUCKET, args.latency_ms):
+        for size_mb in args.mb:
+            path = os.path.join(tmp_dir, 'upload-{mb}.bin'.format(mb=size_mb))
+            with open(path, 'wb') as file:
+                for _ in range(size_mb):
+                    file.write(os.urandom(2 ** 20))
+            for concurrency in ([0] if args.fsspec else []) + args.concurrency:
+                url = 's3://{bucket}/upload-{mb}-{c}.bin'.format(bucket=BUCKET, mb=size_mb, c=concurrency)
+                results.append(run_upload(path, url, concurrency, args))
+                print('{mode:>10} x{concurrency:<3} {mb:>8} MB {parts!s:>6} parts {seconds:>8.2f}s '
+                      '{mb_per_second:>8.1f} MB/s'.format(**results[-1]))
+            os.remove(path)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'params': vars(args), 'runs': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
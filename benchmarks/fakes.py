@@ -0,0 +1,141 @@
+"""
+Local stand-ins for BigQuery and S3 used by benchmarks, so the collector runs end to end without network access
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict
+
+import pandas as pd
+
+# Event types retrieved by the collector
+EVENT_TYPES = ['IssuesEvent', 'PullRequestEvent']
+
+
+class FakeBigQueryHelper:
+    """
+    Serves pre generated events instead of querying githubarchive, mimicking the parts of BigQueryHelper used by
+    the collector
+
+    Event queries get the events of the event type(s) in the query, the estimate query gets the no of events per
+    event type. Query texts are recorded in queries.
+    """
+
+    def __init__(self, events: pd.DataFrame, gb_per_million_rows: float = 50.0):
+        self.events = events
+        self.gb_per_million_rows = gb_per_million_rows
+        self.queries = []
+        self.max_wait_seconds = 0
+        self._lock = threading.Lock()
+
+    def _get_event_types(self, query: str):
+        return [event_type for event_type in EVENT_TYPES if "'{t}'".format(t=event_type) in query]
+
+    def _get_rows(self, query: str) -> int:
+        return int(self.events.event_type.isin(self._get_event_types(query)).sum())
+
+    def estimate_query_size(self, query: str) -> float:
+        """
+        Estimate query size in GB from the no of events it matches
+        """
+        return self._get_rows(query) / 1e6 * self.gb_per_million_rows
+
+    def query_to_pandas(self, query: str) -> pd.DataFrame:
+        """
+        Get copy of the events matched by query, like a result transferred from BQ
+        """
+        with self._lock:
+            self.queries.append(query)
+        event_types = self._get_event_types(query)
+        if re.search(r'GROUP BY\s+type', query):
+            frequency = self.events[self.events.event_type.isin(event_types)].groupby('event_type').size()
+            return pd.DataFrame({'EventType': frequency.index, 'Freq': frequency.values})
+        return self.events[self.events.event_type.isin(event_types)].reset_index(drop=True).copy()
+
+
+@contextmanager
+def local_s3(bucket: str, request_latency_ms: float = 0):
+    """
+    Serve S3 requests of boto3 (and s3fs) from an in process moto S3 with given bucket created, yields S3 client
+
+    Every request is delayed by request_latency_ms, as a rough stand-in for the round trip to a remote object store.
+    """
+    import boto3
+    from botocore.handlers import BUILTIN_HANDLERS
+    try:
+        from moto import mock_aws
+    except ImportError:
+        # moto < 5, as pinned in test-requirements.txt
+        from moto import mock_s3 as mock_aws
+
+    # handlers of sessions created from now on, run before moto responds to the request
+    handler = ('before-send.s3', lambda **_: time.sleep(request_latency_ms / 1e3))
+    if request_latency_ms:
+        BUILTIN_HANDLERS.append(handler)
+    try:
+        with mock_aws():
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket=bucket)
+            yield client
+    finally:
+        if handler in BUILTIN_HANDLERS:
+            BUILTIN_HANDLERS.remove(handler)
+
+
+class StageTimer:
+    """
+    Times calls to functions patched into stages, nested stages are excluded from the time of the enclosing stage
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def wrap(self, stage: str, func):
+        """
+        Wrap func so its calls are timed as given stage
+        """
+        @wraps(func)
+        def _timed(*args, **kwargs):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.seconds[stage] += elapsed - nested
+                    self.calls[stage] += 1
+        return _timed
+
+    def patch(self, stage: str, owner, name: str):
+        """
+        Replace owner.name (module function or method) with a timed wrapper until restore is called
+        """
+        original = owner.__dict__[name]
+        func = original.__func__ if isinstance(original, staticmethod) else original
+        timed = self.wrap(stage, func)
+        setattr(owner, name, staticmethod(timed) if isinstance(original, staticmethod) else timed)
+        self._patches.append((owner, name, original))
+
+    def restore(self):
+        """
+        Put back all patched functions
+        """
+        while self._patches:
+            owner, name, original = self._patches.pop()
+            setattr(owner, name, original)
+
+    def summary(self) -> Dict[str, Dict]:
+        return {stage: {'seconds': round(self.seconds[stage], 4), 'calls': self.calls[stage]}
+                for stage in self.seconds}
@@ -0,0 +1,99 @@
+"""
+Synthetic GitHub event generator used by benchmarks
+"""
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+def sample_repo_names(rows: int, repo_names: List[str], seed: int = 0) -> pd.Series:
+    """
+    Sample repo names for given no of rows, busy repos show up more often (zipf like distribution)
+    """
+    rng = np.random.RandomState(seed)
+    weights = 1.0 / np.arange(1, len(repo_names) + 1)
+    choices = rng.choice(len(repo_names), size=rows, p=weights / weights.sum())
+    return pd.Series(np.asarray(repo_names, dtype=object)[choices], name='repo_name')
+
+
+def make_events(rows: int, repo_names: List[str], updates_per_item: float = 3.0, body_length: int = 500,
+                seed: int = 0, body_median_chars: int = 0) -> pd.DataFrame:
+    """
+    Make events as retrieved from BQ (dates as strings), every issue/PR gets updates_per_item events on average
+
+    All bodies are body_length chars long, unless body_median_chars is set, then body lengths are lognormal around it
+    (see sample_bodies).
+    """
+    rng = np.random.RandomState(seed)
+    repos = sample_repo_names(rows, repo_names, seed).values
+    numbers = rng.randint(1, max(2, int(rows / updates_per_item / max(len(repo_names), 1)) * 2), size=rows)
+    event_types = np.where(rng.rand(rows) < 0.5, 'IssuesEvent', 'PullRequestEvent')
+    kinds = np.where(event_types == 'IssuesEvent', 'issues', 'pull')
+    created = pd.Timestamp('2020-01-01', tz='UTC') + pd.to_timedelta(rng.randint(0, 60 * 86400, rows), unit='s')
+    updated = created + pd.to_timedelta(rng.randint(0, 30 * 86400, rows), unit='s')
+    words = np.array(['fix', 'error', 'when', 'running', 'tests', 'on', 'cluster', 'update', 'docs', 'crash'])
+    body = ' '.join(words[rng.randint(0, len(words), body_length // 5)])
+    urls = pd.Series(['https://github.com/'] * rows) + repos + '/' + kinds + '/' + numbers.astype(str)
+    return pd.DataFrame({
+        'repo_name': repos,
+        'event_type': event_types,
+        'status': np.where(rng.rand(rows) < 0.7, 'opened', 'closed'),
+        'id': rng.randint(1, 10 ** 9, rows).astype(str),
+        'number': numbers.astype(str),
+        'url': urls.values,
+        'creator_name': np.array(['user{n}'.format(n=n) for n in range(100)])[rng.randint(0, 100, rows)],
+        'created_at': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'updated_at': updated.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'closed_at': np.where(rng.rand(rows) < 0.3, updated.strftime('%Y-%m-%dT%H:%M:%SZ'), None),
+        'title': np.array(['Issue title {n}'.format(n=n) for n in range(1000)])[rng.randint(0, 1000, rows)],
+        'body': sample_bodies(rows, body_median_chars, seed) if body_median_chars else [body] * rows,
+    })
+
+
+def sample_bodies(rows: int, median_chars: int = 600, seed: int = 0) -> List[str]:
+    """
+    Sample issue/PR bodies with lognormal lengths (a few very long ones, e.g. pasted logs) containing line breaks and
+    repeated spaces, as found in GH archive payloads
+    """
+    rng = np.random.RandomState(seed)
+    text = ' '.join(np.array(['fix', 'error', 'when', 'running', 'tests', 'on', 'cluster', 'update', 'docs', 'crash',
+                              '\r\n', '\n\n', '   ', 'panic:', 'goroutine', '```'])[rng.randint(0, 16, 40000)])
+    lengths = np.minimum(rng.lognormal(np.log(median_chars), 1.2, rows).astype(int), len(text))
+    offsets = rng.randint(0, len(text) - lengths + 1)
+    return [text[offset:offset + length] for offset, length in zip(offsets, lengths)]
+
+
+def make_gharchive_lines(events: int, repo_names: List[str], tracked_ratio: float = 0.05, body_length: int = 500,
+                         seed: int = 0) -> List[bytes]:
+    """
+    Make GH archive JSON lines, tracked_ratio of them are issue/PR events of given repos, the rest are other event
+    types (push, watch, comment) of other repos, as found in an hourly file
+    """
+    rng = np.random.RandomState(seed)
+    body = ' '.join(np.array(['fix', 'error', 'when', 'running', 'tests'])[rng.randint(0, 5, body_length // 5)])
+    lines = []
+    for n in range(events):
+        if rng.rand() < tracked_ratio:
+            repo = repo_names[rng.randint(len(repo_names))]
+            event_type = 'IssuesEvent' if rng.rand() < 0.5 else 'PullRequestEvent'
+        else:
+            repo = 'other{o}/repo{n}'.format(o=n % 1000, n=rng.randint(100000))
+            event_type = ['PushEvent', 'WatchEvent', 'IssueCommentEvent', 'CreateEvent'][rng.randint(4)]
+        is_issue = event_type in ('IssuesEvent', 'IssueCommentEvent')
+        field, kind = ('issue', 'issues') if is_issue else ('pull_request', 'pull')
+        number = int(rng.randint(1, 5000))
+        item = {'url': 'https://api.github.com/repos/{r}/{k}/{n}'.format(r=repo, k=kind, n=number),
+                'html_url': 'https://github.com/{r}/{k}/{n}'.format(r=repo, k=kind, n=number),
+                'id': n, 'number': number, 'title': 'Issue title {n}'.format(n=number),
+                'user': {'login': 'user{n}'.format(n=n % 100), 'html_url': 'https://github.com/user'},
+                'created_at': '2020-03-01T00:00:00Z', 'updated_at': '2020-03-01T00:10:00Z', 'closed_at': None,
+                'body': body}
+        payload = {'action': 'opened', field: item} if event_type != 'PushEvent' else \
+            {'push_id': n, 'commits': [{'message': body}]}
+        lines.append(json.dumps({'id': str(n), 'type': event_type, 'actor': {'id': n, 'login': 'user'},
+                                 'repo': {'id': n, 'name': repo, 'url': 'https://api.github.com/repos/' + repo},
+                                 'payload': payload, 'public': True, 'created_at': '2020-03-01T00:00:00Z'},
+                                separators=(',', ':')).encode('utf-8'))
+    return lines
@@ -1,12 +1,18 @@
 import argparse
 import logging
+import sys
 import textwrap
 import warnings
 
+import arrow
 import daiquiri
 
 import src.utils.cloud_constants as cc
 from src.bq_data_collector import BigQueryDataCollector
+from src.utils import backfill, output_writer, sharding
+from src.utils.run_metrics import RunMetrics
+from src.utils.bq_client_helper import BODY_POLICIES
+from src.utils.output_writer import OUTPUT_FORMATS
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=Warning)
@@ -29,24 +35,256 @@ def main():
                         choices=["openshift", "knative", "kubevirt"], help="The ecosystems to monitor")
     parser.add_argument('-d', '--days-since-yday', type=int, default=7,
                         help='The number of days data to retrieve from GitHub including yesterday')
+    parser.add_argument('-c', '--partition-cache-dir', type=str, default=cc.PARTITION_CACHE_DIR,
+                        help='Collect incrementally, caching per day results in given directory or object store url '
+                             '(s3://...) and querying BigQuery only for missing or stale days')
+    parser.add_argument('--concurrent-queries', action='store_true', default=cc.CONCURRENT_QUERIES,
+                        help='Run estimate, issues and pull requests queries concurrently')
+    parser.add_argument('--combined-query', action='store_true', default=cc.COMBINED_QUERY,
+                        help='Retrieve issues and pull requests with a single scan and derive estimate from it')
+    parser.add_argument('--page-size', type=int, default=cc.PAGE_SIZE,
+                        help='Read query result in pages of given no of rows, deduplicating as pages arrive, '
+                             'to bound memory for large windows. 0 reads the whole result at once')
+    parser.add_argument('--server-dedup', action='store_true', default=cc.SERVER_DEDUP,
+                        help='Deduplicate issues/PRs on BigQuery side, transferring only last updated record per url')
+    parser.add_argument('--parameterized-query', action='store_true', default=cc.PARAMETERIZED_QUERY,
+                        help='Pass days and repo names as BigQuery query parameters, keeping query text stable')
+    parser.add_argument('--result-cache-dir', type=str, default=cc.RESULT_CACHE_DIR,
+                        help='Cache query results in given directory or object store url, so reruns of the same window '
+                             'are not billed')
+    parser.add_argument('--max-gb-per-query', type=float, default=cc.MAX_GB_PER_QUERY,
+                        help='Split window into per week/day sub queries when query cost exceeds given GB')
+    parser.add_argument('--max-gb-per-run', type=float, default=cc.MAX_GB_PER_RUN,
+                        help='Fail before running any query when estimated cost of the run exceeds given GB')
+    parser.add_argument('--max-parallel-queries', type=int, default=cc.MAX_PARALLEL_QUERIES,
+                        help='Max no of sub queries run in parallel when window is split')
+    parser.add_argument('--process-workers', type=int, default=cc.PROCESS_WORKERS,
+                        help='Parse and deduplicate events in given no of processes, sharded by repo name. '
+                             'Pays off for large (multi week) windows, set it up to the CPU limit')
+    parser.add_argument('--compact-dtypes', action='store_true', default=cc.COMPACT_DTYPES,
+                        help='Keep collected data in compact dtypes (categoricals, nullable integers, datetimes) '
+                             'and report memory per row')
+    parser.add_argument('--body-policy', type=str, default=cc.BODY_POLICY, choices=BODY_POLICIES,
+                        help='Retrieve issue/PR body as is, truncated to --body-max-chars or as SHA256 hash and length')
+    parser.add_argument('--body-max-chars', type=int, default=cc.BODY_MAX_CHARS,
+                        help='Max no of body chars retrieved with truncate body policy')
+    parser.add_argument('--start', type=str, default='',
+                        help='Backfill from given day (YYYYMMDD) instead of collecting last N days')
+    parser.add_argument('--end', type=str, default='',
+                        help='Last day (YYYYMMDD) of backfill, defaults to yesterday')
+    parser.add_argument('--unit', type=str, default=cc.BACKFILL_UNIT, choices=backfill.BACKFILL_UNITS,
+                        help='Split backfill into units of a day or a week, each written as its own output object')
+    parser.add_argument('--max-parallel-units', type=int, default=cc.MAX_PARALLEL_UNITS,
+                        help='Max no of backfill units collected in parallel')
+    parser.add_argument('--manifest', type=str, default=cc.BACKFILL_MANIFEST,
+                        help='Checkpoint manifest of completed backfill units, reruns skip units found in it')
+    parser.add_argument('--gharchive-dir', type=str, default=cc.GHARCHIVE_DIR,
+                        help='Read events from hourly GH archive files in given directory or mirror url instead of '
+                             'BigQuery')
+    parser.add_argument('--gharchive-max-missing-hours', type=int, default=cc.GHARCHIVE_MAX_MISSING_HOURS,
+                        help='Fail when more than given no of hourly GH archive files (or all of them) are missing')
+    parser.add_argument('--shard-index', type=int, default=cc.SHARD_INDEX,
+                        help='Shard of repo list collected, defaults to JOB_COMPLETION_INDEX of indexed jobs')
+    parser.add_argument('--shard-count', type=int, default=cc.SHARD_COUNT,
+                        help='Partition repo list into given no of shards, each written as its own output')
+    parser.add_argument('--merge-shards', action='store_true', default=cc.MERGE_SHARDS,
+                        help='Merge outputs of --shard-count shards once all of them are written, instead of '
+                             'collecting')
+    parser.add_argument('--merge-timeout-minutes', type=float, default=cc.MERGE_TIMEOUT_MINUTES,
+                        help='Fail merge when shard outputs are still missing after given minutes')
+    parser.add_argument('--run-id', type=str, default=cc.RUN_ID,
+                        help='Id of the sharded run, shard outputs are named after it and only outputs of the same '
+                             'run are merged. Required with --shard-count above 1')
+    parser.add_argument('--window-end', type=str, default=cc.WINDOW_END,
+                        help='Last day (YYYYMMDD) of the last N days window, defaults to yesterday')
+    parser.add_argument('--delta', action='store_true', default=cc.DELTA_OUTPUT,
+                        help='Upload only issues/PRs new or changed since last export, along with a manifest')
+    parser.add_argument('--delta-snapshot-every', type=int, default=cc.DELTA_SNAPSHOT_EVERY,
+                        help='Write a compacted snapshot after every given no of deltas, 0 disables snapshots')
+    parser.add_argument('--delta-retention-days', type=int, default=cc.DELTA_RETENTION_DAYS,
+                        help='Forget exported issues/PRs last updated given no of days before the window')
+    parser.add_argument('--upload-part-size-mb', type=int, default=cc.UPLOAD_PART_SIZE_MB,
+                        help='Upload output in parts of given size (at least 5 MB), smaller outputs in one request')
+    parser.add_argument('--upload-concurrency', type=int, default=cc.UPLOAD_CONCURRENCY,
+                        help='No of parts uploaded in parallel')
+    parser.add_argument('--upload-max-retries', type=int, default=cc.UPLOAD_MAX_RETRIES,
+                        help='Retry failed upload requests up to given no of times with exponential backoff')
+    parser.add_argument('--run-report', type=str, default=cc.RUN_REPORT,
+                        help='Write JSON report of wall time, rows, bytes and peak RSS per stage to given path/url')
+    parser.add_argument('--metrics-textfile', type=str, default=cc.METRICS_TEXTFILE,
+                        help='Write run report in Prometheus text format to given path (node exporter textfile)')
+    parser.add_argument('--pushgateway-url', type=str, default=cc.PUSHGATEWAY_URL,
+                        help='Push run report to given Prometheus pushgateway')
+    parser.add_argument('--profile', type=str, default=cc.PROFILE_DIR,
+                        help='Write cProfile and tracemalloc snapshots of hot stages to given directory')
+    parser.add_argument('-f', '--output-format', type=str, default=cc.OUTPUT_FORMAT, choices=OUTPUT_FORMATS,
+                        help='Format of the output uploaded to object store')
 
     args = parser.parse_args()
+    if args.delta and (args.start or args.shard_count > 1):
+        parser.error('--delta can not be used with --start or --shard-count, deltas are computed for whole windows')
+    if args.shard_count > 1 and not args.run_id:
+        parser.error('--run-id is required with --shard-count, so outputs of earlier runs are not merged')
+    metrics = RunMetrics(profile_dir=args.profile)
 
-    bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
-                                              ecosystems=args.ecosystems, repo_list_url=cc.REPO_LIST,
-                                              days=args.days_since_yday)
+    success = False
+    try:
+        if args.merge_shards:
+            exit_code = run_merge_shards(args)
+        elif args.start:
+            exit_code = run_backfill(args, metrics)
+        else:
+            bq_data_collector = _create_data_collector(args, metrics)
+            data_frame = _collect_github_data(bq_data_collector, args)
+            if args.delta:
+                bq_data_collector.upload_delta(data_frame, args.output_format, args.delta_snapshot_every,
+                                               args.delta_retention_days)
+            elif args.shard_count > 1:
+                # every shard writes its output, even when empty, and fails the pod when upload fails
+                bq_data_collector.upload_data_frame(data_frame, args.output_format)
+            else:
+                bq_data_collector.save_data_to_object_store(data_frame, args.days_since_yday, args.output_format)
+            exit_code = 0
+        success = exit_code == 0
+    finally:
+        write_run_report(metrics, args, success)
+    sys.exit(exit_code)
+
+
+def write_run_report(metrics, args, success):
+    """
+    Log stage summary and write run report to configured outputs, failing to write a report doesn't fail the run
+    """
+    metrics.log_summary()
+    if args.profile:
+        metrics.write_profiles()
+    outputs = [(args.run_report, metrics.write_json), (args.metrics_textfile, metrics.write_prometheus_textfile),
+               (args.pushgateway_url, metrics.push_to_gateway)]
+    for target, write in outputs:
+        if target:
+            try:
+                write(target, success=success)
+            except Exception as ex:
+                _logger.warning('Could not write run report to {target}. Msg: {msg}'.format(target=target, msg=ex))
+
+
+def _create_data_collector(args, metrics=None, start_date='', end_date=''):
+    """
+    Create data collector for last N days, or for given date range when set
+    """
+    return BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                 ecosystems=args.ecosystems, repo_list_url=cc.REPO_LIST,
+                                 days=args.days_since_yday,
+                                 partition_cache_dir=args.partition_cache_dir,
+                                 concurrent_queries=args.concurrent_queries,
+                                 combined_query=args.combined_query,
+                                 page_size=args.page_size,
+                                 server_dedup=args.server_dedup,
+                                 parameterized_query=args.parameterized_query,
+                                 result_cache_dir=args.result_cache_dir,
+                                 max_gb_per_query=args.max_gb_per_query,
+                                 max_gb_per_run=args.max_gb_per_run,
+                                 max_parallel_queries=args.max_parallel_queries,
+                                 process_workers=args.process_workers,
+                                 compact_dtypes=args.compact_dtypes,
+                                 body_policy=args.body_policy,
+                                 body_max_chars=args.body_max_chars,
+                                 start_date=start_date, end_date=end_date, metrics=metrics,
+                                 gharchive_dir=args.gharchive_dir,
+                                 gharchive_max_missing_hours=args.gharchive_max_missing_hours,
+                                 shard_index=args.shard_index, shard_count=args.shard_count, run_id=args.run_id,
+                                 window_end=args.window_end,
+                                 upload_part_size_mb=args.upload_part_size_mb,
+                                 upload_concurrency=args.upload_concurrency,
+                                 upload_max_retries=args.upload_max_retries)
+
+
+def _collect_github_data(bq_data_collector, args):
+    """
+    Log dataset size estimate and retrieve github data of collector's days
+    """
     _logger.info('Data will be retrieved for Last N={n} days: {days}'.format(n=len(bq_data_collector.last_n_days),
                                                                              days=bq_data_collector.last_n_days))
 
-    # ======= BQ GET DATASET SIZE ESTIMATE ========
-    _logger.info('----- BQ Dataset Size Estimate -----')
-    _logger.info('Dataset Size for Last N={n} days:'.format(n=len(bq_data_collector.last_n_days)))
-    _logger.info('\n{data}'.format(data=bq_data_collector.get_gh_event_estimate()))
+    if args.concurrent_queries or args.combined_query:
+        # ======= BQ GITHUB DATASET RETRIEVAL WITH DATASET SIZE ESTIMATE ========
+        _logger.info('----- BQ GITHUB DATASET RETRIEVAL & PROCESSING -----')
+        estimate, data_frame = bq_data_collector.get_github_data_with_estimate()
+        _logger.info('Dataset Size for Last N={n} days:'.format(n=len(bq_data_collector.last_n_days)))
+        _logger.info('\n{data}'.format(data=estimate))
+    else:
+        # ======= BQ GET DATASET SIZE ESTIMATE ========
+        _logger.info('----- BQ Dataset Size Estimate -----')
+        _logger.info('Dataset Size for Last N={n} days:'.format(n=len(bq_data_collector.last_n_days)))
+        _logger.info('\n{data}'.format(data=bq_data_collector.get_gh_event_estimate()))
+
+        # ======= BQ GITHUB DATASET RETRIEVAL & PROCESSING ========
+        _logger.info('----- BQ GITHUB DATASET RETRIEVAL & PROCESSING -----')
+        data_frame = bq_data_collector.get_github_data()
+    row_counts = bq_data_collector.row_counts
+    _logger.info('Events matched: {events}, rows transferred: {transferred}, rows kept: {kept}'.format(**row_counts))
+    return data_frame
+
+
+def _get_output_path(start_day, end_day, output_format, shard_index=0, shard_count=1, run_id=''):
+    """
+    Get object store url of output of given days (YYYYMMDD), or of a shard of it collected by given run
+    """
+    file_name = output_writer.get_output_file_name(arrow.get(start_day, 'YYYYMMDD'), arrow.get(end_day, 'YYYYMMDD'),
+                                                   output_format, shard_index, shard_count, run_id)
+    return 's3://{bucket}/gh_data/{filename}'.format(bucket=cc.AWS_S3_BUCKET_NAME, filename=file_name)
+
+
+def run_merge_shards(args):
+    """
+    Merge shard outputs of last N days window, or of each backfill unit, into unsharded outputs. Returns exit code
+    """
+    if args.start:
+        units = backfill.split_date_range(args.start, args.end or arrow.now().shift(days=-1).format('YYYYMMDD'),
+                                          args.unit)
+    else:
+        units = [BigQueryDataCollector._get_query_date_range(args.days_since_yday, args.window_end)[0]]
+
+    for days in units:
+        paths = [_get_output_path(days[0], days[-1], args.output_format, i, args.shard_count, args.run_id)
+                 for i in range(args.shard_count)]
+        sharding.merge_shards(paths, _get_output_path(days[0], days[-1], args.output_format), args.output_format,
+                              timeout_seconds=args.merge_timeout_minutes * 60,
+                              upload_options={'part_size': args.upload_part_size_mb * 2 ** 20,
+                                              'concurrency': args.upload_concurrency,
+                                              'max_retries': args.upload_max_retries})
+    return 0
+
+
+def run_backfill(args, metrics=None):
+    """
+    Collect --start to --end date range unit by unit, writing one output object per unit. Returns exit code
+    """
+    end = args.end or arrow.now().shift(days=-1).format('YYYYMMDD')
+    units = backfill.split_date_range(args.start, end, args.unit)
+    shard = '.shard-{i}-of-{n}.run-{run_id}'.format(i=args.shard_index, n=args.shard_count, run_id=args.run_id) \
+        if args.shard_count > 1 else ''
+    # not keyed on end, which defaults to yesterday, so reruns on later days resume from the same manifest
+    manifest_path = args.manifest or 's3://{bucket}/gh_data/backfill_{start}_{unit}{shard}.json'.format(
+        bucket=cc.AWS_S3_BUCKET_NAME, start=args.start, unit=args.unit, shard=shard)
+
+    def _run_unit(days):
+        bq_data_collector = _create_data_collector(args, metrics, start_date=days[0], end_date=days[-1])
+        data_frame = _collect_github_data(bq_data_collector, args)
+        if data_frame.empty and args.shard_count <= 1:
+            _logger.warning('Nothing to save for {start}-{end}'.format(start=days[0], end=days[-1]))
+            return {'path': None, 'rows': 0}
+        return {'path': bq_data_collector.upload_data_frame(data_frame, args.output_format), 'rows': len(data_frame)}
 
-    # ======= BQ GITHUB DATASET RETRIEVAL & PROCESSING ========
-    _logger.info('----- BQ GITHUB DATASET RETRIEVAL & PROCESSING -----')
-    data_frame = bq_data_collector.get_github_data()
-    bq_data_collector.save_data_to_object_store(data_frame, args.days_since_yday)
+    # units completed with other options (e.g. ecosystems) miss outputs of this configuration, so they are run again
+    # -e defaults to a single ecosystem name rather than a list
+    ecosystems = [args.ecosystems] if isinstance(args.ecosystems, str) else args.ecosystems
+    options = {'ecosystems': sorted(ecosystems), 'output_format': args.output_format,
+               'body_policy': args.body_policy, 'body_max_chars': args.body_max_chars}
+    result = backfill.run_backfill(units, _run_unit, manifest_path, args.max_parallel_units, options)
+    _logger.info('Backfill completed: {c} units collected, {s} skipped, {f} failed {failed}'.format(
+        c=len(result['completed']), s=len(result['skipped']), f=len(result['failed']), failed=result['failed']))
+    return 1 if result['failed'] else 0
 
 
 if __name__ == '__main__':
@@ -1,14 +1,18 @@
 import logging
 import os
+import threading
+import time
 import warnings
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Iterable
 
 import arrow
 import daiquiri
 import pandas as pd
 
 import src.utils.cloud_constants as cc
-from src.utils import bq_client_helper
+from src.utils import bq_client_helper, event_processing, event_schema, output_writer, partition_cache, \
+    query_planner, run_metrics, gharchive_reader, sharding, delta_output, s3_upload
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=Warning)
@@ -16,11 +20,80 @@ warnings.simplefilter(action='ignore', category=Warning)
 daiquiri.setup(level=logging.INFO)
 _logger = daiquiri.getLogger(__name__)
 
+# Event types retrieved by collector with their payload field names
+EVENT_PAYLOAD_FIELDS = {'IssuesEvent': 'issue', 'PullRequestEvent': 'pull_request'}
+
+# Column holding no of events matched per event type when deduplication is done on BQ side
+EVENT_COUNT_COLUMN = 'event_type_events'
+
+# Records kept between pages are deduplicated once they outgrow this many times the no of unique urls seen, so
+# superseded records of time ordered pages don't pile up
+KEPT_COMPACT_FACTOR = 2
+
 
 class BigQueryDataCollector:
-    def __init__(self, ecosystems: List[str], bq_credentials_path: str = '', repo_list_url: str = '', days: int = 3):
-        self._bq_client = BigQueryDataCollector._get_bq_client(bq_credentials_path)
+    def __init__(self, ecosystems: List[str], bq_credentials_path: str = '', repo_list_url: str = '', days: int = 3,
+                 partition_cache_dir: str = '', cache_settle_hours: int = cc.PARTITION_CACHE_SETTLE_HOURS,
+                 concurrent_queries: bool = False, combined_query: bool = False, page_size: int = 0,
+                 server_dedup: bool = False, parameterized_query: bool = False, result_cache_dir: str = '',
+                 max_gb_per_query: float = 0, max_gb_per_run: float = 0, max_parallel_queries: int = 2,
+                 process_workers: int = 1, compact_dtypes: bool = False, body_policy: str = 'full',
+                 body_max_chars: int = cc.BODY_MAX_CHARS, start_date: str = '', end_date: str = '',
+                 metrics: run_metrics.RunMetrics = None, gharchive_dir: str = '', shard_index: int = 0,
+                 shard_count: int = 1, upload_part_size_mb: int = cc.UPLOAD_PART_SIZE_MB,
+                 upload_concurrency: int = cc.UPLOAD_CONCURRENCY, upload_max_retries: int = cc.UPLOAD_MAX_RETRIES,
+                 window_end: str = '', run_id: str = '',
+                 gharchive_max_missing_hours: int = cc.GHARCHIVE_MAX_MISSING_HOURS):
+        # When set, events are read from hourly GH archive files in given local directory or mirror url, not BQ
+        self._gharchive_dir = gharchive_dir
+        # Run fails when more than given no of hourly GH archive files (or all of them) are missing
+        self._gharchive_max_missing_hours = gharchive_max_missing_hours
+        self._bq_client = None if gharchive_dir else BigQueryDataCollector._get_bq_client(bq_credentials_path)
         self._repo_list = bq_client_helper.get_eco_system_with_repo_list(repo_list_url)
+        self._repo_eco_system_index = bq_client_helper.get_repo_eco_system_index(self._repo_list)
+        # When set, data is collected incrementally, querying BQ only for days missing in the partition cache
+        self._partition_cache_dir = partition_cache_dir
+        self._cache_settle_hours = cache_settle_hours
+        # When set, issues and PRs queries are submitted together instead of one after other
+        self._concurrent_queries = concurrent_queries
+        # When set, issues and PRs are retrieved with a single scan and estimate is derived from the same result.
+        # GH archive files hold all event types, so they are always read once for both
+        self._combined_query = combined_query or bool(gharchive_dir)
+        self._event_frequencies, self._pending_events = [], {}
+        # When set, query result is read page by page and deduplicated as it arrives instead of loading it all at once
+        self._page_size = page_size
+        # When set, only last updated record per url is transferred from BQ, local deduplication is a safety net
+        self._server_dedup = server_dedup
+        self._row_counts = {'events': 0, 'transferred': 0, 'kept': 0}
+        self._lock = threading.Lock()
+        # When set, table suffixes and repo names are passed as BQ query parameters so query text stays stable
+        self._parameterized_query = parameterized_query
+        # When set, query results are cached in given directory or object store url so reruns of the same window don't
+        # query BQ again
+        self._result_cache_dir = result_cache_dir
+        # When set, window is split into sub queries within max_gb_per_query, run fails when over max_gb_per_run
+        self._max_gb_per_query, self._max_gb_per_run = max_gb_per_query, max_gb_per_run
+        self._max_parallel_queries = max_parallel_queries
+        self._query_plan_summary = []
+        # When above 1, events are parsed and deduplicated in a process pool, sharded by repo name
+        self._process_workers = process_workers
+        # When set, collected frame is converted to compact dtypes (categoricals, nullable integers, datetimes)
+        self._compact_dtypes = compact_dtypes
+        # How issue/PR body is retrieved, see bq_client_helper.BODY_POLICIES
+        self._body_policy, self._body_max_chars = body_policy, body_max_chars
+        # When set, data is collected for given date range (YYYYMMDD, both inclusive) instead of last N days
+        self._start_date, self._end_date = start_date, end_date
+        # Wall time, rows, bytes and peak RSS per stage, can be shared between collectors of a run
+        self._metrics = metrics or run_metrics.RunMetrics()
+        # When above 1, only repos of given shard (by stable hash of repo name) are collected into a shard output
+        self._shard_index, self._shard_count = shard_index, shard_count
+        # When set, shard outputs are named after the run, so outputs of earlier runs of the window are never merged
+        self._run_id = run_id
+        # When set, last N days end at given day (YYYYMMDD) instead of yesterday, so all pods of a run agree on it
+        self._window_end = window_end
+        # Output is uploaded in parts of given size by upload_concurrency threads, failed requests are retried
+        self._upload_part_size_mb, self._upload_concurrency = upload_part_size_mb, upload_concurrency
+        self._upload_max_retries = upload_max_retries
         self._init_query_param(ecosystems, days)
 
     def _get_repo_by_eco_system(self, eco_system: str) -> List[str]:
@@ -55,12 +128,12 @@ class BigQueryDataCollector:
         return bq_client_helper.create_github_bq_client()
 
     @staticmethod
-    def _get_query_date_range(no_of_days):
+    def _get_query_date_range(no_of_days, window_end: str = ''):
         """
-        Get date range based on no_of_days passed
+        Get date range based on no_of_days passed, ending yesterday or at window_end day (YYYYMMDD) when given
         """
         # Don't change this
-        present_time = arrow.now()
+        present_time = arrow.get(window_end, 'YYYYMMDD').shift(days=1) if window_end else arrow.now()
 
         # CHANGE NEEDED
         # to get data for N days back starting from YESTERDAY
@@ -84,9 +157,14 @@ class BigQueryDataCollector:
         last_n_days = [dt.format('YYYYMMDD') for dt in arrow.Arrow.range('day', start_time, end_time)]
         return last_n_days, start_time, end_time
 
-    def _get_gh_event_as_data_frame(self, query_param: Dict) -> pd.DataFrame:
+    def _build_event_query(self, query_param: Dict, payload_field_names: Dict[str, str] = None) \
+            -> Tuple[str, Dict[str, List[str]]]:
         """
-        Using big query get github archived data as panda dataframe
+        Build event query for given query params, returns query and BQ query parameter values (None when values are
+        part of query text)
+
+        When payload_field_names (event type -> payload field name) is given, all those event types are retrieved
+        with a single scan.
         """
         event_query = r"""
         SELECT
@@ -123,49 +201,278 @@ class BigQueryDataCollector:
             AND type = '{event_type}'
             """
 
+        event_query = bq_client_helper.bq_apply_body_policy(event_query, self._body_policy, self._body_max_chars)
+        if payload_field_names:
+            event_query = bq_client_helper.bq_combine_event_types(event_query, payload_field_names)
+        if self._server_dedup:
+            event_query = bq_client_helper.bq_deduplicate_on_server(event_query, EVENT_COUNT_COLUMN)
+
         _logger.debug("Query: {qry}".format(qry=event_query))
+
+        query_parameter_values = None
+        if self._parameterized_query:
+            query_parameter_values = bq_client_helper.get_query_parameter_values(query_param)
+            query_param = {**query_param, **bq_client_helper.PARAMETERIZED_QUERY_PARAMS}
+        return bq_client_helper.bq_add_query_params(event_query, query_param), query_parameter_values
+
+    def _get_gh_event_as_data_frame(self, query_param: Dict, payload_field_names: Dict[str, str] = None) \
+            -> pd.DataFrame:
+        """
+        Using big query (or GH archive files) get github archived data as panda dataframe
+
+        When payload_field_names (event type -> payload field name) is given, all those event types are retrieved
+        with a single scan.
+        """
         _logger.info('Event type: {event_type}'.format(event_type=query_param['{event_type}']))
+        if self._gharchive_dir:
+            df, event_frequency, transferred_rows = self._read_gh_archive_events(query_param)
+        else:
+            df, event_frequency, transferred_rows = self._query_gh_events(query_param, payload_field_names)
 
-        event_query = bq_client_helper.bq_add_query_params(event_query, query_param)
-        qsize = self._bq_client.estimate_query_size(event_query)
-        _logger.info('Retrieving GH Events. Query cost in GB={qc}'.format(qc=qsize))
+        total_events = int(event_frequency.sum())
+        with self._lock:
+            if payload_field_names:
+                self._event_frequencies.append(event_frequency)
+            self._row_counts['events'] += total_events
+            self._row_counts['transferred'] += transferred_rows
+            self._row_counts['kept'] += len(df)
 
-        df = self._bq_client.query_to_pandas(event_query)
-        if df.empty:
+        if total_events == 0:
             _logger.warn('No Events present for given time duration.')
         else:
-            _logger.info('Total Events retrieved: {n}'.format(n=len(df)))
-
-            df.created_at = pd.to_datetime(df.created_at)
-            df.updated_at = pd.to_datetime(df.updated_at)
-            df.closed_at = pd.to_datetime(df.closed_at)
-            # From the duplicate records based on url take the last updated record.
-            df = df.loc[df.groupby('url').updated_at.idxmax(skipna=False)].reset_index(drop=True)
+            _logger.info('Total Events retrieved: {n}'.format(n=total_events))
+            _logger.info('Rows transferred: {t}, rows kept after deduplication: {k}'.format(t=transferred_rows,
+                                                                                          k=len(df)))
             _logger.info('Total Events after deduplication: {n}'.format(n=len(df)))
 
         return df
 
+    def _query_gh_events(self, query_param: Dict, payload_field_names: Dict[str, str] = None) \
+            -> Tuple[pd.DataFrame, pd.Series, int]:
+        """
+        Get events from BQ, or from query result cache when set, returns deduplicated events, no of events per
+        event type and no of rows transferred
+        """
+        with self._metrics.stage('query_build'):
+            event_query, query_parameter_values = self._build_event_query(query_param, payload_field_names)
+        last_day = '20' + max(bq_client_helper.get_query_parameter_values(query_param)['table_suffixes'])
+
+        cache_path = partition_cache.get_query_result_path(self._result_cache_dir, event_query,
+                                                           query_parameter_values) if self._result_cache_dir else None
+        if cache_path and partition_cache.is_partition_fresh(cache_path, last_day, self._cache_settle_hours):
+            _logger.info('Using cached result {path}'.format(path=cache_path))
+            return partition_cache.load_partition(cache_path)
+
+        result = self._run_event_query(event_query, query_parameter_values, query_param['{event_type}'])
+        if cache_path:
+            partition_cache.save_partition(result, cache_path)
+        return result
+
+    def _read_gh_archive_events(self, query_param: Dict) -> Tuple[pd.DataFrame, pd.Series, int]:
+        """
+        Get events from hourly GH archive files of query param days, returns deduplicated events, no of events per
+        event type and no of rows read
+        """
+        query_parameter_values = bq_client_helper.get_query_parameter_values(query_param)
+        days = ['20' + day for day in query_parameter_values['table_suffixes']]
+        event_types = [event_type.strip() for event_type in query_param['{event_type}'].split(',')]
+        start_time = time.monotonic()
+        chunks = gharchive_reader.read_events(
+            gharchive_reader.get_hour_file_paths(self._gharchive_dir, days), set(query_parameter_values['repo_names']),
+            event_types, self._process_workers, self._body_policy, self._body_max_chars,
+            self._page_size or gharchive_reader.DEFAULT_BATCH_ROWS, self._gharchive_max_missing_hours)
+        result = self._reduce_event_chunks(self._metrics.timed_chunks('fetch', chunks))
+        _logger.info('Read GH archive files of {n} days in {s:.2f} seconds'.format(n=len(days),
+                                                                                  s=time.monotonic() - start_time))
+        return result
+
+    def _estimate_query_size(self, query: str, query_parameter_values: Dict[str, List[str]] = None) -> float:
+        """
+        Estimate query size in GB with a dry run, nothing is scanned on BQ when reading GH archive files
+        """
+        if self._gharchive_dir:
+            return 0.0
+        with self._metrics.stage('dry_run') as counters:
+            if query_parameter_values:
+                size = bq_client_helper.estimate_query_size_with_params(self._bq_client, query, query_parameter_values)
+            else:
+                size = self._bq_client.estimate_query_size(query)
+            counters['bytes_scanned'] = float(size) * 2 ** 30
+        return size
+
+    def _estimate_event_query_size(self, days: List[str]) -> float:
+        """
+        Estimate size in GB of an event query for given days, all event queries scan the same columns
+        """
+        query_param = {**self._build_query_params(days, self._repo_names),
+                       **{'{event_type}': ', '.join(EVENT_PAYLOAD_FIELDS)}}
+        return float(self._estimate_query_size(*self._build_event_query(query_param, EVENT_PAYLOAD_FIELDS)))
+
+    def _run_event_query(self, event_query: str, query_parameter_values: Dict[str, List[str]], event_type: str) \
+            -> Tuple[pd.DataFrame, pd.Series, int]:
+        """
+        Run event query on BQ, returns deduplicated events, no of events per event type and no of rows transferred
+        """
+        start_time = time.monotonic()
+        qsize = self._estimate_query_size(event_query, query_parameter_values)
+        _logger.info('Retrieving GH Events. Query cost in GB={qc}, dry run took {s:.2f} seconds'.format(
+            qc=qsize, s=time.monotonic() - start_time))
+
+        start_time = time.monotonic()
+        if self._page_size:
+            chunks = bq_client_helper.query_to_data_frame_chunks(self._bq_client, event_query, self._page_size,
+                                                                 query_parameter_values)
+        else:
+            chunks = self._fetch_event_query_result(event_query, query_parameter_values)
+        result = self._reduce_event_chunks(self._metrics.timed_chunks('fetch', chunks))
+        _logger.info('{event_type} events retrieved in {s:.2f} seconds'.format(event_type=event_type,
+                                                                               s=time.monotonic() - start_time))
+        return result
+
+    def _fetch_event_query_result(self, event_query: str, query_parameter_values: Dict[str, List[str]]) \
+            -> Iterable[pd.DataFrame]:
+        """
+        Fetch the whole result of event query at once, yielded as a single chunk
+        """
+        if query_parameter_values:
+            yield bq_client_helper.query_to_pandas_with_params(self._bq_client, event_query, query_parameter_values)
+        else:
+            yield self._bq_client.query_to_pandas(event_query)
+
+    def _process_events(self, df: pd.DataFrame, executor=None) -> pd.DataFrame:
+        """
+        Parse dates and deduplicate events, as separate stages when processed in process. With process workers,
+        given process pool is used
+        """
+        if self._process_workers > 1:
+            with self._metrics.stage('parse_dedup', rows_in=len(df)) as counters:
+                df = event_processing.process_events(df, self._process_workers, executor=executor)
+                counters['rows_out'] = len(df)
+            return df
+
+        with self._metrics.stage('parse', rows_in=len(df), rows_out=len(df)):
+            df = event_processing.parse_event_dates(df)
+        with self._metrics.stage('dedup', rows_in=len(df)) as counters:
+            df = event_processing.deduplicate_events(df)
+            counters['rows_out'] = len(df)
+        return df
+
+    def _reduce_event_chunks(self, chunks: Iterable[pd.DataFrame]) -> Tuple[pd.DataFrame, pd.Series, int]:
+        """
+        Parse and deduplicate event chunks as they arrive
+
+        Returns deduplicated events, no of events per event type and no of rows transferred. Each chunk is
+        deduplicated on its own and only records newer than the last updated record seen for their url (url ->
+        updated_at is kept between chunks) are kept, so work stays linear in the no of chunks. Kept records are
+        deduplicated whenever they outgrow KEPT_COMPACT_FACTOR times the no of unique urls and once at the end, so
+        they stay bounded by the no of unique issues/PRs. With process workers, a single process pool is used for
+        all chunks.
+        """
+        kept, latest, transferred_rows, kept_rows = [], {}, 0, 0
+        event_counts, server_event_counts = [], {}
+        executor = event_processing.create_process_pool(self._process_workers) if self._process_workers > 1 else None
+        try:
+            for chunk in chunks:
+                if chunk.empty:
+                    continue
+                transferred_rows += len(chunk)
+                if EVENT_COUNT_COLUMN in chunk.columns:
+                    # deduplicated on BQ side, events are counted there
+                    server_event_counts.update(chunk.groupby('event_type')[EVENT_COUNT_COLUMN].first().to_dict())
+                    chunk = chunk.drop(columns=EVENT_COUNT_COLUMN)
+                else:
+                    event_counts.append(chunk.groupby('event_type').size())
+
+                chunk = self._process_events(chunk, executor)
+                if len(kept) == 1:
+                    # url state is only needed once there is more than one chunk
+                    event_processing.select_newer_records(kept[0], latest)
+                if kept:
+                    chunk = event_processing.select_newer_records(chunk, latest)
+                kept.append(chunk)
+                kept_rows += len(chunk)
+                if len(kept) > 1 and kept_rows > KEPT_COMPACT_FACTOR * len(latest):
+                    kept = [self._compact_kept(kept)]
+                    kept_rows = len(kept[0])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if len(kept) > 1:
+            df = self._compact_kept(kept)
+        else:
+            df = kept[0] if kept else pd.DataFrame()
+
+        if server_event_counts:
+            event_counts.append(pd.Series(server_event_counts))
+        event_frequency = pd.concat(event_counts).groupby(level=0).sum() if event_counts \
+            else pd.Series(dtype='int64')
+        return df, event_frequency, transferred_rows
+
+    def _compact_kept(self, kept: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Deduplicate records kept from several chunks into one frame
+        """
+        with self._metrics.stage('dedup', rows_in=sum(len(df) for df in kept)) as counters:
+            df = event_processing.deduplicate_events(pd.concat(kept, axis=0, sort=False, ignore_index=True))
+            counters['rows_out'] = len(df)
+        return df
+
+    @staticmethod
+    def _deduplicate_events(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        From the duplicate records based on url take the last updated record
+        """
+        return event_processing.deduplicate_events(df)
+
     def _init_query_param(self, eco_systems: List[str], days: int) -> None:
         """
         Init Query Parameters
         """
-        last_n_days = self._get_query_date_range(days)[0]
+        if self._start_date:
+            start_time = arrow.get(self._start_date, 'YYYYMMDD')
+            end_time = arrow.get(self._end_date, 'YYYYMMDD') if self._end_date else start_time
+            last_n_days = [dt.format('YYYYMMDD') for dt in arrow.Arrow.range('day', start_time, end_time)]
+        else:
+            last_n_days = self._get_query_date_range(days, self._window_end)[0]
         repo_names = self._get_repo_list(eco_systems)
+        if self._shard_count > 1:
+            repo_names = sharding.select_shard(repo_names, self._shard_index, self._shard_count)
+            _logger.info('Collecting shard {i} of {n}: {count} repos'.format(i=self._shard_index, n=self._shard_count,
+                                                                          count=len(repo_names)))
 
+        self._eco_systems, self._repo_names = eco_systems, repo_names
+        self._query_params, self._last_n_days = self._build_query_params(last_n_days, repo_names), last_n_days
+
+    @staticmethod
+    def _build_query_params(days: List[str], repo_names: set) -> Dict:
+        """
+        Build Query Parameters for given days (YYYYMMDD) and repo names
+        """
         # Don't change this
         year_prefix = '20*'
-        day_list = [item[2:] for item in last_n_days]
-        month_days = '({days})'.format(days=', '.join(["'" + d + "'" for d in day_list]))
-        repo_names = '({repo_names})'.format(repo_names=', '.join(["'" + r + "'" for r in repo_names]))
-        query_params = {'{year_prefix_wildcard}': year_prefix,
-                        '{year_suffix_month_day}': month_days,
-                        '{repo_names}': repo_names}
-        self._query_params, self._last_n_days = query_params, last_n_days
+        day_list = [item[2:] for item in days]
+        # sorted, so query text is same between runs and the local query result cache can be used
+        repo_names = sorted(repo_names)
+        return {'{year_prefix_wildcard}': year_prefix,
+                '{year_suffix_month_day}': bq_client_helper.bq_string_list(day_list),
+                '{repo_names}': bq_client_helper.bq_string_list(repo_names),
+                bq_client_helper.QUERY_PARAMETER_VALUES: {'table_suffixes': day_list, 'repo_names': repo_names}}
 
     def get_gh_event_estimate(self):
         """
         Get the estimated cost of query
+
+        In combined query mode no separate query is run, frequency is derived from the events retrieved so far.
+        If nothing is retrieved yet, events are retrieved now and kept for the following get_github_data call.
         """
+        if self._combined_query:
+            # incremental and planned modes query BQ per sub window, so never scan the full window here
+            if not self._event_frequencies and not self._partition_cache_dir and not self._is_planned():
+                key = self._query_params['{year_suffix_month_day}']
+                self._pending_events[key] = self.get_events_as_data_frame()
+            return self._get_event_frequency()
+
         query = """
         SELECT  type as EventType, count(*) as Freq
                 FROM `githubarchive.day.{year_prefix_wildcard}`
@@ -175,70 +482,291 @@ class BigQueryDataCollector:
                 GROUP BY type
         """
         query = bq_client_helper.bq_add_query_params(query, self._query_params)
-        return self._bq_client.query_to_pandas(query)
+        start_time = time.monotonic()
+        with self._metrics.stage('estimate'):
+            estimate = self._bq_client.query_to_pandas(query)
+        _logger.info('Estimate query completed in {s:.2f} seconds'.format(s=time.monotonic() - start_time))
+        return estimate
 
-    def get_issues_as_data_frame(self) -> pd.DataFrame:
+    def get_issues_as_data_frame(self, query_params: Dict = None) -> pd.DataFrame:
         """
         Retrieves GH Issues as pandas data frame
         """
         return self._get_gh_event_as_data_frame(
-            {**self._query_params, **{'{payload_field_name}': 'issue', '{event_type}': 'IssuesEvent'}})
+            {**(query_params or self._query_params),
+             **{'{payload_field_name}': 'issue', '{event_type}': 'IssuesEvent'}})
 
-    def get_prs_as_data_frame(self) -> pd.DataFrame:
+    def get_prs_as_data_frame(self, query_params: Dict = None) -> pd.DataFrame:
         """
         Retrieves GH PRs as pandas data frame
         """
         return self._get_gh_event_as_data_frame(
-            {**self._query_params, **{'{payload_field_name}': 'pull_request', '{event_type}': 'PullRequestEvent'}})
+            {**(query_params or self._query_params),
+             **{'{payload_field_name}': 'pull_request', '{event_type}': 'PullRequestEvent'}})
 
-    def get_github_data(self) -> pd.DataFrame:
+    def get_events_as_data_frame(self, query_params: Dict = None) -> pd.DataFrame:
         """
-        Retrives GH Issues and PRs and merge it into single dataframe
+        Retrieves GH Issues and PRs with a single scan as pandas data frame
+        """
+        return self._get_gh_event_as_data_frame(
+            {**(query_params or self._query_params), **{'{event_type}': ', '.join(EVENT_PAYLOAD_FIELDS)}},
+            payload_field_names=EVENT_PAYLOAD_FIELDS)
+
+    def _get_event_frequency(self) -> pd.DataFrame:
+        """
+        Get frequency of each event type retrieved so far in combined query mode
         """
-        issues_df = self.get_issues_as_data_frame()
-        prs_df = self.get_prs_as_data_frame()
+        frequency = pd.concat(self._event_frequencies).groupby(level=0).sum() if self._event_frequencies \
+            else pd.Series(dtype='int64')
+        return pd.DataFrame({'EventType': frequency.index, 'Freq': frequency.values})
+
+    def _get_merged_events(self, query_params: Dict) -> pd.DataFrame:
+        """
+        Retrives GH Issues and PRs for given query params and merge it into single dataframe
+        """
+        if self._combined_query:
+            events_df = self._pending_events.pop(query_params['{year_suffix_month_day}'], None)
+            if events_df is None:
+                events_df = self.get_events_as_data_frame(query_params)
+            if events_df.empty:
+                return events_df
+            # split single scan result locally
+            issues_df = events_df[events_df.event_type == 'IssuesEvent']
+            prs_df = events_df[events_df.event_type == 'PullRequestEvent']
+        elif self._concurrent_queries:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                issues_future = executor.submit(self.get_issues_as_data_frame, query_params)
+                prs_future = executor.submit(self.get_prs_as_data_frame, query_params)
+                issues_df, prs_df = issues_future.result(), prs_future.result()
+        else:
+            issues_df = self.get_issues_as_data_frame(query_params)
+            prs_df = self.get_prs_as_data_frame(query_params)
 
         _logger.info('Merging issues and pull requests datasets')
-        cols = issues_df.columns
-        data_frame = pd.concat([issues_df, prs_df], axis=0, sort=False, ignore_index=True).reset_index(drop=True)
-        data_frame = data_frame[cols]
+        with self._metrics.stage('merge', rows_in=len(issues_df) + len(prs_df)) as counters:
+            cols = issues_df.columns
+            data_frame = pd.concat([issues_df, prs_df], axis=0, sort=False, ignore_index=True).reset_index(drop=True)
+            counters['rows_out'] = len(data_frame)
+        return data_frame[cols]
+
+    def _get_merged_events_incremental(self) -> pd.DataFrame:
+        """
+        Retrives GH Issues and PRs day by day, reusing cached day partitions and querying BQ only for missing
+        or stale days
+        """
+        repo_list_hash = partition_cache.get_repo_list_hash(self._repo_names)
+        # options changing the columns or rows of a partition
+        options = {'body_policy': self._body_policy, 'body_max_chars': self._body_max_chars,
+                   'server_dedup': self._server_dedup}
+        paths = {day: partition_cache.get_partition_path(self._partition_cache_dir, day, self._eco_systems,
+                                                         repo_list_hash, options)
+                 for day in self._last_n_days}
+        stale_days = [day for day in self._last_n_days
+                      if not partition_cache.is_partition_fresh(paths[day], day, self._cache_settle_hours)]
+        _logger.info('Cached partitions missing or stale for {n} of {count} days, querying BQ for {days}'.format(
+            n=len(stale_days), count=len(self._last_n_days), days=stale_days))
+
+        # query cost guard applies to the days queried, fails before any query when they are over run budget
+        planned = self._is_planned() and bool(stale_days)
+        if planned:
+            plan = query_planner.plan_days(stale_days, self._estimate_event_query_size, self._max_gb_per_query)
+            total_gb = query_planner.check_run_budget(plan, self._max_gb_per_run, self._queries_per_window)
+            _logger.info('Querying {n} days, estimated query cost in GB={gb:.2f}'.format(n=len(plan), gb=total_gb))
+        else:
+            plan = [([day], 0.0) for day in stale_days]
+
+        def _query_day(days):
+            day_df = self._get_merged_events(self._build_query_params(days, self._repo_names))
+            partition_cache.save_partition(day_df, paths[days[0]])
+            return day_df
+
+        frames, summary = query_planner.execute_plan(plan, _query_day, self._max_parallel_queries if planned else 1,
+                                                     self._queries_per_window)
+        if planned:
+            self._query_plan_summary = summary
+            query_planner.log_summary(summary)
+
+        queried = dict(zip(stale_days, frames))
+        return self._merge_partitions([queried[day] if day in queried else partition_cache.load_partition(paths[day])
+                                       for day in self._last_n_days])
+
+    def _merge_partitions(self, partitions: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Merge events retrieved for different days
+        """
+        partitions = [df for df in partitions if not df.empty]
+        if not partitions:
+            return pd.DataFrame()
+
+        with self._metrics.stage('merge', rows_in=sum(len(df) for df in partitions)) as counters:
+            data_frame = pd.concat(partitions, axis=0, sort=False, ignore_index=True)
+            # Same issue/PR can be updated on multiple days, so keep only the last updated record across partitions
+            data_frame = self._deduplicate_events(data_frame)
+            counters['rows_out'] = len(data_frame)
+        _logger.info('Total Events after merging {n} partitions: {count}'.format(n=len(partitions),
+                                                                                count=len(data_frame)))
+        return data_frame
+
+    def _is_planned(self) -> bool:
+        """
+        Check if query cost guard is configured
+        """
+        return bool(self._max_gb_per_query or self._max_gb_per_run)
+
+    @property
+    def _queries_per_window(self) -> int:
+        """
+        No of event queries run per (sub) window
+        """
+        return 1 if self._combined_query else len(EVENT_PAYLOAD_FIELDS)
+
+    def _get_merged_events_planned(self) -> pd.DataFrame:
+        """
+        Retrives GH Issues and PRs within configured query cost budget
+
+        Window is split into per week or per day sub queries when it exceeds the per query budget and sub queries
+        are run with bounded parallelism. Fails before running any query when the run budget would be exceeded.
+        """
+        plan = query_planner.plan_sub_windows(self._last_n_days, self._estimate_event_query_size,
+                                              self._max_gb_per_query)
+        total_gb = query_planner.check_run_budget(plan, self._max_gb_per_run, self._queries_per_window)
+        _logger.info('Running {n} sub queries, estimated query cost in GB={gb:.2f}'.format(n=len(plan), gb=total_gb))
+
+        partitions, self._query_plan_summary = query_planner.execute_plan(
+            plan, lambda days: self._get_merged_events(self._build_query_params(days, self._repo_names)),
+            self._max_parallel_queries, self._queries_per_window)
+        query_planner.log_summary(self._query_plan_summary)
+        return self._merge_partitions(partitions)
+
+    def get_github_data(self) -> pd.DataFrame:
+        """
+        Retrives GH Issues and PRs and merge it into single dataframe
+        """
+        if self._partition_cache_dir:
+            data_frame = self._get_merged_events_incremental()
+        elif self._is_planned():
+            data_frame = self._get_merged_events_planned()
+        else:
+            data_frame = self._get_merged_events(self._query_params)
 
         # update ecosystem
         if not data_frame.empty:
             _logger.info('Updating ecosystem')
-            data_frame['ecosystem'] = data_frame.apply(lambda x: self._update_eco_system(x['repo_name']),
-                                                       axis=1)
+            with self._metrics.stage('tag', rows_in=len(data_frame), rows_out=len(data_frame)):
+                data_frame['ecosystem'] = bq_client_helper.tag_eco_system(data_frame.repo_name,
+                                                                          self._repo_eco_system_index)
+            if self._compact_dtypes:
+                with self._metrics.stage('compact', rows_in=len(data_frame), rows_out=len(data_frame)):
+                    compact_data_frame = event_schema.apply_event_schema(data_frame)
+                event_schema.log_memory_report(data_frame, compact_data_frame)
+                data_frame = compact_data_frame
 
         return data_frame
 
-    def _update_eco_system(self, repo_name):
+    def get_github_data_with_estimate(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
-        Update ecosystem based on repo_name
+        Submits the estimate query together with GH Issues and PRs retrieval, returns (estimate, data) once both
+        are done
         """
-        filtered_dict = {k: v for (k, v) in self._repo_list.items() if repo_name in v}
-
-        return ",".join(filtered_dict.keys())
-
-    def save_data_to_object_store(self, data_frame, days_since_yday):
+        if self._combined_query:
+            # estimate is derived from the same single scan, so there is nothing to run concurrently
+            data_frame = self.get_github_data()
+            return self.get_gh_event_estimate(), data_frame
+
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            estimate_future = executor.submit(self.get_gh_event_estimate)
+            data_future = executor.submit(self.get_github_data)
+            estimate, data_frame = estimate_future.result(), data_future.result()
+        _logger.info('All queries completed in {s:.2f} seconds'.format(s=time.monotonic() - start_time))
+        return estimate, data_frame
+
+    def save_data_to_object_store(self, data_frame, days_since_yday, output_format='csv'):
         """
-        Save the github data to object s3 store
+        Save the github data to object s3 store in given output format (see output_writer.OUTPUT_FORMATS)
         """
         if data_frame.empty:
             _logger.warn('Nothing to save')
         else:
 
-            last_n_days, start_time, end_time = self._get_query_date_range(days_since_yday)
-            file_name = "gh_data_{days}.csv".format(
-                days='-'.join([start_time.format('YYYYMMDD'), end_time.format('YYYYMMDD')]))
+            last_n_days, start_time, end_time = self._get_query_date_range(days_since_yday, self._window_end)
+            file_name = output_writer.get_output_file_name(start_time, end_time, output_format, self._shard_index,
+                                                           self._shard_count, self._run_id)
             _logger.info('Uploading Github data to S3 Bucket')
             try:
-                data_frame.to_csv(
-                    's3://{bucket}/gh_data/{filename}'.format(bucket=cc.AWS_S3_BUCKET_NAME, filename=file_name),
-                    index=False)
+                with self._metrics.stage('upload', rows_in=len(data_frame)) as counters:
+                    counters['bytes_written'] = self._upload(
+                        data_frame,
+                        's3://{bucket}/gh_data/{filename}'.format(bucket=cc.AWS_S3_BUCKET_NAME, filename=file_name),
+                        output_format)
             except Exception as ex:
                 _logger.error("Exception occurred while saving data to object store. Msg: {msg}".format(msg=ex))
+                raise
             _logger.info('Upload completed')
 
+    def _upload(self, data_frame: pd.DataFrame, path: str, output_format: str) -> int:
+        """
+        Upload dataframe to object store url with parallel multipart upload, see s3_upload.upload_file. Returns no of
+        bytes uploaded
+        """
+        return s3_upload.upload_data_frame(data_frame, path, output_format, **self._upload_options)
+
+    @property
+    def _upload_options(self) -> Dict:
+        return {'part_size': self._upload_part_size_mb * 2 ** 20, 'concurrency': self._upload_concurrency,
+                'max_retries': self._upload_max_retries}
+
+    def upload_data_frame(self, data_frame: pd.DataFrame, output_format: str = 'csv') -> str:
+        """
+        Upload the github data of collected days to object s3 store in given output format, returns object url.
+        Unlike save_data_to_object_store, empty data is uploaded too
+        """
+        file_name = output_writer.get_output_file_name(arrow.get(self._last_n_days[0], 'YYYYMMDD'),
+                                                       arrow.get(self._last_n_days[-1], 'YYYYMMDD'), output_format,
+                                                       self._shard_index, self._shard_count, self._run_id)
+        path = 's3://{bucket}/gh_data/{filename}'.format(bucket=cc.AWS_S3_BUCKET_NAME, filename=file_name)
+        _logger.info('Uploading Github data to {path}'.format(path=path))
+        with self._metrics.stage('upload', rows_in=len(data_frame)) as counters:
+            counters['bytes_written'] = self._upload(data_frame, path, output_format)
+        return path
+
+    def upload_delta(self, data_frame: pd.DataFrame, output_format: str = 'csv', snapshot_every: int = 0,
+                     retention_days: int = delta_output.DEFAULT_RETENTION_DAYS) -> Dict:
+        """
+        Upload only issues/PRs new or changed since last export to object s3 store, see delta_output.write_delta.
+        Returns manifest entry of the delta, errors are raised
+        """
+        start_time = arrow.get(self._last_n_days[0], 'YYYYMMDD')
+        file_name = output_writer.get_output_file_name(start_time, arrow.get(self._last_n_days[-1], 'YYYYMMDD'),
+                                                       output_format)
+        with self._metrics.stage('upload', rows_in=len(data_frame)) as counters:
+            entry = delta_output.write_delta(
+                data_frame, 's3://{bucket}/gh_data/delta'.format(bucket=cc.AWS_S3_BUCKET_NAME), start_time, file_name,
+                output_format, snapshot_every, retention_days, self._upload_options)
+            counters['bytes_written'] = entry['bytes']
+        return entry
+
+    @property
+    def query_plan_summary(self) -> List[Dict]:
+        """
+        Days, estimated GB, wall time and rows of each sub query run within query cost budget
+        """
+        return list(self._query_plan_summary)
+
+    @property
+    def row_counts(self) -> Dict[str, int]:
+        """
+        No of events matched, rows transferred from BQ and rows kept after deduplication so far
+        """
+        return dict(self._row_counts)
+
+    @property
+    def metrics(self) -> run_metrics.RunMetrics:
+        """
+        Wall time, rows, bytes and peak RSS per stage of collection so far
+        """
+        return self._metrics
+
     @property
     def last_n_days(self):
         return self._last_n_days
@@ -0,0 +1,104 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Callable, Dict
+
+import arrow
+import daiquiri
+import fsspec
+
+from src.utils import query_planner
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Units a backfill date range is split into
+BACKFILL_UNITS = ['day', 'week']
+
+
+def split_date_range(start_date: str, end_date: str, unit: str = 'day') -> List[List[str]]:
+    """
+    Split date range (YYYYMMDD, both inclusive) into units of one day or of up to seven days
+    """
+    start, end = arrow.get(start_date, 'YYYYMMDD'), arrow.get(end_date, 'YYYYMMDD')
+    if start > end:
+        raise ValueError('Start date {start} is after end date {end}'.format(start=start_date, end=end_date))
+    days = [dt.format('YYYYMMDD') for dt in arrow.Arrow.range('day', start, end)]
+    return query_planner.split_days(days, unit)
+
+
+def get_unit_key(days: List[str]) -> str:
+    """
+    Get manifest key of unit, e.g. 20200301-20200307
+    """
+    return '{start}-{end}'.format(start=days[0], end=days[-1])
+
+
+def load_manifest(path: str) -> Dict:
+    """
+    Read checkpoint manifest from local path or object store url, empty manifest when it doesn't exist yet
+    """
+    try:
+        with fsspec.open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'units': {}}
+
+
+def save_manifest(manifest: Dict, path: str) -> None:
+    """
+    Write checkpoint manifest to local path or object store url
+    """
+    with fsspec.open(path, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def run_backfill(units: List[List[str]], run_unit: Callable[[List[str]], Dict], manifest_path: str,
+                 max_workers: int = 2, options: Dict = None) -> Dict[str, List[str]]:
+    """
+    Run run_unit for each unit of days with at most max_workers in parallel, skipping units completed by an earlier
+    run with the same options (e.g. ecosystems and output format) according to checkpoint manifest
+
+    run_unit returns details (e.g. output path and rows) of a completed unit, those are recorded in the manifest
+    along with options as soon as the unit completes. A failed unit is logged and left out of the manifest, so a
+    rerun retries it. Units completed with other options are run again. Returns keys of completed, skipped and
+    failed units.
+    """
+    options = options or {}
+    manifest = load_manifest(manifest_path)
+    lock = threading.Lock()
+    result = {'completed': [], 'skipped': [], 'failed': []}
+
+    def _run(days):
+        key = get_unit_key(days)
+        start_time = time.monotonic()
+        try:
+            details = run_unit(days)
+        except Exception as ex:
+            _logger.error('Backfill unit {key} failed. Msg: {msg}'.format(key=key, msg=ex))
+            with lock:
+                result['failed'].append(key)
+            return
+        with lock:
+            manifest['units'][key] = {**details, 'days': days, 'options': options,
+                                      'seconds': round(time.monotonic() - start_time, 2),
+                                      'completed_at': arrow.utcnow().isoformat()}
+            save_manifest(manifest, manifest_path)
+            result['completed'].append(key)
+        _logger.info('Backfill unit {key} completed'.format(key=key))
+
+    pending = []
+    for days in units:
+        # options are compared as read back from json
+        if manifest['units'].get(get_unit_key(days), {}).get('options') == json.loads(json.dumps(options)):
+            result['skipped'].append(get_unit_key(days))
+        else:
+            pending.append(days)
+    _logger.info('Backfill of {n} units, {s} already completed, running {p}'.format(
+        n=len(units), s=len(result['skipped']), p=len(pending)))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(_run, pending))
+    return result
@@ -3,11 +3,26 @@ import logging
 import re
 
 import daiquiri
+import pandas as pd
 from bq_helper import BigQueryHelper
+from google.cloud import bigquery
 
 daiquiri.setup(level=logging.INFO)
 _logger = daiquiri.getLogger(__name__)
 
+# Query params used with parameterized queries, values are passed as BQ query parameters so query text stays stable
+PARAMETERIZED_QUERY_PARAMS = {'{year_suffix_month_day}': 'UNNEST(@table_suffixes)',
+                              '{repo_names}': 'UNNEST(@repo_names)'}
+
+# Key of query params holding the values of those (table_suffixes, repo_names) as lists, not replaced in query text
+QUERY_PARAMETER_VALUES = 'query_parameter_values'
+
+# How issue/PR body is retrieved: as is, truncated to max no of chars, or only its SHA256 hash and length
+BODY_POLICIES = ['full', 'truncate', 'hash']
+
+# Body field of event query template
+_BODY_FIELD = "JSON_EXTRACT_SCALAR(payload, '$.{payload_field_name}.body')"
+
 
 def create_github_bq_client():
     """Create the object for BigQueryHelper"""
@@ -16,15 +31,128 @@ def create_github_bq_client():
     return gh_archive
 
 
+def get_query_parameter_values(query_params):
+    """
+    Get table suffixes and repo names (as lists) query params were built with
+    """
+    return query_params[QUERY_PARAMETER_VALUES]
+
+
+def bq_string_list(values):
+    """
+    Format values as a list of BQ string literals, e.g. "('a', 'b')", escaping quotes and backslashes
+    """
+    return '({values})'.format(values=', '.join(
+        "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'" for value in values))
+
+
+def _get_job_config(query_parameter_values=None, dry_run=False):
+    """
+    Build BQ job config with given parameter values (name -> list of strings)
+    """
+    job_config = bigquery.QueryJobConfig()
+    job_config.dry_run = dry_run
+    if query_parameter_values:
+        job_config.query_parameters = [bigquery.ArrayQueryParameter(name, 'STRING', values)
+                                       for name, values in query_parameter_values.items()]
+    return job_config
+
+
+def estimate_query_size_with_params(bq_client, query, query_parameter_values):
+    """
+    Estimate parameterized query size in GB with a dry run
+    """
+    query_job = bq_client.client.query(query, job_config=_get_job_config(query_parameter_values, dry_run=True))
+    return query_job.total_bytes_processed / 2 ** 30
+
+
+def query_to_pandas_with_params(bq_client, query, query_parameter_values):
+    """
+    Run parameterized query and return the result as pandas dataframe
+    """
+    chunks = list(query_to_data_frame_chunks(bq_client, query, None, query_parameter_values))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def query_to_data_frame_chunks(bq_client, query, page_size, query_parameter_values=None):
+    """
+    Run query and yield the result as pandas dataframes, one result page of at most page_size rows at a time
+    """
+    query_job = bq_client.client.query(query, job_config=_get_job_config(query_parameter_values))
+    rows = query_job.result(timeout=bq_client.max_wait_seconds, page_size=page_size)
+    columns = [field.name for field in rows.schema]
+    for page in rows.pages:
+        page_rows = [list(row.values()) for row in page]
+        if page_rows:
+            yield pd.DataFrame(data=page_rows, columns=columns)
+
+
 def bq_add_query_params(query, params_dict):
     """
     Replace the parameters to build bigdata query
     """
     for i, j in params_dict.items():
-        query = query.replace(i, j)
+        if i != QUERY_PARAMETER_VALUES:
+            query = query.replace(i, j)
     return query
 
 
+def bq_apply_body_policy(query, body_policy='full', body_max_chars=0):
+    """
+    Rewrite body column of event query template according to body policy (see BODY_POLICIES)
+
+    With 'truncate' body is cut to body_max_chars with SUBSTR before whitespace normalization runs on it. With 'hash'
+    body column is replaced by body_sha256 (hex) and body_length (chars) columns.
+    """
+    if body_policy == 'full':
+        return query
+    if body_policy == 'truncate':
+        return query.replace(_BODY_FIELD, 'SUBSTR({field}, 1, {n})'.format(field=_BODY_FIELD, n=int(body_max_chars)))
+    if body_policy == 'hash':
+        body_column = r"TRIM\(REGEXP_REPLACE\(\s*REGEXP_REPLACE\(\s*" + re.escape(_BODY_FIELD) + \
+                      r"[\s\S]*?\)\) as body\b"
+        hash_columns = 'TO_HEX(SHA256({field})) as body_sha256,\n            LENGTH({field}) as body_length'.format(
+            field=_BODY_FIELD)
+        return re.sub(body_column, lambda _: hash_columns, query)
+    raise ValueError('Body policy "{policy}" is not supported, use one of {policies}'.format(
+        policy=body_policy, policies=BODY_POLICIES))
+
+
+def bq_combine_event_types(query, payload_field_names):
+    """
+    Rewrite a single event type query to retrieve all given event types with one table scan
+
+    payload_field_names maps event type to its payload field name, e.g. {'IssuesEvent': 'issue'}. Payload fields
+    are picked per row through a CASE on event type.
+    """
+    def _case_on_type(match):
+        whens = ' '.join(["WHEN '{t}' THEN JSON_EXTRACT_SCALAR(payload, '$.{f}.{path}')".format(
+            t=event_type, f=field_name, path=match.group(1)) for event_type, field_name in payload_field_names.items()])
+        return 'CASE type {whens} END'.format(whens=whens)
+
+    query = re.sub(r"JSON_EXTRACT_SCALAR\(payload, '\$\.\{payload_field_name\}\.([\w.]+)'\)", _case_on_type, query)
+    event_types = '({types})'.format(types=', '.join(["'" + t + "'" for t in payload_field_names]))
+    return query.replace("type = '{event_type}'", 'type IN {types}'.format(types=event_types))
+
+
+def bq_deduplicate_on_server(query, count_column='event_type_events'):
+    """
+    Wrap event query to keep only the last updated record per url on BQ side
+
+    No of events matched per event type before deduplication is returned in count_column.
+    """
+    return """
+    SELECT * EXCEPT(row_num)
+    FROM (
+        SELECT *,
+            ROW_NUMBER() OVER (PARTITION BY url ORDER BY updated_at DESC) as row_num,
+            COUNT(*) OVER (PARTITION BY event_type) as {count_column}
+        FROM ({query})
+    )
+    WHERE row_num = 1
+    """.format(query=query, count_column=count_column)
+
+
 def get_eco_system_with_repo_list(repo_list_url):
     """
     Read the repo-list.json file and make a dictionary that contains ecosystem name as key and repos as value
@@ -40,6 +168,31 @@ def get_eco_system_with_repo_list(repo_list_url):
         return eco_system_with_repo
 
 
+def get_repo_eco_system_index(eco_system_with_repo):
+    """
+    Make a dictionary that contains repo name as key and comma separated ecosystem names as value
+    """
+    repo_eco_systems = dict()
+    for eco_system, repo_names in eco_system_with_repo.items():
+        for repo_name in repo_names:
+            eco_systems = repo_eco_systems.setdefault(repo_name, [])
+            if eco_system not in eco_systems:
+                eco_systems.append(eco_system)
+    return {repo_name: ",".join(eco_systems) for repo_name, eco_systems in repo_eco_systems.items()}
+
+
+def tag_eco_system(repo_names, repo_eco_system_index):
+    """
+    Get ecosystem names for each repo name in the series, untracked repos get empty string
+
+    Lookup is done once per unique repo name and then broadcasted back to all rows.
+    """
+    codes, uniques = pd.factorize(repo_names)
+    # missing repo names get code -1, which picks the trailing empty string
+    eco_systems = pd.Series(pd.Series(uniques).map(repo_eco_system_index).fillna('').tolist() + [''])
+    return pd.Series(eco_systems.take(codes).values, index=repo_names.index)
+
+
 def get_repos_names(gh_repo_links):
     """
     Get all valid repos from the list
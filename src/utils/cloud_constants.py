@@ -12,3 +12,101 @@ BIGQUERY_CREDENTIALS_FILEPATH = os.environ.get('BIGQUERY_CREDENTIALS_FILEPATH',
 
 # File contains repo list for each ecosystem
 REPO_LIST = os.environ.get('REPO_LIST', 'src/utils/data_assets/repo-list.json')
+
+# Local directory or object store url (s3://...) used to cache per day partitions for incremental collection,
+# disabled when empty
+PARTITION_CACHE_DIR = os.environ.get('PARTITION_CACHE_DIR', '')
+
+# Hours after day end (UTC) before a day's GH archive data is considered complete and cached partitions are final
+PARTITION_CACHE_SETTLE_HOURS = int(os.environ.get('PARTITION_CACHE_SETTLE_HOURS', 6))
+
+# Run estimate, issues and pull requests queries concurrently
+CONCURRENT_QUERIES = os.environ.get('CONCURRENT_QUERIES', 'false').lower() == 'true'
+
+# Retrieve issues and pull requests with a single BigQuery scan
+COMBINED_QUERY = os.environ.get('COMBINED_QUERY', 'false').lower() == 'true'
+
+# Format of the output uploaded to object store, one of csv, csv.gz, csv.zst, parquet
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'csv')
+
+# Read query results in pages of this many rows to bound memory, 0 reads the whole result at once
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 0))
+
+# Deduplicate issues/PRs on BigQuery side, transferring only the last updated record per url
+SERVER_DEDUP = os.environ.get('SERVER_DEDUP', 'false').lower() == 'true'
+
+# Pass days and repo names as BigQuery query parameters, keeping query text stable between runs
+PARAMETERIZED_QUERY = os.environ.get('PARAMETERIZED_QUERY', 'false').lower() == 'true'
+
+# Local directory or object store url (s3://...) used to cache query results, disabled when empty. Only an object
+# store url (or a persistent volume) survives retried pods
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', '')
+
+# Query cost guard, window is split into sub queries above MAX_GB_PER_QUERY and run fails above MAX_GB_PER_RUN.
+# 0 disables the guard.
+MAX_GB_PER_QUERY = float(os.environ.get('MAX_GB_PER_QUERY', 0))
+MAX_GB_PER_RUN = float(os.environ.get('MAX_GB_PER_RUN', 0))
+
+# Max no of sub queries run in parallel
+MAX_PARALLEL_QUERIES = int(os.environ.get('MAX_PARALLEL_QUERIES', 2))
+
+# No of processes used to parse and deduplicate events, sharded by repo name. 1 processes events in process
+PROCESS_WORKERS = int(os.environ.get('PROCESS_WORKERS', 1))
+
+# Convert collected frame to compact dtypes (categoricals, nullable integers, UTC datetimes)
+COMPACT_DTYPES = os.environ.get('COMPACT_DTYPES', 'false').lower() == 'true'
+
+# How issue/PR body is retrieved: full, truncate (to BODY_MAX_CHARS chars) or hash (SHA256 and length only)
+BODY_POLICY = os.environ.get('BODY_POLICY', 'full')
+BODY_MAX_CHARS = int(os.environ.get('BODY_MAX_CHARS', 4096))
+
+# Backfill of --start/--end date range: unit each output object covers (day or week), no of units collected in
+# parallel and checkpoint manifest path (defaults to a manifest next to the output in the bucket)
+BACKFILL_UNIT = os.environ.get('BACKFILL_UNIT', 'day')
+MAX_PARALLEL_UNITS = int(os.environ.get('MAX_PARALLEL_UNITS', 2))
+BACKFILL_MANIFEST = os.environ.get('BACKFILL_MANIFEST', '')
+
+# Run report outputs, each disabled when empty: JSON report path (local or object store url), Prometheus textfile
+# path (node exporter textfile collector) and pushgateway url
+RUN_REPORT = os.environ.get('RUN_REPORT', '')
+METRICS_TEXTFILE = os.environ.get('METRICS_TEXTFILE', '')
+PUSHGATEWAY_URL = os.environ.get('PUSHGATEWAY_URL', '')
+
+# Local directory cProfile and tracemalloc snapshots of hot stages are written to, disabled when empty
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '')
+
+# Local directory or mirror url with hourly GH archive files (e.g. 2020-03-01-0.json.gz), events are read from
+# those files instead of BigQuery when set
+GHARCHIVE_DIR = os.environ.get('GHARCHIVE_DIR', '')
+
+# Max no of missing hourly GH archive files of a window, run fails when more (or all) of them are missing
+GHARCHIVE_MAX_MISSING_HOURS = int(os.environ.get('GHARCHIVE_MAX_MISSING_HOURS', 2))
+
+# Shard of the repo list collected by this pod, repos are partitioned by stable hash of repo name. Shard index
+# defaults to the completion index of Kubernetes indexed jobs
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 1))
+SHARD_INDEX = int(os.environ.get('SHARD_INDEX', os.environ.get('JOB_COMPLETION_INDEX', 0)))
+
+# Merge shard outputs instead of collecting, waiting up to MERGE_TIMEOUT_MINUTES for all shards to be written
+MERGE_SHARDS = os.environ.get('MERGE_SHARDS', 'false').lower() == 'true'
+MERGE_TIMEOUT_MINUTES = float(os.environ.get('MERGE_TIMEOUT_MINUTES', 120))
+
+# Id shared by shard pods and merge job of a sharded run, required with more than one shard
+RUN_ID = os.environ.get('RUN_ID', '')
+
+# Last day (YYYYMMDD) of the last N days window, defaults to yesterday. Set it for all pods of a sharded run, so they
+# collect and merge the same window even when they start on different days
+WINDOW_END = os.environ.get('WINDOW_END', '')
+
+# Upload only issues/PRs new or changed since last export, along with a manifest, instead of the full window. A
+# compacted snapshot is written after every DELTA_SNAPSHOT_EVERY deltas (0 disables), index entries older than
+# DELTA_RETENTION_DAYS before the window are dropped
+DELTA_OUTPUT = os.environ.get('DELTA_OUTPUT', 'false').lower() == 'true'
+DELTA_SNAPSHOT_EVERY = int(os.environ.get('DELTA_SNAPSHOT_EVERY', 0))
+DELTA_RETENTION_DAYS = int(os.environ.get('DELTA_RETENTION_DAYS', 30))
+
+# Output is uploaded in parts of UPLOAD_PART_SIZE_MB (at least 5) by UPLOAD_CONCURRENCY threads, every failed request
+# is retried up to UPLOAD_MAX_RETRIES times with exponential backoff
+UPLOAD_PART_SIZE_MB = int(os.environ.get('UPLOAD_PART_SIZE_MB', 64))
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', 4))
+UPLOAD_MAX_RETRIES = int(os.environ.get('UPLOAD_MAX_RETRIES', 5))
@@ -0,0 +1,181 @@
+import json
+import logging
+from typing import Dict, Optional, Tuple
+
+import arrow
+import daiquiri
+import fsspec
+import pandas as pd
+
+from src.utils import event_processing, event_schema, output_writer, s3_upload
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Columns of the index of last exported records
+INDEX_COLUMNS = ['url', 'updated_at', 'content_hash']
+
+# Index entries last updated this many days before the window are dropped, such records can only come back with a
+# newer updated_at and are then exported as new anyway
+DEFAULT_RETENTION_DAYS = 30
+
+
+def _format_value(value) -> Optional[str]:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalize_values(series: pd.Series) -> pd.Series:
+    """
+    Get values of column as strings, the same whichever dtype they are held in (e.g. object, category, Int64 or
+    float with nulls, datetimes), nulls as None
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, utc=True).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return pd.Series([_format_value(value) for value in series.astype(object)], index=series.index, dtype=object)
+
+
+def get_content_hashes(data_frame: pd.DataFrame) -> pd.Series:
+    """
+    Hash content of each record, independent of the dtypes the columns are held in (see normalize_values), so
+    e.g. switching compact dtypes doesn't change hashes
+    """
+    columns = {}
+    for column in sorted(data_frame.columns):
+        series = data_frame[column]
+        # datetimes read back from csv are strings
+        if column in event_schema.DATETIME_COLUMNS and not pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, utc=True)
+        columns[column] = normalize_values(series)
+    return pd.util.hash_pandas_object(pd.DataFrame(columns, index=data_frame.index), index=False)
+
+
+def load_index(path: str) -> pd.DataFrame:
+    """
+    Read index of last exported records (url, updated_at, content_hash), empty index when it doesn't exist yet
+    """
+    try:
+        with fsspec.open(path, 'rb') as file:
+            return pd.read_parquet(file)
+    except FileNotFoundError:
+        return pd.DataFrame({'url': pd.Series(dtype=object), 'updated_at': pd.Series(dtype='datetime64[ns, UTC]'),
+                             'content_hash': pd.Series(dtype='uint64')})
+
+
+def save_index(index: pd.DataFrame, path: str) -> None:
+    with fsspec.open(path, 'wb') as file:
+        index.to_parquet(file, index=False)
+
+
+def load_manifest(path: str) -> Dict:
+    """
+    Read manifest of delta and snapshot outputs, empty manifest when it doesn't exist yet
+    """
+    try:
+        with fsspec.open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'deltas': [], 'snapshots': []}
+
+
+def save_manifest(manifest: Dict, path: str) -> None:
+    with fsspec.open(path, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def compute_delta(data_frame: pd.DataFrame, index: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    Get records new or changed since last export, index updated with them and counts of new, changed and
+    unchanged records
+
+    A record is changed when its content hash differs and it isn't older than the exported one.
+    """
+    data_frame = data_frame.reset_index(drop=True)
+    keys = pd.DataFrame({'url': data_frame.url, 'updated_at': pd.to_datetime(data_frame.updated_at, utc=True),
+                         'content_hash': get_content_hashes(data_frame)})
+    is_new = ~keys.url.isin(index.url)
+    # inner merge keeps order of keys and hashes as uint64, a left merge would turn them into floats
+    exported = keys[~is_new].merge(index, on='url', suffixes=('', '_exported'))
+    is_changed = pd.Series(False, index=keys.index)
+    is_changed[~is_new] = ((exported.content_hash != exported.content_hash_exported) &
+                           (exported.updated_at >= exported.updated_at_exported)).values
+    selected = (is_new | is_changed).values
+
+    exported_keys = keys[selected]
+    new_index = pd.concat([index[~index.url.isin(exported_keys.url)], exported_keys], axis=0, sort=False,
+                          ignore_index=True)
+    counts = {'new': int(is_new.sum()), 'changed': int(is_changed.sum()), 'unchanged': int((~selected).sum())}
+    return data_frame[selected].reset_index(drop=True), new_index.reset_index(drop=True), counts
+
+
+def prune_index(index: pd.DataFrame, window_start: arrow.Arrow, retention_days: int) -> pd.DataFrame:
+    """
+    Drop index entries last updated more than retention_days before window start
+    """
+    cutoff = pd.Timestamp(window_start.shift(days=-retention_days).datetime).tz_convert('UTC')
+    return index[index.updated_at >= cutoff].reset_index(drop=True)
+
+
+def compact(manifest: Dict, output_dir: str, file_name: str, output_format: str, upload_options: Dict = None) -> Dict:
+    """
+    Merge last snapshot with deltas written after it into a new snapshot, keeping the last updated record per url.
+    Returns manifest entry of the snapshot
+    """
+    snapshots = manifest['snapshots']
+    paths = ([snapshots[-1]['path']] if snapshots else []) + \
+        [delta['path'] for delta in manifest['deltas'] if not snapshots or delta['seq'] > snapshots[-1]['seq']]
+    frames = [df for df in (output_writer.read_data_frame(path, output_format) for path in paths) if not df.empty]
+    data_frame = pd.concat(frames, axis=0, sort=False, ignore_index=True) if frames else pd.DataFrame()
+    if not data_frame.empty:
+        data_frame = event_processing.deduplicate_events(event_processing.parse_event_dates(data_frame))
+
+    path = '{dir}/snapshot/{name}'.format(dir=output_dir, name=file_name)
+    s3_upload.write_data_frame(data_frame, path, output_format, **(upload_options or {}))
+    _logger.info('Compacted {n} outputs into snapshot {path} with {rows} rows'.format(n=len(paths), path=path,
+                                                                                      rows=len(data_frame)))
+    return {'path': path, 'rows': len(data_frame), 'seq': manifest['deltas'][-1]['seq'],
+            'created_at': arrow.utcnow().isoformat()}
+
+
+def write_delta(data_frame: pd.DataFrame, output_dir: str, window_start: arrow.Arrow, file_name: str,
+                output_format: str = 'csv', snapshot_every: int = 0, retention_days: int = DEFAULT_RETENTION_DAYS,
+                upload_options: Dict = None) -> Dict:
+    """
+    Write records new or changed since last export to {output_dir}/{file_name} with delta sequence no added to the
+    name (e.g. gh_data_20200301-20200307.delta-12.csv), and record it in the manifest. Returns manifest entry of
+    the delta
+
+    Delta is written first, then the manifest and last the index of exported records, so a failed run is
+    recomputed the same way on rerun. With snapshot_every, a compacted snapshot is written after every
+    snapshot_every deltas. Deltas and snapshots are uploaded to s3:// urls with s3_upload, see
+    s3_upload.write_data_frame for upload_options.
+    """
+    index_path = '{dir}/index.parquet'.format(dir=output_dir)
+    manifest_path = '{dir}/manifest.json'.format(dir=output_dir)
+    index, manifest = load_index(index_path), load_manifest(manifest_path)
+
+    if data_frame.empty:
+        delta, new_index, counts = data_frame, index, {'new': 0, 'changed': 0, 'unchanged': 0}
+    else:
+        delta, new_index, counts = compute_delta(data_frame, index)
+    seq = max([entry['seq'] for entry in manifest['deltas']], default=0) + 1
+    base, ext = file_name.split('.', 1)
+    path = '{dir}/{base}.delta-{seq}.{ext}'.format(dir=output_dir, base=base, seq=seq, ext=ext)
+    bytes_written = s3_upload.write_data_frame(delta, path, output_format, **(upload_options or {}))
+
+    entry = {'path': path, 'seq': seq, 'rows': len(delta), 'bytes': bytes_written, 'window_rows': len(data_frame),
+             'created_at': arrow.utcnow().isoformat(), **counts}
+    manifest['deltas'].append(entry)
+    _logger.info('Delta {path}: {new} new, {changed} changed, {unchanged} unchanged records'.format(path=path,
+                                                                                                   **counts))
+
+    last_snapshot_seq = manifest['snapshots'][-1]['seq'] if manifest['snapshots'] else 0
+    if snapshot_every and len([d for d in manifest['deltas'] if d['seq'] > last_snapshot_seq]) >= snapshot_every:
+        manifest['snapshots'].append(compact(manifest, output_dir, file_name, output_format, upload_options))
+
+    save_manifest(manifest, manifest_path)
+    save_index(prune_index(new_index, window_start, retention_days), index_path)
+    return entry
@@ -0,0 +1,160 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import daiquiri
+import numpy as np
+import pandas as pd
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Event columns parsed as datetimes
+DATE_COLUMNS = ['created_at', 'updated_at', 'closed_at']
+
+# Columns sent to worker processes, text columns never leave the parent process
+KEY_COLUMNS = ['url'] + DATE_COLUMNS
+
+# Column holding position of the event in the frame being processed
+ROW_COLUMN = '_row'
+
+# Frames smaller than this are processed in process, sharding them costs more than it saves
+DEFAULT_MIN_PARALLEL_ROWS = 200000
+
+
+def parse_event_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parse date columns of events, columns already holding datetimes are left as is
+    """
+    for column in DATE_COLUMNS:
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def deduplicate_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    From the duplicate records based on url take the last updated record, ordered by url
+
+    Same result as taking groupby('url').updated_at.idxmax() rows (first record wins ties), but a stable sort is
+    an order of magnitude faster than the per group idxmax for many urls.
+    """
+    df = df[df.url.notna()]
+    return df.sort_values(['url', 'updated_at'], ascending=[True, False], kind='mergesort') \
+        .drop_duplicates('url').reset_index(drop=True)
+
+
+def process_event_shard(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parse dates and deduplicate events
+    """
+    return deduplicate_events(parse_event_dates(df))
+
+
+def get_shard_ids(repo_names: pd.Series, shard_count: int):
+    """
+    Get shard id of every event, stable across processes and runs as it is based on repo name hash
+    """
+    return pd.util.hash_pandas_object(repo_names, index=False).values % shard_count
+
+
+def split_into_shards(df: pd.DataFrame, shard_count: int) -> List[pd.DataFrame]:
+    """
+    Split url and date columns of events, along with event positions, into shards by repo name, so all records of
+    an issue/PR end up in the same shard
+    """
+    keys = df[[column for column in KEY_COLUMNS if column in df.columns]].copy()
+    keys[ROW_COLUMN] = np.arange(len(df))
+    return [shard for _, shard in keys.groupby(get_shard_ids(df.repo_name, shard_count), sort=True)]
+
+
+def _to_ipc(df: pd.DataFrame) -> bytes:
+    """
+    Serialize dataframe as arrow IPC stream, cheaper than pickling string columns
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    writer = pa.RecordBatchStreamWriter(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+def _from_ipc(buf: bytes) -> pd.DataFrame:
+    """
+    Deserialize dataframe from arrow IPC stream
+    """
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(buf).read_all().to_pandas()
+
+
+def _process_event_shard_ipc(buf: bytes) -> bytes:
+    """
+    Process event shard sent as arrow IPC stream in worker process
+    """
+    return _to_ipc(process_event_shard(_from_ipc(buf)))
+
+
+def select_newer_records(df: pd.DataFrame, latest: Dict[str, int]) -> pd.DataFrame:
+    """
+    Get records of deduplicated events whose url isn't in latest (url -> updated_at in ns) or which were updated
+    later than recorded there, and record them in latest. On equal updated_at the recorded one wins, same as in
+    deduplicate_events
+    """
+    urls = df.url.values
+    updated_at = df.updated_at.values.astype('datetime64[ns]').astype('int64')
+    newer = np.fromiter((latest.get(url) is None or ts > latest[url] for url, ts in zip(urls, updated_at)),
+                        dtype=bool, count=len(df))
+    latest.update(zip(urls[newer], updated_at[newer]))
+    return df[newer]
+
+
+def get_process_context():
+    """
+    Get multiprocessing context for process pools. Pools are created from worker threads (e.g. concurrent
+    queries), so workers are started by a forkserver (or spawned where it isn't available) instead of forking a
+    process holding other threads' locks
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def create_process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Create process pool for process_events, to be reused for all frames of a run
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context())
+
+
+def process_events(df: pd.DataFrame, workers: int = 1, min_rows: int = DEFAULT_MIN_PARALLEL_ROWS,
+                   executor: ProcessPoolExecutor = None) -> pd.DataFrame:
+    """
+    Parse dates and deduplicate events, with workers > 1 shards partitioned by repo name are processed in a
+    process pool, given executor or one created for the call
+
+    Only url and date columns are sent to workers (as arrow IPC streams), workers return positions of the kept
+    events along with parsed dates, so large text columns are never serialized. Result is ordered by url, same as
+    processing all events at once.
+    """
+    if workers <= 1 or len(df) < max(min_rows, 1):
+        return process_event_shard(df)
+
+    shards = split_into_shards(df, workers)
+    _logger.info('Processing {n} events in {s} shards'.format(n=len(df), s=len(shards)))
+    if executor is not None:
+        results = list(executor.map(_process_event_shard_ipc, [_to_ipc(shard) for shard in shards]))
+    else:
+        with create_process_pool(workers) as executor:
+            results = list(executor.map(_process_event_shard_ipc, [_to_ipc(shard) for shard in shards]))
+
+    kept = pd.concat([_from_ipc(buf) for buf in results], axis=0, sort=False, ignore_index=True)
+    kept = kept.sort_values('url', kind='mergesort').reset_index(drop=True)
+    result = df.iloc[kept[ROW_COLUMN].values].reset_index(drop=True)
+    for column in DATE_COLUMNS:
+        if column in kept.columns:
+            result[column] = kept[column]
+    return result
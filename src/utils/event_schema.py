@@ -0,0 +1,52 @@
+import logging
+
+import daiquiri
+import pandas as pd
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Low cardinality columns, repeated on every row, kept as categoricals
+CATEGORY_COLUMNS = ['repo_name', 'event_type', 'status', 'creator_name', 'ecosystem']
+
+# Columns BQ returns as strings (JSON_EXTRACT_SCALAR) holding integers, kept as nullable integers
+INTEGER_COLUMNS = ['id', 'number']
+
+# Columns kept as UTC datetimes
+DATETIME_COLUMNS = ['created_at', 'updated_at', 'closed_at']
+
+
+def apply_event_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert collected events to compact dtypes: categoricals for low cardinality columns, nullable integers for
+    id/number and UTC datetimes. Text and columns not in the schema are left as is
+    """
+    columns = {}
+    for column in df.columns:
+        if column in CATEGORY_COLUMNS:
+            columns[column] = df[column].astype('category')
+        elif column in INTEGER_COLUMNS:
+            columns[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+        elif column in DATETIME_COLUMNS:
+            columns[column] = pd.to_datetime(df[column], utc=True)
+        else:
+            columns[column] = df[column]
+    return pd.DataFrame(columns, index=df.index)
+
+
+def get_memory_per_row(df: pd.DataFrame) -> float:
+    """
+    Get memory footprint of dataframe in bytes per row, including referenced python objects
+    """
+    return df.memory_usage(index=False, deep=True).sum() / max(len(df), 1)
+
+
+def log_memory_report(before: pd.DataFrame, after: pd.DataFrame) -> None:
+    """
+    Log memory footprint per row and per column before and after applying event schema
+    """
+    report = pd.DataFrame({'before': before.memory_usage(index=False, deep=True),
+                           'after': after.memory_usage(index=False, deep=True)}).fillna(0) / max(len(before), 1)
+    _logger.info('Memory per row by column (bytes):\n{table}'.format(table=report.round(1).to_string()))
+    _logger.info('Memory per row: {before:.1f} bytes before, {after:.1f} bytes after compact dtypes ({n} rows)'.format(
+        before=get_memory_per_row(before), after=get_memory_per_row(after), n=len(after)))
@@ -0,0 +1,215 @@
+import gzip
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Iterator, Optional, Tuple
+
+import arrow
+import daiquiri
+import fsspec
+import pandas as pd
+
+from src.utils import event_processing
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Columns extracted from each event, same as the event query projection
+EVENT_COLUMNS = ['repo_name', 'event_type', 'status', 'id', 'number', 'api_url', 'url', 'creator_name', 'creator_url',
+                 'created_at', 'updated_at', 'closed_at', 'title', 'body']
+
+# Payload fields extracted from the issue/PR object of the event payload, by column
+PAYLOAD_FIELDS = {'id': ['id'], 'number': ['number'], 'api_url': ['url'], 'url': ['html_url'],
+                  'creator_name': ['user', 'login'], 'creator_url': ['user', 'html_url'],
+                  'created_at': ['created_at'], 'updated_at': ['updated_at'], 'closed_at': ['closed_at']}
+
+# Default min no of events per chunk yielded by read_events
+DEFAULT_BATCH_ROWS = 100000
+
+# Default max no of missing hourly files tolerated by read_events, GH archive has a few gaps
+DEFAULT_MAX_MISSING_HOURS = 2
+
+# Top level repo of GH archive events, which comes before the payload in every line. Lines where it isn't found
+# this way are parsed in full
+_REPO_PATTERN = re.compile(rb'"repo":\{"id":\d+,"name":"([^"]+)"')
+
+# Whitespace as matched by \s of BQ (RE2) regular expressions
+_LINE_BREAKS = re.compile(r'\r\n|\r|\n')
+_SPACES = re.compile(r'[\t\n\f\r ]{2,}')
+
+# Set up once per worker process by _init_worker
+_worker_filter = {}
+
+
+def get_hour_file_paths(source: str, days: List[str]) -> List[str]:
+    """
+    Get paths of hourly GH archive files (e.g. 2020-03-01-0.json.gz) of given days (YYYYMMDD) in a local
+    directory or mirror url
+    """
+    return ['{source}/{day}-{hour}.json.gz'.format(source=source.rstrip('/'),
+                                                   day=arrow.get(day, 'YYYYMMDD').format('YYYY-MM-DD'), hour=hour)
+            for day in days for hour in range(24)]
+
+
+def _get_scalar(value) -> Optional[str]:
+    """
+    Convert JSON value the way JSON_EXTRACT_SCALAR does: scalars as strings, objects and arrays as null
+    """
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _get_path(obj, path: List[str]):
+    for key in path:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def normalize_text(text: Optional[str]) -> Optional[str]:
+    """
+    Normalize whitespace of title/body the way the event query does
+    """
+    if text is None:
+        return None
+    return _SPACES.sub(' ', _LINE_BREAKS.sub(' ', text)).strip()
+
+
+def extract_event(event: dict, body_policy: str = 'full', body_max_chars: int = 0) -> dict:
+    """
+    Extract event query columns from a parsed IssuesEvent/PullRequestEvent, body as per body policy (see
+    bq_client_helper.BODY_POLICIES)
+    """
+    payload = event.get('payload') or {}
+    item = payload.get('issue' if event.get('type') == 'IssuesEvent' else 'pull_request') or {}
+    row = {'repo_name': _get_scalar(_get_path(event, ['repo', 'name'])),
+           'event_type': event.get('type'),
+           'status': _get_scalar(payload.get('action')),
+           'title': normalize_text(_get_scalar(item.get('title')))}
+    row.update({column: _get_scalar(_get_path(item, path)) for column, path in PAYLOAD_FIELDS.items()})
+
+    body = _get_scalar(item.get('body'))
+    if body_policy == 'hash':
+        row['body_sha256'] = hashlib.sha256(body.encode('utf-8')).hexdigest() if body is not None else None
+        row['body_length'] = len(body) if body is not None else None
+    else:
+        if body_policy == 'truncate' and body is not None:
+            body = body[:body_max_chars]
+        row['body'] = normalize_text(body)
+    return row
+
+
+def parse_lines(lines: Iterable[bytes], repo_names: set, event_types: List[str], body_policy: str = 'full',
+                body_max_chars: int = 0) -> List[dict]:
+    """
+    Extract events of given types and repos from GH archive JSON lines
+
+    Lines are filtered on event type and repo name with byte patterns before they are parsed, so only events of
+    tracked repos are decoded.
+    """
+    type_pattern = re.compile(b'"type":"(?:' + b'|'.join(t.encode('utf-8') for t in event_types) + b')"')
+    rows = []
+    for line in lines:
+        if not type_pattern.search(line):
+            continue
+        match = _REPO_PATTERN.search(line)
+        if match and match.group(1).decode('utf-8') not in repo_names:
+            continue
+        event = json.loads(line)
+        if event.get('type') in event_types and _get_path(event, ['repo', 'name']) in repo_names:
+            rows.append(extract_event(event, body_policy, body_max_chars))
+    return rows
+
+
+def _read_hour_file(path: str, repo_names: set, event_types: List[str], body_policy: str = 'full',
+                    body_max_chars: int = 0) -> Tuple[pd.DataFrame, bool]:
+    """
+    Read events of given types and repos from an hourly GH archive file, returns events and whether file was missing
+    """
+    missing = False
+    try:
+        with fsspec.open(path, 'rb') as file, gzip.GzipFile(fileobj=file) as lines:
+            rows = parse_lines(lines, repo_names, event_types, body_policy, body_max_chars)
+    except FileNotFoundError:
+        _logger.warning('GH archive file {path} not found, skipping it'.format(path=path))
+        rows, missing = [], True
+    columns = EVENT_COLUMNS if body_policy != 'hash' else \
+        [c for c in EVENT_COLUMNS if c != 'body'] + ['body_sha256', 'body_length']
+    return pd.DataFrame(rows, columns=columns), missing
+
+
+def read_hour_file(path: str, repo_names: set, event_types: List[str], body_policy: str = 'full',
+                   body_max_chars: int = 0) -> pd.DataFrame:
+    """
+    Read events of given types and repos from an hourly GH archive file, missing files are skipped
+    """
+    return _read_hour_file(path, repo_names, event_types, body_policy, body_max_chars)[0]
+
+
+def _init_worker(repo_names: set, event_types: List[str], body_policy: str, body_max_chars: int) -> None:
+    _worker_filter.update(repo_names=repo_names, event_types=event_types, body_policy=body_policy,
+                          body_max_chars=body_max_chars)
+
+
+def _read_hour_file_in_worker(path: str) -> Tuple[pd.DataFrame, bool]:
+    return _read_hour_file(path, **_worker_filter)
+
+
+def _check_missing(results: Iterable[Tuple[pd.DataFrame, bool]], file_count: int,
+                   max_missing_hours: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield events of read files, raises RuntimeError once more than max_missing_hours files (or all of them) are
+    found missing, so a broken mirror doesn't pass for a window without events
+    """
+    missing = 0
+    for df, is_missing in results:
+        missing += is_missing
+        if missing > max_missing_hours:
+            raise RuntimeError('{n} of {count} GH archive files are missing, more than {max} allowed'.format(
+                n=missing, count=file_count, max=max_missing_hours))
+        yield df
+    if file_count and missing == file_count:
+        raise RuntimeError('All {count} GH archive files are missing'.format(count=file_count))
+
+
+def _batch(frames: Iterable[pd.DataFrame], batch_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Concat frames into batches of at least batch_rows rows
+    """
+    batch, rows = [], 0
+    for df in frames:
+        batch.append(df)
+        rows += len(df)
+        if rows >= batch_rows:
+            yield pd.concat(batch, axis=0, sort=False, ignore_index=True)
+            batch, rows = [], 0
+    if rows:
+        yield pd.concat(batch, axis=0, sort=False, ignore_index=True)
+
+
+def read_events(paths: List[str], repo_names: set, event_types: List[str], workers: int = 1,
+                body_policy: str = 'full', body_max_chars: int = 0, batch_rows: int = DEFAULT_BATCH_ROWS,
+                max_missing_hours: int = DEFAULT_MAX_MISSING_HOURS) -> Iterator[pd.DataFrame]:
+    """
+    Read events of given types and repos from hourly GH archive files, yielded in chunks of at least batch_rows
+    events as files are read. Missing files are skipped, but RuntimeError is raised when more than
+    max_missing_hours files or all of them are missing
+
+    With workers > 1 files are read in a process pool, each worker gets the repo name set once.
+    """
+    filter_args = (set(repo_names), list(event_types), body_policy, body_max_chars)
+    if workers <= 1:
+        results = (_read_hour_file(path, *filter_args) for path in paths)
+        yield from _batch(_check_missing(results, len(paths), max_missing_hours), batch_rows)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=event_processing.get_process_context(),
+                             initializer=_init_worker, initargs=filter_args) as executor:
+        results = executor.map(_read_hour_file_in_worker, paths)
+        yield from _batch(_check_missing(results, len(paths), max_missing_hours), batch_rows)
@@ -0,0 +1,135 @@
+import gzip
+import logging
+
+import daiquiri
+import fsspec
+import pandas as pd
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Supported output formats, format name is also used as file extension
+OUTPUT_FORMATS = ['csv', 'csv.gz', 'csv.zst', 'parquet']
+
+# No of rows serialized at once, bounds memory used by serialized output
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def get_output_file_name(start_time, end_time, output_format: str = 'csv', shard_index: int = 0,
+                         shard_count: int = 1, run_id: str = '') -> str:
+    """
+    Get output file name for given date range, e.g. gh_data_20200301-20200303.csv, or for a shard of the repo list
+    collected by given run, e.g. gh_data_20200301-20200303.shard-0-of-4.run-a1b2.csv
+    """
+    shard = '.shard-{i}-of-{n}'.format(i=shard_index, n=shard_count) if shard_count > 1 else ''
+    if shard and run_id:
+        shard += '.run-{run_id}'.format(run_id=run_id)
+    return "gh_data_{days}{shard}.{ext}".format(
+        days='-'.join([start_time.format('YYYYMMDD'), end_time.format('YYYYMMDD')]), shard=shard, ext=output_format)
+
+
+def _iter_chunks(data_frame: pd.DataFrame, chunk_size: int):
+    """
+    Iterate over dataframe in chunks of chunk_size rows
+    """
+    for start in range(0, len(data_frame), chunk_size):
+        yield data_frame.iloc[start:start + chunk_size]
+
+
+def _write_csv(data_frame: pd.DataFrame, file, chunk_size: int) -> None:
+    """
+    Write dataframe as csv into binary file object, chunk by chunk
+    """
+    for i, chunk in enumerate(_iter_chunks(data_frame, chunk_size)):
+        file.write(chunk.to_csv(index=False, header=(i == 0)).encode('utf-8'))
+
+
+def _get_arrow_schema(data_frame: pd.DataFrame):
+    """
+    Get arrow schema for dataframe, datetime columns are kept as timestamps and other non numeric columns
+    (including categoricals) as strings
+    """
+    import pyarrow as pa
+
+    fields = []
+    for name, dtype in data_frame.dtypes.items():
+        if pd.api.types.is_datetime64tz_dtype(dtype):
+            arrow_type = pa.timestamp('ns', tz=str(dtype.tz))
+        elif pd.api.types.is_datetime64_dtype(dtype):
+            arrow_type = pa.timestamp('ns')
+        elif pd.api.types.is_extension_array_dtype(dtype) and pd.api.types.is_integer_dtype(dtype):
+            arrow_type = pa.int64()
+        elif pd.api.types.is_categorical_dtype(dtype):
+            arrow_type = pa.string()
+        elif pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+            arrow_type = pa.from_numpy_dtype(dtype)
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _write_parquet(data_frame: pd.DataFrame, file, chunk_size: int) -> None:
+    """
+    Write dataframe as parquet into binary file object, one row group per chunk
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _get_arrow_schema(data_frame)
+    categorical_columns = {name: object for name, dtype in data_frame.dtypes.items()
+                           if pd.api.types.is_categorical_dtype(dtype)}
+    with pq.ParquetWriter(file, schema, compression='snappy') as writer:
+        for chunk in _iter_chunks(data_frame, chunk_size):
+            if categorical_columns:
+                chunk = chunk.astype(categorical_columns)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def write_data_frame(data_frame: pd.DataFrame, path: str, output_format: str = 'csv',
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write dataframe to local path or object store url (s3://...) in given output format, returns no of bytes written
+
+    Output is serialized and written chunk by chunk, so only one chunk is held in memory in serialized form.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError('Output format "{fmt}" is not supported, use one of {formats}'.format(
+            fmt=output_format, formats=OUTPUT_FORMATS))
+
+    with fsspec.open(path, 'wb') as file:
+        if output_format == 'parquet':
+            _write_parquet(data_frame, file, chunk_size)
+        elif output_format == 'csv.gz':
+            with gzip.GzipFile(fileobj=file, mode='wb') as gzip_file:
+                _write_csv(data_frame, gzip_file, chunk_size)
+        elif output_format == 'csv.zst':
+            import zstandard
+            with zstandard.ZstdCompressor().stream_writer(file, closefd=False) as zstd_file:
+                _write_csv(data_frame, zstd_file, chunk_size)
+        else:
+            _write_csv(data_frame, file, chunk_size)
+        bytes_written = file.tell()
+    _logger.info('Written {n} rows to {path}'.format(n=len(data_frame), path=path))
+    return bytes_written
+
+
+def read_data_frame(path: str, output_format: str = 'csv') -> pd.DataFrame:
+    """
+    Read dataframe written by write_data_frame from local path or object store url, dates are left as written
+
+    CSV columns are read as strings, so columns with nulls (e.g. id, number) aren't turned into floats and are
+    written back the same way.
+    """
+    with fsspec.open(path, 'rb') as file:
+        if output_format == 'parquet':
+            return pd.read_parquet(file)
+        try:
+            if output_format == 'csv.zst':
+                import zstandard
+                with zstandard.ZstdDecompressor().stream_reader(file) as zstd_file:
+                    return pd.read_csv(zstd_file, dtype=str)
+            return pd.read_csv(file, compression='gzip' if output_format == 'csv.gz' else None, dtype=str)
+        except pd.errors.EmptyDataError:
+            # nothing was written, e.g. no events in the window
+            return pd.DataFrame()
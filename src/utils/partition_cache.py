@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+from typing import List, Iterable, Dict
+
+import arrow
+import daiquiri
+import fsspec
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+
+def get_repo_list_hash(repo_names: Iterable[str]) -> str:
+    """
+    Build a short stable hash for the given repo names, order of the names doesn't matter
+    """
+    digest = hashlib.sha1('\n'.join(sorted(repo_names)).encode('utf-8')).hexdigest()
+    return digest[:12]
+
+
+def get_options_hash(options: Dict) -> str:
+    """
+    Build a short stable hash for the given collection options (e.g. body policy), order of the keys doesn't matter
+    """
+    return hashlib.sha1(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def get_partition_path(cache_dir: str, day: str, eco_systems: List[str], repo_list_hash: str,
+                       options: Dict = None) -> str:
+    """
+    Get path of the cached partition for given day (YYYYMMDD), ecosystems, repo list hash and the collection
+    options changing the content of a partition, so partitions collected with other options are never served
+    """
+    eco_key = '+'.join(sorted(set(eco_systems)))
+    options_key = [get_options_hash(options)] if options else []
+    return os.path.join(cache_dir, eco_key, repo_list_hash, *options_key, '{day}.pkl.gz'.format(day=day))
+
+
+def get_query_result_path(cache_dir: str, query: str, query_parameter_values: Dict[str, List[str]] = None) -> str:
+    """
+    Get path of the cached result of given query, keyed on normalized query text and query parameter values
+    """
+    normalized_query = ' '.join(query.split())
+    key = json.dumps([normalized_query, query_parameter_values or {}], sort_keys=True)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'results', '{digest}.pkl.gz'.format(digest=digest))
+
+
+def is_partition_fresh(path: str, day: str, settle_hours: int) -> bool:
+    """
+    Check cached partition exists and was written once the day was complete in GH archive
+
+    Partitions written before the day end (UTC) plus settle_hours may miss late events, those are stale.
+    """
+    modified_at = get_modified_time(path)
+    if modified_at is None:
+        return False
+    settled_at = arrow.get(day, 'YYYYMMDD').shift(days=1, hours=settle_hours)
+    return modified_at >= settled_at
+
+
+def _is_local(path: str) -> bool:
+    return '://' not in path
+
+
+def get_modified_time(path: str):
+    """
+    Get last modified time of cached partition in local directory or object store (s3://...), None when missing
+    """
+    if _is_local(path):
+        return arrow.get(os.path.getmtime(path)) if os.path.isfile(path) else None
+    fs = fsspec.get_fs_token_paths(path)[0]
+    if not fs.exists(path):
+        return None
+    info = fs.info(path)
+    # key holding modified time differs by filesystem, e.g. LastModified for s3
+    return arrow.get(next(info[key] for key in ['LastModified', 'mtime', 'created'] if info.get(key) is not None))
+
+
+def load_partition(path: str):
+    """
+    Read cached partition, usually a pandas dataframe, from local directory or object store
+    """
+    _logger.debug('Reading cached partition {path}'.format(path=path))
+    with fsspec.open(path, 'rb') as file, gzip.GzipFile(fileobj=file) as gzip_file:
+        return pickle.load(gzip_file)
+
+
+def save_partition(data_frame, path: str) -> None:
+    """
+    Save dataframe (or any picklable object) as cached partition in local directory or object store. Local
+    partitions are written to temp file first to avoid partial writes, object store writes are atomic anyway
+    """
+    data = gzip.compress(pickle.dumps(data_frame, protocol=pickle.HIGHEST_PROTOCOL))
+    if _is_local(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '{path}.tmp'.format(path=path)
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    else:
+        with fsspec.open(path, 'wb') as file:
+            file.write(data)
+    _logger.debug('Saved partition {path}'.format(path=path))
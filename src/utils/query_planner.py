@@ -0,0 +1,106 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Callable, Tuple, Dict
+
+import daiquiri
+import pandas as pd
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+
+def split_days(days: List[str], unit: str) -> List[List[str]]:
+    """
+    Split days (YYYYMMDD, ascending) into sub windows of one day or of up to seven days
+    """
+    size = 7 if unit == 'week' else 1
+    return [days[i:i + size] for i in range(0, len(days), size)]
+
+
+def plan_sub_windows(days: List[str], estimate_gb: Callable[[List[str]], float], max_gb_per_query: float = 0) \
+        -> List[Tuple[List[str], float]]:
+    """
+    Plan sub windows (days, estimated GB) so that each sub query stays within max_gb_per_query
+
+    The whole window is used when it fits, else it is split into weeks and weeks that still don't fit into days.
+    A single day over budget can't be split further, it is planned as is with a warning.
+    """
+    qsize = estimate_gb(days)
+    if not max_gb_per_query or qsize <= max_gb_per_query:
+        return [(days, qsize)]
+
+    _logger.info('Query cost {qc:.2f} GB exceeds {max:.2f} GB per query, splitting window'.format(
+        qc=qsize, max=max_gb_per_query))
+    plan = []
+    for week in split_days(days, 'week'):
+        qsize = estimate_gb(week)
+        if qsize <= max_gb_per_query or len(week) == 1:
+            plan.append((week, qsize))
+        else:
+            plan.extend([(day, estimate_gb(day)) for day in split_days(week, 'day')])
+
+    _warn_over_budget(plan, max_gb_per_query)
+    return plan
+
+
+def plan_days(days: List[str], estimate_gb: Callable[[List[str]], float], max_gb_per_query: float = 0) \
+        -> List[Tuple[List[str], float]]:
+    """
+    Plan one sub window (days, estimated GB) per day, e.g. for days missing in the partition cache which is kept
+    per day. Days over max_gb_per_query can't be split further, they are planned as is with a warning
+    """
+    plan = [(day, estimate_gb(day)) for day in split_days(days, 'day')]
+    _warn_over_budget(plan, max_gb_per_query)
+    return plan
+
+
+def _warn_over_budget(plan: List[Tuple[List[str], float]], max_gb_per_query: float) -> None:
+    for sub_days, qsize in plan:
+        if max_gb_per_query and qsize > max_gb_per_query:
+            _logger.warning('Query cost {qc:.2f} GB for day {day} exceeds {max:.2f} GB per query'.format(
+                qc=qsize, day=sub_days[0], max=max_gb_per_query))
+
+
+def check_run_budget(plan: List[Tuple[List[str], float]], max_gb_per_run: float, queries_per_window: int = 1) -> float:
+    """
+    Get estimated GB for the whole plan, raise RuntimeError when it exceeds max_gb_per_run
+    """
+    total_gb = sum(qsize for _, qsize in plan) * queries_per_window
+    if max_gb_per_run and total_gb > max_gb_per_run:
+        raise RuntimeError('Estimated query cost {qc:.2f} GB exceeds run budget of {max:.2f} GB'.format(
+            qc=total_gb, max=max_gb_per_run))
+    return total_gb
+
+
+def execute_plan(plan: List[Tuple[List[str], float]], run_sub_query: Callable[[List[str]], pd.DataFrame],
+                 max_workers: int = 2, queries_per_window: int = 1) -> Tuple[List[pd.DataFrame], List[Dict]]:
+    """
+    Run sub query for each planned sub window with at most max_workers in parallel
+
+    Returns data frames in plan order along with summary (days, estimated GB, wall time, rows) of each sub query.
+    Estimated GB covers all queries_per_window queries run for a sub window, the same as check_run_budget.
+    """
+    def _run(sub_days):
+        start_time = time.monotonic()
+        df = run_sub_query(sub_days)
+        return df, time.monotonic() - start_time
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(_run, [sub_days for sub_days, _ in plan]))
+
+    summary = [{'days': '{start}-{end}'.format(start=sub_days[0], end=sub_days[-1]),
+                'estimated_gb': round(qsize * queries_per_window, 3),
+                'wall_seconds': round(seconds, 2), 'rows': len(df)}
+               for (sub_days, qsize), (df, seconds) in zip(plan, results)]
+    return [df for df, _ in results], summary
+
+
+def log_summary(summary: List[Dict]) -> None:
+    """
+    Log sub query summary along with totals
+    """
+    _logger.info('Query plan summary:\n{table}'.format(table=pd.DataFrame(summary).to_string(index=False)))
+    _logger.info('Total scanned GB={gb:.2f}, wall time of sub queries={s:.2f} seconds, rows={rows}'.format(
+        gb=sum(item['estimated_gb'] for item in summary), s=sum(item['wall_seconds'] for item in summary),
+        rows=sum(item['rows'] for item in summary)))
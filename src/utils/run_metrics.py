@@ -0,0 +1,254 @@
+import cProfile
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, List
+
+import arrow
+import daiquiri
+import fsspec
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# Counters recorded per stage, besides wall time and no of calls. frame_bytes is the in memory size of fetched
+# frames, not bytes on the wire
+STAGE_COUNTERS = ['rows_in', 'rows_out', 'bytes_scanned', 'frame_bytes', 'bytes_written']
+
+# Stages profiled with --profile
+DEFAULT_PROFILE_STAGES = ['fetch', 'parse', 'dedup', 'parse_dedup', 'merge', 'tag', 'upload']
+
+# Prefix of Prometheus metric names
+METRIC_PREFIX = 'osa_collector'
+
+
+def get_peak_rss_bytes() -> int:
+    """
+    Get peak resident set size of the process so far
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_rss_bytes() -> int:
+    """
+    Get current resident set size of the process, falls back to the peak where /proc isn't available
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return get_peak_rss_bytes()
+
+
+class RunMetrics:
+    """
+    Wall time, rows, bytes and RSS growth per stage of a collector run
+
+    Stages can run in several threads at once, their records are summed up. Memory of a stage is recorded as the
+    largest growth of process RSS over a call (rss_delta_bytes, also counting other threads running at the same
+    time) and, for its traced call, the tracemalloc peak (traced_peak_bytes). When a profile directory is set,
+    stages in profile_stages are run under one cProfile profiler per stage, aggregating all calls (e.g. every page
+    of fetch), dumped as {stage}.prof by write_profiles. Memory allocations are traced only during the first call
+    of each profiled stage, its tracemalloc snapshot is dumped as {stage}.tracemalloc.
+    """
+
+    def __init__(self, profile_dir: str = '', profile_stages: List[str] = None):
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._start_time = time.monotonic()
+        self._profile_dir = profile_dir
+        self._profile_stages = set(profile_stages or DEFAULT_PROFILE_STAGES)
+        # profiler per stage, stages being profiled right now and stages traced by tracemalloc so far
+        self._profilers, self._active_profiles, self._traced_stages = {}, set(), set()
+        self._tracing_count = 0
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def _get_stage(self, name: str) -> Dict:
+        return self._stages.setdefault(name, {**{'seconds': 0.0, 'calls': 0, 'rss_delta_bytes': 0},
+                                              **{c: 0 for c in STAGE_COUNTERS}})
+
+    def add(self, name: str, seconds: float = 0.0, calls: int = 0, rss_delta_bytes: int = 0, **counters) -> None:
+        """
+        Add time and counters (see STAGE_COUNTERS) to stage, rss_delta_bytes of a call is kept when largest so far
+        """
+        with self._lock:
+            stage = self._get_stage(name)
+            stage['seconds'] += seconds
+            stage['calls'] += calls
+            stage['rss_delta_bytes'] = max(stage['rss_delta_bytes'], int(rss_delta_bytes))
+            for counter, value in counters.items():
+                stage[counter] += int(value or 0)
+
+    @contextmanager
+    def stage(self, name: str, **counters):
+        """
+        Time the block as a call of given stage, yields dict the block can set counters in
+        """
+        counters = dict(counters)
+        profiler = self._start_profile(name)
+        start_rss, start_time = get_rss_bytes(), time.monotonic()
+        try:
+            yield counters
+        finally:
+            seconds = time.monotonic() - start_time
+            self._stop_profile(name, profiler)
+            self.add(name, seconds, 1, get_rss_bytes() - start_rss, **counters)
+
+    def timed_chunks(self, name: str, chunks):
+        """
+        Yield chunks (dataframes) timing the time spent getting each as given stage, counting rows and in memory
+        size of the chunks
+        """
+        iterator = iter(chunks)
+        while True:
+            profiler = self._start_profile(name)
+            start_rss, start_time = get_rss_bytes(), time.monotonic()
+            chunk = next(iterator, None)
+            seconds = time.monotonic() - start_time
+            self._stop_profile(name, profiler)
+            rss_delta = get_rss_bytes() - start_rss
+            if chunk is None:
+                # time spent finding out there are no more chunks is not a call of its own
+                self.add(name, seconds, rss_delta_bytes=rss_delta)
+                return
+            self.add(name, seconds, 1, rss_delta, rows_out=len(chunk),
+                     frame_bytes=chunk.memory_usage(index=False, deep=True).sum())
+            yield chunk
+
+    def _start_profile(self, name: str):
+        """
+        Enable profiler of stage, returns (profiler, traced) or None when stage isn't profiled
+        """
+        if not self._profile_dir or name not in self._profile_stages:
+            return None
+        with self._lock:
+            if name in self._active_profiles:
+                # same stage runs in other thread at the same time
+                return None
+            profiler = self._profilers.setdefault(name, cProfile.Profile())
+            traced = name not in self._traced_stages
+            if traced:
+                self._traced_stages.add(name)
+                self._tracing_count += 1
+                if self._tracing_count == 1:
+                    tracemalloc.start()
+            self._active_profiles.add(name)
+        try:
+            profiler.enable()
+        except ValueError:
+            # another stage is profiled in other thread at the same time
+            profiler = None
+        return profiler, traced
+
+    def _stop_profile(self, name: str, profile) -> None:
+        if profile is None:
+            return
+        profiler, traced = profile
+        if profiler is not None:
+            profiler.disable()
+        if traced:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            with self._lock:
+                self._get_stage(name)['traced_peak_bytes'] = traced_peak
+            path = os.path.join(self._profile_dir, '{name}.tracemalloc'.format(name=name))
+            tracemalloc.take_snapshot().dump(path)
+            _logger.info('Memory snapshot of stage {name} written to {path}'.format(name=name, path=path))
+        with self._lock:
+            self._active_profiles.discard(name)
+            if traced:
+                self._tracing_count -= 1
+                if not self._tracing_count:
+                    tracemalloc.stop()
+
+    def write_profiles(self) -> None:
+        """
+        Dump profile of each profiled stage, aggregated over all of its calls, as {stage}.prof
+        """
+        with self._lock:
+            profilers = dict(self._profilers)
+        for name, profiler in profilers.items():
+            path = os.path.join(self._profile_dir, '{name}.prof'.format(name=name))
+            profiler.dump_stats(path)
+            _logger.info('Profile of stage {name} written to {path}'.format(name=name, path=path))
+
+    def to_dict(self, success: bool = True) -> Dict:
+        """
+        Get run report
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+        return {'started_at': arrow.get(self._started_at).isoformat(),
+                'seconds': round(time.monotonic() - self._start_time, 3),
+                'success': success,
+                'peak_rss_bytes': get_peak_rss_bytes(),
+                'stages': stages}
+
+    def to_prometheus(self, success: bool = True) -> str:
+        """
+        Get run report in Prometheus text exposition format, as read by node exporter textfile collector and
+        pushgateway
+        """
+        report = self.to_dict(success)
+        lines = []
+
+        def _add_metric(name, help_text, samples):
+            lines.append('# HELP {p}_{name} {help}'.format(p=METRIC_PREFIX, name=name, help=help_text))
+            lines.append('# TYPE {p}_{name} gauge'.format(p=METRIC_PREFIX, name=name))
+            for labels, value in samples:
+                lines.append('{p}_{name}{labels} {value}'.format(p=METRIC_PREFIX, name=name, labels=labels,
+                                                                 value=value))
+
+        _add_metric('run_seconds', 'Wall time of the run', [('', report['seconds'])])
+        _add_metric('run_success', '1 when the run completed', [('', int(success))])
+        _add_metric('run_timestamp_seconds', 'Unix time the run started at', [('', round(self._started_at, 3))])
+        _add_metric('peak_rss_bytes', 'Peak resident set size of the run', [('', report['peak_rss_bytes'])])
+        for field in ['seconds', 'calls', 'rss_delta_bytes'] + STAGE_COUNTERS:
+            _add_metric('stage_{field}'.format(field=field), '{field} of collector stage'.format(field=field),
+                        [('{{stage="{name}"}}'.format(name=name), stage[field])
+                         for name, stage in sorted(report['stages'].items())])
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path: str, success: bool = True) -> None:
+        """
+        Write run report as JSON to local path or object store url
+        """
+        with fsspec.open(path, 'w') as file:
+            json.dump(self.to_dict(success), file, indent=2, sort_keys=True)
+        _logger.info('Run report written to {path}'.format(path=path))
+
+    def write_prometheus_textfile(self, path: str, success: bool = True) -> None:
+        """
+        Write run report in Prometheus text format, atomically so the textfile collector never reads a partial file
+        """
+        tmp_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        with open(tmp_path, 'w') as file:
+            file.write(self.to_prometheus(success))
+        os.replace(tmp_path, path)
+
+    def push_to_gateway(self, url: str, job: str = 'osa_data_collector', success: bool = True) -> None:
+        """
+        Push run report to Prometheus pushgateway, replacing metrics of earlier runs of the job
+        """
+        request = urllib.request.Request('{url}/metrics/job/{job}'.format(url=url.rstrip('/'), job=job),
+                                         data=self.to_prometheus(success).encode('utf-8'), method='PUT',
+                                         headers={'Content-Type': 'text/plain; version=0.0.4'})
+        with urllib.request.urlopen(request, timeout=30):
+            pass
+
+    def log_summary(self) -> None:
+        """
+        Log time and rows of each stage
+        """
+        for name, stage in sorted(self.to_dict()['stages'].items(), key=lambda item: -item[1]['seconds']):
+            _logger.info('Stage {name}: {seconds:.2f} seconds in {calls} calls, rows in/out {rows_in}/{rows_out}, '
+                         'bytes scanned/in frames/written {bytes_scanned}/{frame_bytes}/{bytes_written}, '
+                         'RSS growth {rss_delta_bytes}'
+                         .format(name=name, **stage))
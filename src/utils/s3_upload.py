@@ -0,0 +1,230 @@
+import base64
+import hashlib
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Tuple
+
+import daiquiri
+import pandas as pd
+
+from src.utils import output_writer
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+# S3 rejects multipart parts smaller than this, except the last one
+MIN_PART_SIZE = 5 * 2 ** 20
+
+DEFAULT_PART_SIZE = 64 * 2 ** 20
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+
+# Backoff before first retry, doubled for every next retry
+DEFAULT_BACKOFF_SECONDS = 1.0
+
+# Error codes of throttled or transiently failed requests, retried along with 5xx and connection errors
+RETRYABLE_ERROR_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestThrottled', 'TooManyRequests',
+                         'RequestLimitExceeded', 'BandwidthLimitExceeded', 'RequestTimeout', 'RequestTimeoutException',
+                         'PriorRequestNotComplete', 'InternalError', 'ServiceUnavailable'}
+
+
+class ChecksumMismatchError(RuntimeError):
+    """
+    ETag returned by S3 doesn't match local md5 digest
+    """
+
+
+def create_s3_client():
+    """
+    Create boto3 S3 client, credentials are read from AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY the same way s3fs does
+    """
+    import boto3
+    return boto3.client('s3')
+
+
+def split_s3_url(url: str) -> Tuple[str, str]:
+    """
+    Split s3://bucket/key url into bucket and key
+    """
+    if not url.startswith('s3://') or '/' not in url[5:]:
+        raise ValueError('"{url}" is not an s3://bucket/key url'.format(url=url))
+    bucket, key = url[5:].split('/', 1)
+    return bucket, key
+
+
+def get_md5(data: bytes) -> Tuple[bytes, str]:
+    """
+    Get md5 digest of data along with its base64 encoding as sent in Content-MD5 header
+    """
+    digest = hashlib.md5(data).digest()
+    return digest, base64.b64encode(digest).decode('ascii')
+
+
+def _check_etag(response: Dict, expected: str, description: str) -> None:
+    """
+    Check ETag of response against local md5 digest. ETags of objects encrypted with SSE-KMS or SSE-C aren't md5
+    digests, those are only checked with Content-MD5 on S3 side
+    """
+    if response.get('ServerSideEncryption') == 'aws:kms' or response.get('SSECustomerAlgorithm'):
+        return
+    etag = response['ETag']
+    if etag.strip('"') != expected:
+        raise ChecksumMismatchError('Checksum mismatch for {what}: expected ETag {expected}, got {etag}'.format(
+            what=description, expected=expected, etag=etag))
+
+
+def is_retryable(ex: Exception) -> bool:
+    """
+    Check whether error is worth retrying: throttling, 5xx and connection errors and checksum mismatches are,
+    client errors (e.g. AccessDenied, NoSuchBucket) and local errors aren't
+    """
+    from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+
+    if isinstance(ex, ClientError):
+        status = ex.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return ex.response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES or status == 429 or status >= 500
+    return isinstance(ex, (ChecksumMismatchError, BotoConnectionError, HTTPClientError, ConnectionError,
+                           TimeoutError))
+
+
+def with_retries(func: Callable, description: str, max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_seconds: float = DEFAULT_BACKOFF_SECONDS):
+    """
+    Call func, retrying it up to max_retries times with exponential backoff (and jitter) on retryable errors (see
+    is_retryable), other errors are raised right away
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except Exception as ex:
+            if attempt == max_retries or not is_retryable(ex):
+                raise
+            delay = backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.0)
+            _logger.warning('{what} failed, retrying in {delay:.1f} seconds ({n} of {max}). Msg: {msg}'.format(
+                what=description, delay=delay, n=attempt + 1, max=max_retries, msg=ex))
+            time.sleep(delay)
+
+
+def _read_part(path: str, part_number: int, part_size: int) -> bytes:
+    with open(path, 'rb') as file:
+        file.seek((part_number - 1) * part_size)
+        return file.read(part_size)
+
+
+def _put_object(client, path: str, bucket: str, key: str, max_retries: int, backoff_seconds: float) -> None:
+    """
+    Upload file in a single request, verifying its checksum
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    digest, content_md5 = get_md5(data)
+
+    def _put():
+        response = client.put_object(Bucket=bucket, Key=key, Body=data, ContentMD5=content_md5)
+        _check_etag(response, digest.hex(), key)
+
+    with_retries(_put, 'Upload of {key}'.format(key=key), max_retries, backoff_seconds)
+
+
+def _upload_parts(client, path: str, bucket: str, key: str, part_count: int, part_size: int, concurrency: int,
+                  max_retries: int, backoff_seconds: float) -> None:
+    """
+    Upload file as a multipart upload, parts are read and uploaded by concurrency threads so at most concurrency
+    parts are held in memory. Upload is aborted on failure, so no incomplete parts are left behind
+    """
+    upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+
+    def _upload_part(part_number):
+        data = _read_part(path, part_number, part_size)
+        digest, content_md5 = get_md5(data)
+        description = 'Part {n} of {count} of {key}'.format(n=part_number, count=part_count, key=key)
+
+        def _upload():
+            response = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+                                          Body=data, ContentMD5=content_md5)
+            _check_etag(response, digest.hex(), description)
+            return response['ETag']
+
+        return {'PartNumber': part_number, 'ETag': with_retries(_upload, description, max_retries, backoff_seconds)}, \
+            digest
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            parts, digests = zip(*executor.map(_upload_part, range(1, part_count + 1)))
+        response = with_retries(lambda: client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': list(parts)}),
+            'Completing upload of {key}'.format(key=key), max_retries, backoff_seconds)
+        # ETag of a multipart object is md5 of the concatenated part digests followed by no of parts
+        _check_etag(response, '{md5}-{n}'.format(md5=hashlib.md5(b''.join(digests)).hexdigest(), n=part_count), key)
+    except Exception:
+        try:
+            client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception as ex:
+            _logger.warning('Could not abort upload of {key}. Msg: {msg}'.format(key=key, msg=ex))
+        raise
+
+
+def upload_file(path: str, url: str, part_size: int = DEFAULT_PART_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+                max_retries: int = DEFAULT_MAX_RETRIES, backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+                client=None) -> Dict:
+    """
+    Upload local file to s3:// url, returns url, bytes, no of parts and seconds taken. Raises RuntimeError when
+    upload fails after retries or uploaded object doesn't match the file
+
+    Files larger than part_size are uploaded in parts of part_size in parallel, smaller ones in a single request.
+    Every request is sent with Content-MD5, so S3 rejects corrupted bodies, and returned ETags are checked against
+    local digests unless the object is encrypted with SSE-KMS/SSE-C. Failed requests are retried with exponential
+    backoff when throttled or failed on S3 side or connection.
+    """
+    if part_size < MIN_PART_SIZE:
+        raise ValueError('Part size must be at least {min} bytes'.format(min=MIN_PART_SIZE))
+    bucket, key = split_s3_url(url)
+    client = client or create_s3_client()
+    size = os.path.getsize(path)
+    part_count = max(-(-size // part_size), 1)
+
+    start_time = time.monotonic()
+    try:
+        if part_count == 1:
+            _put_object(client, path, bucket, key, max_retries, backoff_seconds)
+        else:
+            _upload_parts(client, path, bucket, key, part_count, part_size, concurrency, max_retries, backoff_seconds)
+        uploaded_size = client.head_object(Bucket=bucket, Key=key)['ContentLength']
+    except Exception as ex:
+        raise RuntimeError('Upload of {path} to {url} failed. Msg: {msg}'.format(path=path, url=url, msg=ex)) from ex
+    if uploaded_size != size:
+        raise RuntimeError('Uploaded {url} has {uploaded} bytes, expected {size}'.format(url=url,
+                                                                                        uploaded=uploaded_size,
+                                                                                        size=size))
+
+    seconds = time.monotonic() - start_time
+    _logger.info('Uploaded {size} bytes to {url} in {n} parts, {seconds:.1f} seconds'.format(
+        size=size, url=url, n=part_count, seconds=seconds))
+    return {'url': url, 'bytes': size, 'parts': part_count, 'seconds': seconds}
+
+
+def upload_data_frame(data_frame: pd.DataFrame, url: str, output_format: str = 'csv',
+                      part_size: int = DEFAULT_PART_SIZE, concurrency: int = DEFAULT_CONCURRENCY,
+                      max_retries: int = DEFAULT_MAX_RETRIES, client=None) -> int:
+    """
+    Write dataframe in given output format to a local temporary file and upload it to s3:// url with upload_file,
+    returns no of bytes uploaded
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, url.rsplit('/', 1)[-1])
+        output_writer.write_data_frame(data_frame, path, output_format)
+        return upload_file(path, url, part_size, concurrency, max_retries, client=client)['bytes']
+
+
+def write_data_frame(data_frame: pd.DataFrame, path: str, output_format: str = 'csv', **upload_options) -> int:
+    """
+    Write dataframe to s3:// url with upload_data_frame (upload_options are passed on to it), or to any other path
+    or url with output_writer.write_data_frame. Returns no of bytes written
+    """
+    if path.startswith('s3://'):
+        return upload_data_frame(data_frame, path, output_format, **upload_options)
+    return output_writer.write_data_frame(data_frame, path, output_format)
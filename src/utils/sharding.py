@@ -0,0 +1,67 @@
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, List
+
+import daiquiri
+import fsspec
+import pandas as pd
+
+from src.utils import event_processing, output_writer, s3_upload
+
+daiquiri.setup(level=logging.INFO)
+_logger = daiquiri.getLogger(__name__)
+
+
+def get_shard_id(repo_name: str, shard_count: int) -> int:
+    """
+    Get shard of repo name, stable between processes and runs (unlike hash())
+    """
+    return int(hashlib.md5(repo_name.encode('utf-8')).hexdigest()[:8], 16) % shard_count
+
+
+def select_shard(repo_names: Iterable[str], shard_index: int, shard_count: int) -> set:
+    """
+    Get repo names belonging to given shard of shard_count shards
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError('Shard index {i} is out of range for {n} shards'.format(i=shard_index, n=shard_count))
+    return {repo_name for repo_name in repo_names if get_shard_id(repo_name, shard_count) == shard_index}
+
+
+def wait_for_shards(paths: List[str], timeout_seconds: float = 0, poll_seconds: float = 30) -> None:
+    """
+    Wait till all shard outputs exist, raises TimeoutError when some are still missing after timeout_seconds
+    """
+    fs = fsspec.get_fs_token_paths(paths[0])[0]
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        missing = [path for path in paths if not fs.exists(path)]
+        if not missing:
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError('Shard outputs missing: {paths}'.format(paths=missing))
+        _logger.info('Waiting for {n} of {total} shard outputs'.format(n=len(missing), total=len(paths)))
+        time.sleep(poll_seconds)
+        fs.invalidate_cache()
+
+
+def merge_shards(paths: List[str], path: str, output_format: str = 'csv', timeout_seconds: float = 0,
+                 poll_seconds: float = 30, upload_options: Dict = None) -> int:
+    """
+    Merge shard outputs into output path once all of them exist, returns no of rows written. Merged output is
+    uploaded to s3:// urls with s3_upload, see s3_upload.write_data_frame for upload_options
+
+    Shards hold disjoint repos, still the last updated record per url is kept across shards in case a record shows
+    up in more than one (e.g. renamed repos).
+    """
+    wait_for_shards(paths, timeout_seconds, poll_seconds)
+
+    shards = [output_writer.read_data_frame(shard_path, output_format) for shard_path in paths]
+    shards = [df for df in shards if not df.empty]
+    data_frame = pd.concat(shards, axis=0, sort=False, ignore_index=True) if shards else pd.DataFrame()
+    if not data_frame.empty:
+        data_frame = event_processing.deduplicate_events(event_processing.parse_event_dates(data_frame))
+    _logger.info('Merging {n} shards into {path}, {rows} rows'.format(n=len(paths), path=path, rows=len(data_frame)))
+    s3_upload.write_data_frame(data_frame, path, output_format, **(upload_options or {}))
+    return len(data_frame)
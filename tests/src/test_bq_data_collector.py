@@ -1,13 +1,18 @@
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 
 import arrow
 import pandas as pd
 
+import src.utils.bq_client_helper as bq_client_helper
 import src.utils.cloud_constants as cc
+import src.utils.event_processing as event_processing
 import tests.src.test_helper as test_helper
 from src.bq_data_collector import BigQueryDataCollector
 
+DATE_COLUMNS = ['created_at', 'updated_at', 'closed_at']
+
 
 class BigDataCollectorTestCase(unittest.TestCase):
 
@@ -43,6 +48,23 @@ class BigDataCollectorTestCase(unittest.TestCase):
         self.assertEqual(3, len(df[df.ecosystem.str.contains("knative")]))
         self.assertEqual(1, len(df[df.ecosystem.str.contains("kubevirt")]))
 
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_issues_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv'))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_prs_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_pr_data.csv'))
+    @patch('src.utils.bq_client_helper.create_github_bq_client', return_value=MagicMock())
+    def test_get_github_data_compact_dtypes(self, _mock_bq_client, _mock_issue, _mock_prs):
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url,
+                                                  ecosystems=["openshift", "knative", "kubevirt"], days=2,
+                                                  compact_dtypes=True)
+
+        df = bq_data_collector.get_github_data()
+
+        self.assertEqual(6, len(df))
+        self.assertEqual('category', str(df.ecosystem.dtype))
+        self.assertEqual(4, len(df[df.ecosystem.str.contains("openshift")]))
+
     @patch('src.bq_data_collector.BigQueryDataCollector.get_issues_as_data_frame',
            return_value=pd.read_csv('tests/src/utils/data_assets/empty_gh_issue_data.csv'))
     @patch('src.bq_data_collector.BigQueryDataCollector.get_prs_as_data_frame',
@@ -100,3 +122,323 @@ class BigDataCollectorTestCase(unittest.TestCase):
         self.assertTrue('apache/thrift' in self._bq_data_collector._query_params['{repo_names}'])
         self.assertTrue('square/go-jose' in self._bq_data_collector._query_params['{repo_names}'])
         self.assertTrue('golang/go' in self._bq_data_collector._query_params['{repo_names}'])
+
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_issues_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv',
+                                    parse_dates=DATE_COLUMNS))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_prs_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_pr_data.csv',
+                                    parse_dates=DATE_COLUMNS))
+    def test_get_github_data_incremental(self, mock_prs, mock_issues):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                      repo_list_url=self._repo_url,
+                                                      ecosystems=["openshift", "knative", "kubevirt"], days=2,
+                                                      partition_cache_dir=cache_dir, cache_settle_hours=-48)
+
+            df = bq_data_collector.get_github_data()
+
+            # BQ is queried once per missing day, same items returned for both days are deduplicated
+            self.assertEqual(2, mock_issues.call_count)
+            self.assertEqual(2, mock_prs.call_count)
+            self.assertEqual(6, len(df))
+
+            # rerun is served from the cached partitions
+            df = bq_data_collector.get_github_data()
+            self.assertEqual(2, mock_issues.call_count)
+            self.assertEqual(6, len(df))
+            self.assertEqual(4, len(df[df.ecosystem.str.contains("openshift")]))
+
+    @patch('src.bq_data_collector.BigQueryDataCollector._estimate_event_query_size',
+           side_effect=lambda days: 10.0 * len(days))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_issues_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv',
+                                    parse_dates=DATE_COLUMNS))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_prs_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_pr_data.csv',
+                                    parse_dates=DATE_COLUMNS))
+    def test_get_github_data_incremental_within_query_budget(self, _mock_prs, mock_issues, mock_estimate):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # issues and PRs queries of two missing days each scan 10 GB
+            bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                      repo_list_url=self._repo_url, ecosystems=["openshift"], days=2,
+                                                      partition_cache_dir=cache_dir, cache_settle_hours=-48,
+                                                      max_gb_per_run=30)
+            with self.assertRaises(RuntimeError):
+                bq_data_collector.get_github_data()
+            mock_issues.assert_not_called()
+
+            bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                      repo_list_url=self._repo_url, ecosystems=["openshift"], days=2,
+                                                      partition_cache_dir=cache_dir, cache_settle_hours=-48,
+                                                      max_gb_per_run=40)
+            bq_data_collector.get_github_data()
+            self.assertEqual(2, mock_issues.call_count)
+            self.assertEqual([20.0, 20.0], [item['estimated_gb'] for item in bq_data_collector.query_plan_summary])
+
+            # only missing days are estimated, cached ones are within any budget
+            mock_estimate.reset_mock()
+            bq_data_collector.get_github_data()
+            mock_estimate.assert_not_called()
+            self.assertEqual(2, mock_issues.call_count)
+
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_gh_event_estimate',
+           return_value=pd.DataFrame({'EventType': ['IssuesEvent', 'PullRequestEvent'], 'Freq': [3, 3]}))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_issues_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv'))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_prs_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_pr_data.csv'))
+    def test_get_github_data_with_estimate_concurrent(self, mock_prs, mock_issues, _mock_estimate):
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url,
+                                                  ecosystems=["openshift", "knative", "kubevirt"], days=2,
+                                                  concurrent_queries=True)
+
+        estimate, df = bq_data_collector.get_github_data_with_estimate()
+
+        self.assertEqual(6, estimate.Freq.sum())
+        self.assertEqual(1, mock_issues.call_count)
+        self.assertEqual(1, mock_prs.call_count)
+        # concurrent retrieval gives same result as sequential one (issue 3, Prs 3)
+        self.assertEqual(6, len(df))
+        self.assertEqual(4, len(df[df.ecosystem.str.contains("openshift")]))
+
+    @patch('src.utils.bq_client_helper.create_github_bq_client', return_value=MagicMock())
+    def test_get_github_data_combined_query(self, mock_bq_client):
+        mock_bq_client().estimate_query_size.return_value = "15.5"
+        mock_bq_client().query_to_pandas.return_value = pd.read_csv(
+            'tests/src/utils/data_assets/sample_gh_event_data_with_duplicate.csv')
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url,
+                                                  ecosystems=["openshift", "knative", "kubevirt"], days=2,
+                                                  combined_query=True)
+
+        estimate = bq_data_collector.get_gh_event_estimate()
+        df = bq_data_collector.get_github_data()
+
+        # single scan serves both estimate and data
+        self.assertEqual(1, mock_bq_client().query_to_pandas.call_count)
+        # estimate is taken before deduplication
+        self.assertEqual({'IssuesEvent': 4, 'PullRequestEvent': 3}, dict(zip(estimate.EventType, estimate.Freq)))
+        # issues come before PRs, like in separate queries mode (issue 3, Prs 3)
+        self.assertEqual(6, len(df))
+        self.assertEqual(['IssuesEvent'] * 3 + ['PullRequestEvent'] * 3, list(df.event_type))
+        self.assertEqual(1, len(df[df.url.eq('https://github.com/golang/go/issues/33041')]))
+
+    @patch('src.utils.bq_client_helper.create_github_bq_client', return_value=MagicMock())
+    def test_get_gh_event_as_data_frame_in_pages(self, _mock_bq_client):
+        events = pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data_with_duplicate.csv')
+        # duplicate records of "https://github.com/golang/go/issues/33041" end up in different pages
+        pages = [events.iloc[:3].copy(), events.iloc[3:].copy()]
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url, ecosystems=["openshift"], days=2,
+                                                  page_size=3)
+
+        with patch('src.utils.bq_client_helper.query_to_data_frame_chunks', return_value=iter(pages)) as mock_pages:
+            df = bq_data_collector._get_gh_event_as_data_frame(test_helper.get_sample_query_param())
+
+        self.assertEqual(3, mock_pages.call_args[0][2])
+        self.assertEqual(3, len(df))
+        latest = df[df.url.eq('https://github.com/golang/go/issues/33041')]
+        self.assertEqual(1, len(latest))
+        self.assertEqual(pd.Timestamp('2020-03-05T22:42:48Z'), latest.updated_at.iloc[0])
+
+    @patch('src.utils.bq_client_helper.create_github_bq_client', return_value=MagicMock())
+    def test_reduce_event_chunks_bounded(self, _mock_bq_client):
+        # time ordered pages updating the same 100 issues, every record supersedes the one of the previous page
+        urls = ['https://github.com/golang/go/issues/{n}'.format(n=n) for n in range(100)]
+        pages = [pd.DataFrame({'repo_name': 'golang/go', 'event_type': 'IssuesEvent', 'url': urls,
+                               'created_at': '2020-03-01T00:00:00Z',
+                               'updated_at': pd.Timestamp('2020-03-01T00:00:00Z') + pd.Timedelta(minutes=page),
+                               'closed_at': None})
+                 for page in range(50)]
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url, ecosystems=["openshift"], days=2)
+
+        with patch('src.utils.event_processing.deduplicate_events',
+                   wraps=event_processing.deduplicate_events) as mock_dedup:
+            df, event_frequency, transferred_rows = bq_data_collector._reduce_event_chunks(iter(pages))
+
+        self.assertEqual(100, len(df))
+        self.assertTrue((df.updated_at == pd.Timestamp('2020-03-01T00:49:00Z')).all())
+        self.assertEqual(5000, transferred_rows)
+        self.assertEqual(5000, event_frequency['IssuesEvent'])
+        # kept records never grow past twice the no of unique urls plus a page
+        self.assertLessEqual(max(len(call[0][0]) for call in mock_dedup.call_args_list), 300)
+
+    @patch('src.utils.bq_client_helper.create_github_bq_client', return_value=MagicMock())
+    def test_get_github_data_server_dedup(self, mock_bq_client):
+        # BQ returns one record per url along with no of events matched per event type
+        events = pd.read_csv('tests/src/utils/data_assets/sample_gh_event_data_with_duplicate.csv').drop(index=2)
+        events['event_type_events'] = events.event_type.map({'IssuesEvent': 4, 'PullRequestEvent': 3})
+        mock_bq_client().query_to_pandas.return_value = events
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url,
+                                                  ecosystems=["openshift", "knative", "kubevirt"], days=2,
+                                                  combined_query=True, server_dedup=True)
+
+        df = bq_data_collector.get_github_data()
+        estimate = bq_data_collector.get_gh_event_estimate()
+
+        self.assertIn('ROW_NUMBER()', mock_bq_client().query_to_pandas.call_args[0][0])
+        self.assertEqual(6, len(df))
+        self.assertNotIn('event_type_events', df.columns)
+        self.assertEqual({'IssuesEvent': 4, 'PullRequestEvent': 3}, dict(zip(estimate.EventType, estimate.Freq)))
+        self.assertEqual({'events': 7, 'transferred': 6, 'kept': 6}, bq_data_collector.row_counts)
+
+    @patch('src.utils.bq_client_helper.estimate_query_size_with_params', return_value=1.5)
+    @patch('src.utils.bq_client_helper.query_to_pandas_with_params',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data_with_duplicate.csv'))
+    def test_get_gh_event_as_data_frame_parameterized_with_result_cache(self, mock_query, _mock_estimate):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for _ in range(2):
+                bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                          repo_list_url=self._repo_url, ecosystems=["openshift"],
+                                                          days=2, cache_settle_hours=-48, parameterized_query=True,
+                                                          result_cache_dir=cache_dir)
+                df = bq_data_collector.get_issues_as_data_frame()
+                self.assertEqual(3, len(df))
+
+            # second run is served from result cache
+            self.assertEqual(1, mock_query.call_count)
+            query, parameter_values = mock_query.call_args[0][1:]
+            # values are passed as query parameters, not as part of query text
+            self.assertIn('repo.name in UNNEST(@repo_names)', query)
+            self.assertNotIn('golang/go', query)
+            self.assertEqual(['apache/thrift', 'golang/go', 'square/go-jose'], parameter_values['repo_names'])
+            self.assertEqual(2, len(parameter_values['table_suffixes']))
+
+    @patch('src.bq_data_collector.BigQueryDataCollector._estimate_event_query_size',
+           side_effect=lambda days: 10.0 * len(days))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_issues_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv',
+                                    parse_dates=DATE_COLUMNS))
+    @patch('src.bq_data_collector.BigQueryDataCollector.get_prs_as_data_frame',
+           return_value=pd.read_csv('tests/src/utils/data_assets/sample_gh_pr_data.csv',
+                                    parse_dates=DATE_COLUMNS))
+    def test_get_github_data_within_query_budget(self, _mock_prs, mock_issues, _mock_estimate):
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url,
+                                                  ecosystems=["openshift", "knative", "kubevirt"], days=2,
+                                                  max_gb_per_query=15)
+
+        df = bq_data_collector.get_github_data()
+
+        # 20 GB window is split into two days of 10 GB each
+        self.assertEqual(2, mock_issues.call_count)
+        self.assertEqual(2, len(bq_data_collector.query_plan_summary))
+        self.assertEqual(6, len(df))
+
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url, ecosystems=["openshift"], days=2,
+                                                  max_gb_per_query=15, max_gb_per_run=30)
+        # issues and PRs queries each scan 20 GB
+        with self.assertRaises(RuntimeError):
+            bq_data_collector.get_github_data()
+
+    @patch('src.utils.s3_upload.upload_data_frame', return_value=10)
+    def test_collect_date_range(self, mock_write):
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url, ecosystems=["openshift"],
+                                                  start_date='20200227', end_date='20200302')
+        self.assertEqual(['20200227', '20200228', '20200229', '20200301', '20200302'], bq_data_collector.last_n_days)
+
+        path = bq_data_collector.upload_data_frame(pd.DataFrame({'url': ['a']}), 'parquet')
+        self.assertTrue(path.endswith('/gh_data/gh_data_20200227-20200302.parquet'))
+        mock_write.assert_called_once()
+
+        # upload errors are raised to the caller
+        mock_write.side_effect = IOError('denied')
+        with self.assertRaises(IOError):
+            bq_data_collector.upload_data_frame(pd.DataFrame({'url': ['a']}), 'csv')
+
+    @patch('src.bq_data_collector.BigQueryDataCollector._estimate_query_size', return_value=1.0)
+    def test_stage_metrics(self, _mock_estimate):
+        self._bq_data_collector._bq_client.query_to_pandas.side_effect = [
+            pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv'),
+            pd.read_csv('tests/src/utils/data_assets/sample_gh_pr_data.csv')]
+
+        df = self._bq_data_collector.get_github_data()
+
+        stages = self._bq_data_collector.metrics.to_dict()['stages']
+        for stage in ['query_build', 'fetch', 'parse', 'dedup', 'merge', 'tag']:
+            self.assertIn(stage, stages)
+        self.assertEqual(2, stages['fetch']['calls'])
+        self.assertEqual(len(df), stages['merge']['rows_out'])
+        self.assertEqual(len(df), stages['tag']['rows_out'])
+
+    @patch('src.utils.bq_client_helper.create_github_bq_client')
+    def test_get_github_data_from_gh_archive(self, mock_bq_client):
+        with tempfile.TemporaryDirectory() as gharchive_dir:
+            test_helper.write_gharchive_sample(gharchive_dir)
+            bq_data_collector = BigQueryDataCollector(repo_list_url=self._repo_url, ecosystems=["openshift"],
+                                                      start_date='20200301', gharchive_dir=gharchive_dir,
+                                                      gharchive_max_missing_hours=23)
+
+            estimate, df = bq_data_collector.get_github_data_with_estimate()
+
+        # no BQ client is needed
+        mock_bq_client.assert_not_called()
+        self.assertEqual({'IssuesEvent': 2, 'PullRequestEvent': 1}, dict(zip(estimate.EventType, estimate.Freq)))
+        # issue updated twice is deduplicated
+        self.assertEqual(['https://github.com/golang/go/issues/3346', 'https://github.com/square/go-jose/pull/12'],
+                         sorted(df.url))
+        self.assertEqual('closed', df[df.event_type == 'IssuesEvent'].status.iloc[0])
+        self.assertEqual({'openshift,knative', 'openshift'}, set(df.ecosystem))
+
+    @patch('src.utils.bq_client_helper.create_github_bq_client', return_value=MagicMock())
+    def test_shard_repo_list(self, _mock_bq_client):
+        repo_names = set()
+        for shard_index in range(2):
+            bq_data_collector = BigQueryDataCollector(repo_list_url=self._repo_url, ecosystems=["openshift", "knative"],
+                                                      start_date='20200301', shard_index=shard_index, shard_count=2)
+            shard_repo_names = set(bq_client_helper.get_query_parameter_values(
+                bq_data_collector._query_params)['repo_names'])
+            self.assertFalse(repo_names & shard_repo_names)
+            repo_names |= shard_repo_names
+
+            with patch('src.utils.s3_upload.upload_data_frame', return_value=0) as mock_write:
+                path = bq_data_collector.upload_data_frame(pd.DataFrame(), 'csv')
+            self.assertTrue(path.endswith('gh_data_20200301-20200301.shard-{i}-of-2.csv'.format(i=shard_index)))
+            mock_write.assert_called_once()
+
+        # shard outputs are named after the run, all pods of the run collect the window ending at window end
+        bq_data_collector = BigQueryDataCollector(repo_list_url=self._repo_url, ecosystems=["openshift", "knative"],
+                                                  days=2, window_end='20200302', shard_index=1, shard_count=2,
+                                                  run_id='a1b2')
+        self.assertEqual(['20200301', '20200302'], bq_data_collector.last_n_days)
+        with patch('src.utils.s3_upload.upload_data_frame', return_value=0):
+            path = bq_data_collector.upload_data_frame(pd.DataFrame(), 'csv')
+        self.assertTrue(path.endswith('gh_data_20200301-20200302.shard-1-of-2.run-a1b2.csv'))
+
+        self.assertEqual({'apache/thrift', 'square/go-jose', 'golang/go', 'eapache/queue', 'go-kit/kit'}, repo_names)
+
+    @patch('src.utils.delta_output.write_delta', return_value={'bytes': 10})
+    def test_upload_delta(self, mock_write_delta):
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url, ecosystems=["openshift"],
+                                                  start_date='20200227', end_date='20200302')
+        entry = bq_data_collector.upload_delta(pd.DataFrame({'url': ['a']}), 'csv', snapshot_every=3)
+
+        self.assertEqual({'bytes': 10}, entry)
+        output_dir, window_start, file_name = mock_write_delta.call_args[0][1:4]
+        self.assertTrue(output_dir.endswith('/gh_data/delta'))
+        self.assertEqual('2020-02-27', window_start.format('YYYY-MM-DD'))
+        self.assertEqual('gh_data_20200227-20200302.csv', file_name)
+        self.assertEqual(10, bq_data_collector.metrics.to_dict()['stages']['upload']['bytes_written'])
+        # deltas and snapshots are uploaded the same way as full outputs
+        self.assertEqual(bq_data_collector._upload_options, mock_write_delta.call_args[0][-1])
+
+    @patch('src.utils.s3_upload.upload_data_frame')
+    def test_save_data_to_object_store(self, mock_upload):
+        bq_data_collector = BigQueryDataCollector(bq_credentials_path=cc.BIGQUERY_CREDENTIALS_FILEPATH,
+                                                  repo_list_url=self._repo_url, ecosystems=["openshift"],
+                                                  upload_part_size_mb=8, upload_concurrency=2, upload_max_retries=3)
+        mock_upload.return_value = 10
+        bq_data_collector.save_data_to_object_store(pd.DataFrame({'url': ['a']}), 2, 'csv')
+        self.assertEqual({'part_size': 8 * 2 ** 20, 'concurrency': 2, 'max_retries': 3}, mock_upload.call_args[1])
+
+        # failed upload fails the run instead of being logged as completed
+        mock_upload.side_effect = RuntimeError('Checksum mismatch')
+        with self.assertRaises(RuntimeError):
+            bq_data_collector.save_data_to_object_store(pd.DataFrame({'url': ['a']}), 2, 'csv')
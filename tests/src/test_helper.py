@@ -1,3 +1,7 @@
+import gzip
+import os
+import shutil
+
 import src.utils.bq_client_helper as bq_client_helper
 
 
@@ -9,6 +13,16 @@ def get_sample_repo_names():
     return eco_with_repo_list['openshift']
 
 
+def write_gharchive_sample(dir_path, file_name='2020-03-01-0.json.gz'):
+    """
+    Write sample GH archive events as gzipped hourly file into given directory, return its path
+    """
+    path = os.path.join(dir_path, file_name)
+    with open('tests/src/utils/data_assets/gharchive-sample.json', 'rb') as src, gzip.open(path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    return path
+
+
 def read_file_data(file_path):
     """
     Read file and return content
@@ -25,9 +39,9 @@ def get_sample_query_param():
     day_list = ['200303', '200304']
     year_prefix = '20*'
     month_days = '({days})'.format(days=', '.join(["'" + d + "'" for d in day_list]))
-    repo_names = '({repo_names})'.format(repo_names=', '.join(["'" + r + "'" for r in repo_names]))
     query_params = {'{year_prefix_wildcard}': year_prefix,
                     '{year_suffix_month_day}': month_days,
-                    '{repo_names}': repo_names,
-                    '{payload_field_name}': 'issue', '{event_type}': 'IssuesEvent'}
+                    '{repo_names}': '({repo_names})'.format(repo_names=', '.join(["'" + r + "'" for r in repo_names])),
+                    '{payload_field_name}': 'issue', '{event_type}': 'IssuesEvent',
+                    bq_client_helper.QUERY_PARAMETER_VALUES: {'table_suffixes': day_list, 'repo_names': repo_names}}
     return query_params
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import src.utils.backfill as backfill
+
+
+class BackfillTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._manifest_path = os.path.join(self._dir.name, 'manifest.json')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_split_date_range(self):
+        self.assertEqual([['20200228'], ['20200229'], ['20200301']],
+                         backfill.split_date_range('20200228', '20200301'))
+        units = backfill.split_date_range('20200301', '20200316', 'week')
+        self.assertEqual([7, 7, 2], [len(unit) for unit in units])
+        self.assertEqual('20200315-20200316', backfill.get_unit_key(units[-1]))
+        with self.assertRaises(ValueError):
+            backfill.split_date_range('20200302', '20200301')
+
+    def test_run_backfill_resumes(self):
+        units = backfill.split_date_range('20200301', '20200304')
+        calls, lock = [], threading.Lock()
+
+        def _run_unit(days):
+            with lock:
+                calls.append(days[0])
+            if days[0] == '20200302':
+                raise IOError('upload failed')
+            return {'path': 'gh_data_{d}.csv'.format(d=days[0]), 'rows': 1}
+
+        result = backfill.run_backfill(units, _run_unit, self._manifest_path, max_workers=2)
+        self.assertEqual(['20200302-20200302'], result['failed'])
+        self.assertEqual(3, len(result['completed']))
+        manifest = backfill.load_manifest(self._manifest_path)
+        self.assertEqual('gh_data_20200301.csv', manifest['units']['20200301-20200301']['path'])
+        self.assertNotIn('20200302-20200302', manifest['units'])
+
+        # rerun only retries the failed unit
+        calls.clear()
+        result = backfill.run_backfill(units, lambda days: {'rows': 0}, self._manifest_path)
+        self.assertEqual(['20200302-20200302'], result['completed'])
+        self.assertEqual(3, len(result['skipped']))
+        self.assertEqual([], result['failed'])
+        self.assertEqual(4, len(backfill.load_manifest(self._manifest_path)['units']))
+
+    def test_run_backfill_with_other_options(self):
+        units = backfill.split_date_range('20200301', '20200302')
+        options = {'ecosystems': ['openshift'], 'output_format': 'csv', 'body_policy': 'full', 'body_max_chars': 4096}
+        backfill.run_backfill(units, lambda days: {'rows': 1}, self._manifest_path, options=options)
+
+        # same options resume, units completed for other ecosystems or format are collected again
+        result = backfill.run_backfill(units, lambda days: {'rows': 1}, self._manifest_path, options=options)
+        self.assertEqual(2, len(result['skipped']))
+        for other in [{'ecosystems': ['knative', 'openshift']}, {'output_format': 'parquet'}]:
+            result = backfill.run_backfill(units, lambda days: {'rows': 1}, self._manifest_path,
+                                           options={**options, **other})
+            self.assertEqual(2, len(result['completed']))
+            self.assertEqual([], result['skipped'])
+        self.assertEqual('parquet', backfill.load_manifest(self._manifest_path)['units']['20200301-20200301']
+                         ['options']['output_format'])
@@ -1,5 +1,7 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
 
 import src.utils.bq_client_helper as bq_client_helper
 import tests.src.test_helper as test_helper
@@ -29,3 +31,103 @@ class BigQueryClientHelperTestCase(unittest.TestCase):
         # call actual method and assert
         event_query = bq_client_helper.bq_add_query_params(raw_event_query, query_params)
         self.assertEqual(event_query, expected_event_query)
+
+    def test_bq_combine_event_types(self):
+        raw_event_query = test_helper.read_file_data('tests/src/utils/data_assets/raw-event-query.txt')
+        expected_event_query = test_helper.read_file_data(
+            'tests/src/utils/data_assets/formatted-combined-event-query.txt')
+
+        event_query = bq_client_helper.bq_combine_event_types(
+            raw_event_query, {'IssuesEvent': 'issue', 'PullRequestEvent': 'pull_request'})
+        event_query = bq_client_helper.bq_add_query_params(event_query, test_helper.get_sample_query_param())
+        self.assertEqual(event_query, expected_event_query)
+
+    def test_bq_apply_body_policy(self):
+        raw_event_query = test_helper.read_file_data('tests/src/utils/data_assets/raw-event-query.txt')
+        self.assertEqual(raw_event_query, bq_client_helper.bq_apply_body_policy(raw_event_query, 'full'))
+
+        # body is truncated before whitespace normalization
+        event_query = bq_client_helper.bq_apply_body_policy(raw_event_query, 'truncate', 1024)
+        self.assertRegex(event_query, r"REGEXP_REPLACE\(\s*SUBSTR\(JSON_EXTRACT_SCALAR\(payload, "
+                                      r"'\$\.\{payload_field_name\}\.body'\), 1, 1024\),")
+        self.assertIn("JSON_EXTRACT_SCALAR(payload, '$.{payload_field_name}.title'),", event_query)
+
+        event_query = bq_client_helper.bq_apply_body_policy(raw_event_query, 'hash')
+        self.assertIn("TO_HEX(SHA256(JSON_EXTRACT_SCALAR(payload, '$.{payload_field_name}.body'))) as body_sha256,",
+                      event_query)
+        self.assertIn("LENGTH(JSON_EXTRACT_SCALAR(payload, '$.{payload_field_name}.body')) as body_length", event_query)
+        self.assertNotIn(' as body\n', event_query)
+        self.assertIn(' as title,', event_query)
+
+        with self.assertRaises(ValueError):
+            bq_client_helper.bq_apply_body_policy(raw_event_query, 'drop')
+
+    def test_get_repo_eco_system_index(self):
+        eco_with_repo_list = bq_client_helper.get_eco_system_with_repo_list(
+            'tests/src/utils/data_assets/repo-list.json')
+        index = bq_client_helper.get_repo_eco_system_index(eco_with_repo_list)
+
+        self.assertEqual('openshift,knative', index['golang/go'])
+        self.assertEqual('knative', index['go-kit/kit'])
+        self.assertEqual('kubevirt', index['Shopify/sarama'])
+
+    def test_tag_eco_system(self):
+        index = {'golang/go': 'openshift,knative', 'go-kit/kit': 'knative'}
+        repo_names = pd.Series(['golang/go', 'unknown/repo', None, 'go-kit/kit', 'golang/go'], index=[5, 6, 7, 8, 9])
+
+        eco_systems = bq_client_helper.tag_eco_system(repo_names, index)
+
+        self.assertEqual(['openshift,knative', '', '', 'knative', 'openshift,knative'], list(eco_systems))
+        self.assertEqual([5, 6, 7, 8, 9], list(eco_systems.index))
+
+    def test_query_to_data_frame_chunks(self):
+        field_names = ['repo_name', 'url']
+        pages = [[{'repo_name': 'golang/go', 'url': 'u1'}, {'repo_name': 'golang/go', 'url': 'u2'}],
+                 [],
+                 [{'repo_name': 'apache/thrift', 'url': 'u3'}]]
+        rows = MagicMock(schema=[MagicMock() for _ in field_names], pages=pages)
+        for field, name in zip(rows.schema, field_names):
+            field.name = name
+        bq_client = MagicMock(max_wait_seconds=180)
+        bq_client.client.query.return_value.result.return_value = rows
+
+        chunks = list(bq_client_helper.query_to_data_frame_chunks(bq_client, 'SELECT 1', page_size=2))
+
+        bq_client.client.query.return_value.result.assert_called_once_with(timeout=180, page_size=2)
+        # empty pages are skipped
+        self.assertEqual([2, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual(['u1', 'u2'], list(chunks[0].url))
+        self.assertEqual(field_names, list(chunks[1].columns))
+
+    def test_bq_deduplicate_on_server(self):
+        query = bq_client_helper.bq_deduplicate_on_server('SELECT url, updated_at, event_type FROM events',
+                                                          count_column='events_count')
+
+        self.assertIn('FROM (SELECT url, updated_at, event_type FROM events)', query)
+        self.assertIn('ROW_NUMBER() OVER (PARTITION BY url ORDER BY updated_at DESC) as row_num', query)
+        self.assertIn('COUNT(*) OVER (PARTITION BY event_type) as events_count', query)
+        self.assertIn('WHERE row_num = 1', query)
+
+    def test_get_query_parameter_values(self):
+        values = bq_client_helper.get_query_parameter_values(test_helper.get_sample_query_param())
+
+        self.assertEqual(['200303', '200304'], values['table_suffixes'])
+        self.assertEqual(test_helper.get_sample_repo_names(), values['repo_names'])
+
+    def test_bq_string_list(self):
+        self.assertEqual("('200303', '200304')", bq_client_helper.bq_string_list(['200303', '200304']))
+        # quotes don't end the literal
+        self.assertEqual("('it\\'s', 'a\\\\b')", bq_client_helper.bq_string_list(["it's", 'a\\b']))
+
+    def test_estimate_query_size_with_params(self):
+        bq_client = MagicMock()
+        bq_client.client.query.return_value.total_bytes_processed = 3 * 2 ** 30
+
+        qsize = bq_client_helper.estimate_query_size_with_params(bq_client, 'SELECT 1',
+                                                                 {'repo_names': ['golang/go']})
+
+        self.assertEqual(3, qsize)
+        job_config = bq_client.client.query.call_args[1]['job_config']
+        self.assertTrue(job_config.dry_run)
+        self.assertEqual(['repo_names'], [param.name for param in job_config.query_parameters])
+        self.assertEqual(['golang/go'], job_config.query_parameters[0].values)
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+import arrow
+import pandas as pd
+
+import src.utils.delta_output as delta_output
+import src.utils.event_schema as event_schema
+import src.utils.output_writer as output_writer
+
+
+def get_events(rows):
+    """
+    Build collected events from (url, updated_at, status) rows
+    """
+    urls, updated_at, status = zip(*rows)
+    return pd.DataFrame({'url': urls, 'updated_at': pd.to_datetime(updated_at, utc=True), 'status': status,
+                         'repo_name': 'golang/go'})
+
+
+class DeltaOutputTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._window_start = arrow.get('2020-03-01')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write_delta(self, data_frame, file_name, **kwargs):
+        return delta_output.write_delta(data_frame, self._dir.name, self._window_start, file_name, **kwargs)
+
+    def test_content_hashes_independent_of_dtypes(self):
+        events = get_events([('a', '2020-03-01T10:00:00Z', 'opened'), ('b', '2020-03-01T11:00:00Z', None)])
+        events['id'], events['number'] = ['123', None], ['1', '2']
+        compact = event_schema.apply_event_schema(events)
+        read_back = events.assign(id=pd.to_numeric(events.id), updated_at=events.updated_at.astype(str))
+
+        expected = delta_output.get_content_hashes(events)
+        pd.testing.assert_series_equal(expected, delta_output.get_content_hashes(compact))
+        pd.testing.assert_series_equal(expected, delta_output.get_content_hashes(read_back))
+        self.assertNotEqual(expected[0], delta_output.get_content_hashes(events.assign(number=['3', '2']))[0])
+
+    def test_compute_delta(self):
+        events = get_events([('a', '2020-03-01T10:00:00Z', 'opened'), ('b', '2020-03-01T11:00:00Z', 'opened')])
+        delta, index, counts = delta_output.compute_delta(events, delta_output.load_index('missing.parquet'))
+        self.assertEqual(2, len(delta))
+        self.assertEqual({'new': 2, 'changed': 0, 'unchanged': 0}, counts)
+
+        # same content in compact dtypes is unchanged
+        events = events.astype({'status': 'category', 'repo_name': 'category'})
+        delta, index, counts = delta_output.compute_delta(events, index)
+        self.assertTrue(delta.empty)
+
+        events = get_events([('a', '2020-03-02T10:00:00Z', 'closed'), ('b', '2020-03-01T11:00:00Z', 'opened'),
+                             ('c', '2020-03-02T11:00:00Z', 'opened')])
+        delta, index, counts = delta_output.compute_delta(events, index)
+        self.assertEqual(['a', 'c'], delta.url.tolist())
+        self.assertEqual({'new': 1, 'changed': 1, 'unchanged': 1}, counts)
+        self.assertEqual(['a', 'b', 'c'], sorted(index.url))
+        self.assertEqual('uint64', str(index.content_hash.dtype))
+
+    def test_write_delta(self):
+        entry = self._write_delta(get_events([('a', '2020-03-01T10:00:00Z', 'opened'),
+                                              ('b', '2020-03-01T11:00:00Z', 'opened')]), 'gh_data_1.csv',
+                                  snapshot_every=2)
+        self.assertEqual((1, 2), (entry['seq'], entry['rows']))
+
+        # overlapping window, only changed and new records are written
+        entry = self._write_delta(get_events([('b', '2020-03-01T11:00:00Z', 'opened'),
+                                              ('a', '2020-03-02T10:00:00Z', 'closed'),
+                                              ('c', '2020-03-02T11:00:00Z', 'opened')]), 'gh_data_2.csv',
+                                  snapshot_every=2)
+        self.assertEqual((2, 2, 3), (entry['seq'], entry['rows'], entry['window_rows']))
+        self.assertEqual('gh_data_2.delta-2.csv', os.path.basename(entry['path']))
+        delta = output_writer.read_data_frame(entry['path'])
+        self.assertEqual(['a', 'c'], delta.url.tolist())
+
+        # snapshot after every 2 deltas holds last record per url
+        manifest = delta_output.load_manifest(os.path.join(self._dir.name, 'manifest.json'))
+        self.assertEqual(2, len(manifest['deltas']))
+        self.assertEqual(1, len(manifest['snapshots']))
+        snapshot = output_writer.read_data_frame(manifest['snapshots'][0]['path'])
+        self.assertEqual(['a', 'b', 'c'], snapshot.url.tolist())
+        self.assertEqual('closed', snapshot.status.iloc[0])
+
+        # rerun of a window with no changes writes an empty delta, earlier delta of the window is kept
+        entry = self._write_delta(get_events([('c', '2020-03-02T11:00:00Z', 'opened')]), 'gh_data_2.csv')
+        self.assertEqual((3, 0), (entry['seq'], entry['rows']))
+        manifest = delta_output.load_manifest(os.path.join(self._dir.name, 'manifest.json'))
+        self.assertEqual(['gh_data_1.delta-1.csv', 'gh_data_2.delta-2.csv', 'gh_data_2.delta-3.csv'],
+                         [os.path.basename(delta['path']) for delta in manifest['deltas']])
+        self.assertEqual(2, len(output_writer.read_data_frame(manifest['deltas'][1]['path'])))
+
+    def test_prune_index(self):
+        index = delta_output.compute_delta(get_events([('a', '2020-01-01T10:00:00Z', 'opened'),
+                                                       ('b', '2020-02-28T10:00:00Z', 'opened')]),
+                                           delta_output.load_index('missing.parquet'))[1]
+        self.assertEqual(['b'], delta_output.prune_index(index, self._window_start, 30).url.tolist())
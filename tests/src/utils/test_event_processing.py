@@ -0,0 +1,78 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import src.utils.event_processing as event_processing
+
+
+class EventProcessingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._events = pd.read_csv('tests/src/utils/data_assets/sample_gh_event_data_with_duplicate.csv')
+
+    def test_process_event_shard(self):
+        df = event_processing.process_event_shard(self._events.copy())
+
+        self.assertEqual(6, len(df))
+        self.assertTrue(df.url.is_monotonic_increasing)
+        latest = df[df.url.eq('https://github.com/golang/go/issues/33041')]
+        self.assertEqual(1, len(latest))
+        self.assertEqual(pd.Timestamp('2020-03-05T22:42:48Z'), latest.updated_at.iloc[0])
+
+    def test_deduplicate_events_same_as_idxmax(self):
+        df = event_processing.parse_event_dates(self._events.copy())
+        expected = df.loc[df.groupby('url').updated_at.idxmax()].reset_index(drop=True)
+        pd.testing.assert_frame_equal(expected, event_processing.deduplicate_events(df))
+
+    def test_split_into_shards(self):
+        shards = event_processing.split_into_shards(self._events, 3)
+
+        self.assertEqual(len(self._events), sum(len(shard) for shard in shards))
+        self.assertEqual(['url', 'created_at', 'updated_at', 'closed_at', '_row'], list(shards[0].columns))
+        # all records of a repo end up in the same shard
+        repo_shards = [set(self._events.repo_name.iloc[shard._row]) for shard in shards]
+        self.assertEqual(sum(len(repos) for repos in repo_shards), self._events.repo_name.nunique())
+
+    def test_process_events_in_process_pool(self):
+        expected = event_processing.process_events(self._events.copy())
+        df = event_processing.process_events(self._events.copy(), workers=2, min_rows=0)
+        pd.testing.assert_frame_equal(expected, df)
+
+    def test_process_events_with_executor(self):
+        expected = event_processing.process_events(self._events.copy())
+        with event_processing.create_process_pool(2) as executor:
+            for _ in range(2):
+                pd.testing.assert_frame_equal(expected, event_processing.process_events(
+                    self._events.copy(), workers=2, min_rows=0, executor=executor))
+
+    def test_process_events_from_threads(self):
+        expected = event_processing.process_events(self._events.copy())
+        # pools are created from worker threads when queries run concurrently, workers are never forked from them
+        self.assertNotEqual('fork', event_processing.get_process_context().get_start_method())
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(lambda _: event_processing.process_events(
+                self._events.copy(), workers=2, min_rows=0), range(2)))
+        for df in results:
+            pd.testing.assert_frame_equal(expected, df)
+
+    def test_select_newer_records(self):
+        expected = event_processing.process_event_shard(self._events.copy())
+        latest, kept = {}, []
+        for start in range(0, len(self._events), 3):
+            page = event_processing.process_event_shard(self._events.iloc[start:start + 3].copy())
+            kept.append(event_processing.select_newer_records(page, latest))
+
+        self.assertEqual(set(expected.url), set(latest))
+        df = event_processing.deduplicate_events(pd.concat(kept, ignore_index=True))
+        pd.testing.assert_frame_equal(expected, df)
+        # records not newer than the recorded ones are dropped
+        self.assertTrue(event_processing.select_newer_records(expected, latest).empty)
+
+    def test_ipc_round_trip(self):
+        df = event_processing.parse_event_dates(self._events.copy())
+        pd.testing.assert_frame_equal(df, event_processing._from_ipc(event_processing._to_ipc(df)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import pandas as pd
+
+import src.utils.event_processing as event_processing
+import src.utils.event_schema as event_schema
+
+# Footprint budget of compact frame built below (text columns are object strings), in bytes per row. Keep it tight
+# so footprint regressions get noticed
+MAX_BYTES_PER_ROW = 400
+
+
+class EventSchemaTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # events as retrieved from BQ, where every column is a string
+        events = pd.read_csv('tests/src/utils/data_assets/sample_gh_event_data_with_duplicate.csv', dtype=str)
+        events = pd.concat([events] * 500, ignore_index=True)
+        events['url'] = events.url + '/' + events.index.astype(str)
+        self._events = event_processing.parse_event_dates(events)
+
+    def test_apply_event_schema(self):
+        df = event_schema.apply_event_schema(self._events)
+
+        self.assertEqual(list(self._events.columns), list(df.columns))
+        for column in event_schema.CATEGORY_COLUMNS:
+            self.assertTrue(pd.api.types.is_categorical_dtype(df[column]), column)
+        self.assertEqual('Int64', str(df.id.dtype))
+        self.assertEqual(int(self._events.id.iloc[0]), df.id.iloc[0])
+        self.assertEqual('UTC', str(df.updated_at.dt.tz))
+        self.assertEqual(list(self._events.title), list(df.title.astype(object)))
+
+    def test_apply_event_schema_missing_values(self):
+        df = event_schema.apply_event_schema(pd.DataFrame({'id': ['1', None],
+                                                           'closed_at': [None, '2020-03-05T00:03:13Z'],
+                                                           'status': ['opened', None]}))
+        self.assertTrue(pd.isna(df.id.iloc[1]))
+        self.assertTrue(pd.isna(df.closed_at.iloc[0]))
+        self.assertEqual(['opened'], list(df.status.cat.categories))
+
+    def test_memory_per_row(self):
+        before = event_schema.get_memory_per_row(self._events)
+        after = event_schema.get_memory_per_row(event_schema.apply_event_schema(self._events))
+
+        self.assertLess(after, before / 2)
+        self.assertLessEqual(after, MAX_BYTES_PER_ROW)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+
+import src.utils.gharchive_reader as gharchive_reader
+import tests.src.test_helper as test_helper
+
+REPO_NAMES = {'golang/go', 'square/go-jose', 'apache/thrift'}
+EVENT_TYPES = ['IssuesEvent', 'PullRequestEvent']
+
+
+class GhArchiveReaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        # sample events of first hour of the day, other hours are missing
+        self._path = test_helper.write_gharchive_sample(self._dir.name)
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_get_hour_file_paths(self):
+        paths = gharchive_reader.get_hour_file_paths('https://data.gharchive.org/', ['20200301', '20200302'])
+        self.assertEqual(48, len(paths))
+        self.assertEqual('https://data.gharchive.org/2020-03-01-0.json.gz', paths[0])
+        self.assertEqual('https://data.gharchive.org/2020-03-02-23.json.gz', paths[-1])
+
+    def test_read_hour_file(self):
+        df = gharchive_reader.read_hour_file(self._path, REPO_NAMES, EVENT_TYPES)
+
+        # push, issue comment and untracked repo events are left out
+        self.assertEqual(gharchive_reader.EVENT_COLUMNS, list(df.columns))
+        self.assertEqual(['IssuesEvent', 'IssuesEvent', 'PullRequestEvent'], df.event_type.tolist())
+        issue = df.iloc[1]
+        self.assertEqual('closed', issue.status)
+        self.assertEqual('3346', issue.number)
+        self.assertEqual('https://github.com/golang/go/issues/3346', issue.url)
+        self.assertEqual('https://api.github.com/repos/golang/go/issues/3346', issue.api_url)
+        self.assertEqual('kristianmandrup', issue.creator_name)
+        self.assertEqual('2020-03-01T00:20:00Z', issue.closed_at)
+        # whitespace is normalized the same way as the event query does
+        self.assertEqual('x/tools/gopls: support go.mod files', issue.title)
+        self.assertEqual('Context: Beginning of "repo":{"id":1,"name":"a/b"}', issue.body)
+        pr = df.iloc[2]
+        self.assertEqual('square/go-jose', pr.repo_name)
+        self.assertEqual('https://github.com/square/go-jose/pull/12', pr.url)
+        self.assertIsNone(pr.closed_at)
+        self.assertIsNone(pr.body)
+
+        self.assertEqual(1, len(gharchive_reader.read_hour_file(self._path, REPO_NAMES, ['PullRequestEvent'])))
+        self.assertTrue(gharchive_reader.read_hour_file(self._path, {'apache/thrift'}, EVENT_TYPES).empty)
+
+    def test_body_policies(self):
+        # body is truncated before whitespace normalization
+        df = gharchive_reader.read_hour_file(self._path, REPO_NAMES, EVENT_TYPES, 'truncate', 16)
+        self.assertEqual('Context: Begi', df.body.iloc[0])
+
+        df = gharchive_reader.read_hour_file(self._path, REPO_NAMES, EVENT_TYPES, 'hash')
+        self.assertNotIn('body', df.columns)
+        self.assertEqual(64, len(df.body_sha256.iloc[0]))
+        self.assertEqual(55, df.body_length.iloc[0])
+        self.assertIsNone(df.body_sha256.iloc[2])
+
+    def test_read_events(self):
+        paths = gharchive_reader.get_hour_file_paths(self._dir.name, ['20200301'])
+        chunks = list(gharchive_reader.read_events(paths, REPO_NAMES, EVENT_TYPES, batch_rows=2,
+                                                   max_missing_hours=23))
+        self.assertEqual([3], [len(chunk) for chunk in chunks])
+
+        parallel_chunks = list(gharchive_reader.read_events(paths, REPO_NAMES, EVENT_TYPES, workers=2,
+                                                            max_missing_hours=23))
+        self.assertTrue(chunks[0].equals(parallel_chunks[0]))
+
+    def test_read_events_missing_files(self):
+        paths = gharchive_reader.get_hour_file_paths(self._dir.name, ['20200301'])
+        # 23 of 24 hours are missing
+        with self.assertRaises(RuntimeError):
+            list(gharchive_reader.read_events(paths, REPO_NAMES, EVENT_TYPES, max_missing_hours=22))
+        with self.assertRaises(RuntimeError):
+            list(gharchive_reader.read_events(paths, REPO_NAMES, EVENT_TYPES, workers=2))
+
+        # all files missing fails even within max missing hours
+        paths = gharchive_reader.get_hour_file_paths(self._dir.name, ['20200302'])
+        with self.assertRaises(RuntimeError):
+            list(gharchive_reader.read_events(paths, REPO_NAMES, EVENT_TYPES, max_missing_hours=24))
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+import arrow
+import pandas as pd
+
+import src.utils.event_schema as event_schema
+import src.utils.output_writer as output_writer
+
+
+class OutputWriterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._output_dir = tempfile.TemporaryDirectory()
+        self._df = pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv')
+        for col in ['created_at', 'updated_at', 'closed_at']:
+            self._df[col] = pd.to_datetime(self._df[col])
+
+    def tearDown(self):
+        self._output_dir.cleanup()
+
+    def test_get_output_file_name(self):
+        start_time, end_time = arrow.get('2020-03-01'), arrow.get('2020-03-03')
+        self.assertEqual('gh_data_20200301-20200303.csv', output_writer.get_output_file_name(start_time, end_time))
+        self.assertEqual('gh_data_20200301-20200303.parquet',
+                         output_writer.get_output_file_name(start_time, end_time, 'parquet'))
+        self.assertEqual('gh_data_20200301-20200303.shard-2-of-4.csv.gz',
+                         output_writer.get_output_file_name(start_time, end_time, 'csv.gz', 2, 4))
+        self.assertEqual('gh_data_20200301-20200303.shard-2-of-4.run-a1b2.csv',
+                         output_writer.get_output_file_name(start_time, end_time, 'csv', 2, 4, 'a1b2'))
+
+    def test_write_data_frame_csv_formats(self):
+        for output_format in ['csv', 'csv.gz', 'csv.zst']:
+            path = os.path.join(self._output_dir.name, 'gh_data.' + output_format)
+            # small chunk size to write the data in multiple chunks
+            output_writer.write_data_frame(self._df, path, output_format, chunk_size=2)
+
+            compression = 'zstd' if output_format == 'csv.zst' else 'infer'
+            df = pd.read_csv(path, compression=compression, parse_dates=['created_at', 'updated_at', 'closed_at'])
+            pd.testing.assert_frame_equal(self._df, df)
+
+    def test_write_data_frame_parquet(self):
+        path = os.path.join(self._output_dir.name, 'gh_data.parquet')
+        output_writer.write_data_frame(self._df, path, 'parquet', chunk_size=2)
+
+        df = pd.read_parquet(path)
+        pd.testing.assert_frame_equal(self._df, df)
+        # timestamps are stored typed, not as text
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df.updated_at))
+
+    def test_write_data_frame_parquet_compact_dtypes(self):
+        path = os.path.join(self._output_dir.name, 'gh_data.parquet')
+        output_writer.write_data_frame(event_schema.apply_event_schema(self._df), path, 'parquet', chunk_size=2)
+
+        # categoricals are stored as strings, same as the non compact frame
+        df = pd.read_parquet(path)
+        self.assertEqual(list(self._df.repo_name), list(df.repo_name))
+        self.assertEqual(list(self._df.id), list(df.id))
+
+    def test_write_data_frame_invalid_format(self):
+        with self.assertRaises(ValueError):
+            output_writer.write_data_frame(self._df, os.path.join(self._output_dir.name, 'gh_data.xls'), 'xls')
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+import arrow
+import pandas as pd
+
+import src.utils.partition_cache as partition_cache
+
+
+class PartitionCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._cache_dir.cleanup()
+
+    def test_get_repo_list_hash(self):
+        # hash should not depend on the order of repo names
+        self.assertEqual(partition_cache.get_repo_list_hash(['golang/go', 'apache/thrift']),
+                         partition_cache.get_repo_list_hash(['apache/thrift', 'golang/go']))
+        self.assertNotEqual(partition_cache.get_repo_list_hash(['golang/go']),
+                            partition_cache.get_repo_list_hash(['golang/go', 'apache/thrift']))
+
+    def test_get_partition_path(self):
+        path = partition_cache.get_partition_path('cache', '20200303', ['openshift', 'knative'], 'abc')
+        self.assertEqual(path, os.path.join('cache', 'knative+openshift', 'abc', '20200303.pkl.gz'))
+
+        # partitions collected with other options are kept apart
+        options = {'body_policy': 'full', 'body_max_chars': 4096, 'server_dedup': False}
+        path = partition_cache.get_partition_path('cache', '20200303', ['openshift'], 'abc', options)
+        self.assertEqual(path, partition_cache.get_partition_path('cache', '20200303', ['openshift'], 'abc',
+                                                                  dict(reversed(list(options.items())))))
+        self.assertNotEqual(path, partition_cache.get_partition_path('cache', '20200303', ['openshift'], 'abc',
+                                                                     dict(options, body_policy='hash')))
+
+    def test_get_query_result_path(self):
+        path = partition_cache.get_query_result_path('cache', 'SELECT *\n  FROM t', {'repo_names': ['golang/go']})
+
+        # whitespace differences don't change the key, parameter values do
+        self.assertEqual(path, partition_cache.get_query_result_path('cache', 'SELECT * FROM t',
+                                                                     {'repo_names': ['golang/go']}))
+        self.assertNotEqual(path, partition_cache.get_query_result_path('cache', 'SELECT * FROM t',
+                                                                        {'repo_names': ['apache/thrift']}))
+        self.assertTrue(path.startswith(os.path.join('cache', 'results')))
+
+    def test_save_and_load_partition(self):
+        path = partition_cache.get_partition_path(self._cache_dir.name, '20200303', ['openshift'], 'abc')
+        df = pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv')
+        partition_cache.save_partition(df, path)
+
+        pd.testing.assert_frame_equal(df, partition_cache.load_partition(path))
+
+    def test_is_partition_fresh(self):
+        path = partition_cache.get_partition_path(self._cache_dir.name, '20200303', ['openshift'], 'abc')
+        # missing partition is never fresh
+        self.assertFalse(partition_cache.is_partition_fresh(path, '20200303', 6))
+
+        partition_cache.save_partition(pd.DataFrame(), path)
+        # written long after the day got complete
+        self.assertTrue(partition_cache.is_partition_fresh(path, '20200303', 6))
+
+        # written before the day got complete, e.g. while day was still in progress
+        written_at = arrow.get('20200304', 'YYYYMMDD').shift(hours=2).float_timestamp
+        os.utime(path, (written_at, written_at))
+        self.assertFalse(partition_cache.is_partition_fresh(path, '20200303', 6))
+
+    def test_object_store_partition(self):
+        # any fsspec url works as cache dir, e.g. s3:// for cron job pods without persistent volume
+        path = partition_cache.get_partition_path('memory://partition-cache', '20200303', ['openshift'], 'abc')
+        self.assertFalse(partition_cache.is_partition_fresh(path, '20200303', 6))
+
+        df = pd.read_csv('tests/src/utils/data_assets/sample_gh_issue_data.csv')
+        partition_cache.save_partition(df, path)
+        pd.testing.assert_frame_equal(df, partition_cache.load_partition(path))
+        self.assertTrue(partition_cache.is_partition_fresh(path, '20200303', 6))
+        # written just now, today is not complete yet
+        self.assertFalse(partition_cache.is_partition_fresh(path, arrow.utcnow().format('YYYYMMDD'), 6))
+
+        # query results are cached the same way, so retried pods find them
+        path = partition_cache.get_query_result_path('memory://result-cache', 'SELECT 1', {'repo_names': ['a']})
+        self.assertTrue(path.startswith('memory://result-cache/results/'))
+        partition_cache.save_partition(df, path)
+        pd.testing.assert_frame_equal(df, partition_cache.load_partition(path))
@@ -0,0 +1,63 @@
+import unittest
+
+import pandas as pd
+
+import src.utils.query_planner as query_planner
+
+DAYS = ['202003{d:02d}'.format(d=d) for d in range(1, 11)]
+
+
+def estimate_gb(days):
+    """
+    Fake estimate, 1 GB per day except 20200309 which is 6 GB
+    """
+    return float(sum(6 if day == '20200309' else 1 for day in days))
+
+
+class QueryPlannerTestCase(unittest.TestCase):
+
+    def test_split_days(self):
+        self.assertEqual([DAYS[:7], DAYS[7:]], query_planner.split_days(DAYS, 'week'))
+        self.assertEqual([[day] for day in DAYS], query_planner.split_days(DAYS, 'day'))
+
+    def test_plan_sub_windows_within_budget(self):
+        self.assertEqual([(DAYS, 15.0)], query_planner.plan_sub_windows(DAYS, estimate_gb, 20))
+        # no budget, no split
+        self.assertEqual([(DAYS, 15.0)], query_planner.plan_sub_windows(DAYS, estimate_gb))
+
+    def test_plan_sub_windows_split(self):
+        plan = query_planner.plan_sub_windows(DAYS, estimate_gb, 7)
+
+        # first week fits, second week (8 GB) is split into days
+        self.assertEqual([(DAYS[:7], 7.0), (['20200308'], 1.0), (['20200309'], 6.0), (['20200310'], 1.0)], plan)
+
+        # a day over budget can't be split further
+        plan = query_planner.plan_sub_windows(DAYS, estimate_gb, 2)
+        self.assertEqual(10, len(plan))
+        self.assertIn((['20200309'], 6.0), plan)
+
+    def test_plan_days(self):
+        plan = query_planner.plan_days(DAYS[7:], estimate_gb, 2)
+        self.assertEqual([(['20200308'], 1.0), (['20200309'], 6.0), (['20200310'], 1.0)], plan)
+
+    def test_check_run_budget(self):
+        plan = [(DAYS[:7], 7.0), (DAYS[7:], 7.0)]
+
+        self.assertEqual(28.0, query_planner.check_run_budget(plan, 30, queries_per_window=2))
+        self.assertEqual(28.0, query_planner.check_run_budget(plan, 0, queries_per_window=2))
+        with self.assertRaises(RuntimeError):
+            query_planner.check_run_budget(plan, 20, queries_per_window=2)
+
+    def test_execute_plan(self):
+        plan = [(DAYS[:7], 7.0), (DAYS[7:], 3.0)]
+
+        frames, summary = query_planner.execute_plan(plan, lambda days: pd.DataFrame({'day': days}), max_workers=2)
+
+        self.assertEqual([7, 3], [len(df) for df in frames])
+        self.assertEqual(['20200301-20200307', '20200308-20200310'], [item['days'] for item in summary])
+        self.assertEqual([7, 3], [item['rows'] for item in summary])
+        self.assertEqual([7.0, 3.0], [item['estimated_gb'] for item in summary])
+
+        # estimate covers all queries run per sub window
+        _, summary = query_planner.execute_plan(plan, lambda days: pd.DataFrame({'day': days}), queries_per_window=2)
+        self.assertEqual([14.0, 6.0], [item['estimated_gb'] for item in summary])
@@ -0,0 +1,104 @@
+import json
+import os
+import pstats
+import tempfile
+import tracemalloc
+import unittest
+
+import pandas as pd
+
+from src.utils.run_metrics import RunMetrics
+
+
+class RunMetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_stage(self):
+        metrics = RunMetrics()
+        for rows in [10, 20]:
+            with metrics.stage('dedup', rows_in=rows) as counters:
+                counters['rows_out'] = rows // 2
+        with self.assertRaises(KeyError):
+            with metrics.stage('tag', rows_in=5):
+                raise KeyError('repo_name')
+
+        stages = metrics.to_dict()['stages']
+        self.assertEqual(2, stages['dedup']['calls'])
+        self.assertEqual(30, stages['dedup']['rows_in'])
+        self.assertEqual(15, stages['dedup']['rows_out'])
+        # failed calls are recorded too
+        self.assertEqual(1, stages['tag']['calls'])
+        self.assertGreaterEqual(stages['dedup']['rss_delta_bytes'], 0)
+
+    def test_stage_memory(self):
+        metrics = RunMetrics()
+        with metrics.stage('parse'):
+            held = bytearray(64 * 2 ** 20)
+            held[::4096] = b'x' * len(held[::4096])
+        with metrics.stage('tag'):
+            pass
+
+        stages = metrics.to_dict()['stages']
+        # growth of each stage is its own, not the process wide peak reached by an earlier stage
+        self.assertGreater(stages['parse']['rss_delta_bytes'], 32 * 2 ** 20)
+        self.assertLess(stages['tag']['rss_delta_bytes'], 32 * 2 ** 20)
+        self.assertGreater(len(held), 0)
+
+    def test_timed_chunks(self):
+        metrics = RunMetrics()
+        chunks = [pd.DataFrame({'url': ['a', 'b']}), pd.DataFrame({'url': ['c']})]
+        self.assertEqual(2, len(list(metrics.timed_chunks('fetch', chunks))))
+        fetch = metrics.to_dict()['stages']['fetch']
+        self.assertEqual(3, fetch['rows_out'])
+        self.assertGreater(fetch['frame_bytes'], 0)
+
+    def test_reports(self):
+        metrics = RunMetrics()
+        metrics.add('upload', seconds=1.5, calls=1, bytes_written=2048)
+
+        path = os.path.join(self._dir.name, 'report.json')
+        metrics.write_json(path, success=False)
+        with open(path) as file:
+            report = json.load(file)
+        self.assertFalse(report['success'])
+        self.assertEqual(2048, report['stages']['upload']['bytes_written'])
+
+        path = os.path.join(self._dir.name, 'collector.prom')
+        metrics.write_prometheus_textfile(path)
+        with open(path) as file:
+            text = file.read()
+        self.assertIn('osa_collector_run_success 1\n', text)
+        self.assertIn('osa_collector_stage_seconds{stage="upload"} 1.5\n', text)
+        self.assertIn('osa_collector_stage_bytes_written{stage="upload"} 2048\n', text)
+        self.assertEqual(['collector.prom', 'report.json'], sorted(os.listdir(self._dir.name)))
+
+    def test_profile(self):
+        metrics = RunMetrics(profile_dir=self._dir.name, profile_stages=['dedup', 'fetch'])
+        self.assertFalse(tracemalloc.is_tracing())
+        with metrics.stage('dedup'):
+            self.assertTrue(tracemalloc.is_tracing())
+            sorted(range(1000), reverse=True)
+        with metrics.stage('dedup'):
+            # only first call of stage is traced
+            self.assertFalse(tracemalloc.is_tracing())
+            sorted(range(1000), reverse=True)
+        with metrics.stage('tag'):
+            pass
+        self.assertEqual(3, len(list(metrics.timed_chunks('fetch', [pd.DataFrame({'a': [1]})] * 3))))
+        self.assertFalse(tracemalloc.is_tracing())
+        stages = metrics.to_dict()['stages']
+        self.assertGreater(stages['dedup']['traced_peak_bytes'], 0)
+        self.assertNotIn('traced_peak_bytes', stages['tag'])
+
+        metrics.write_profiles()
+
+        # one profile per stage, aggregating all of its calls
+        self.assertEqual(['dedup.prof', 'dedup.tracemalloc', 'fetch.prof', 'fetch.tracemalloc'],
+                         sorted(os.listdir(self._dir.name)))
+        stats = pstats.Stats(os.path.join(self._dir.name, 'dedup.prof'))
+        self.assertEqual(2, sum(stat[1] for (_, _, func), stat in stats.stats.items() if 'sorted' in func))
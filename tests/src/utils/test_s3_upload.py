@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import boto3
+import pandas as pd
+from botocore.exceptions import ClientError, EndpointConnectionError
+try:
+    from moto import mock_aws
+except ImportError:
+    # moto < 5, as pinned in test-requirements.txt
+    from moto import mock_s3 as mock_aws
+
+import src.utils.s3_upload as s3_upload
+
+BUCKET = 'test-bucket'
+PART_SIZE = s3_upload.MIN_PART_SIZE
+
+
+class S3UploadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self._mock_aws = mock_aws()
+        self._mock_aws.start()
+        self._client = boto3.client('s3', region_name='us-east-1')
+        self._client.create_bucket(Bucket=BUCKET)
+        self._path = os.path.join(self._dir.name, 'gh_data.csv')
+        self._data = os.urandom(2 * PART_SIZE + 1000)
+        with open(self._path, 'wb') as file:
+            file.write(self._data)
+
+    def tearDown(self):
+        self._mock_aws.stop()
+        self._dir.cleanup()
+
+    def _get_object(self, key):
+        return self._client.get_object(Bucket=BUCKET, Key=key)['Body'].read()
+
+    def test_upload_file_in_parts(self):
+        result = s3_upload.upload_file(self._path, 's3://{b}/gh_data/a.csv'.format(b=BUCKET), PART_SIZE,
+                                       concurrency=3, client=self._client)
+
+        self.assertEqual({'url': 's3://test-bucket/gh_data/a.csv', 'bytes': len(self._data), 'parts': 3},
+                         {k: v for k, v in result.items() if k != 'seconds'})
+        self.assertEqual(self._data, self._get_object('gh_data/a.csv'))
+
+        # files up to part size are uploaded in one request
+        with open(self._path, 'wb') as file:
+            file.write(b'url\na\n')
+        self.assertEqual(1, s3_upload.upload_file(self._path, 's3://{b}/b.csv'.format(b=BUCKET),
+                                                  client=self._client)['parts'])
+        self.assertEqual(b'url\na\n', self._get_object('b.csv'))
+
+        with self.assertRaises(ValueError):
+            s3_upload.upload_file(self._path, 's3://{b}/b.csv'.format(b=BUCKET), 1024, client=self._client)
+
+    def test_upload_file_retries_failed_parts(self):
+        upload_part = self._client.upload_part
+        calls = []
+
+        def _fail_once(**kwargs):
+            calls.append(kwargs['PartNumber'])
+            if calls.count(kwargs['PartNumber']) == 1 and kwargs['PartNumber'] == 2:
+                raise ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Reduce your request rate'}}, 'UploadPart')
+            return upload_part(**kwargs)
+
+        with patch.object(self._client, 'upload_part', side_effect=_fail_once):
+            s3_upload.upload_file(self._path, 's3://{b}/a.csv'.format(b=BUCKET), PART_SIZE, max_retries=2,
+                                  backoff_seconds=0.01, client=self._client)
+
+        self.assertEqual([1, 2, 2, 3], sorted(calls))
+        self.assertEqual(self._data, self._get_object('a.csv'))
+
+    def test_upload_file_client_error_not_retried(self):
+        calls = []
+
+        def _deny(**kwargs):
+            calls.append(kwargs['Key'])
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'},
+                               'ResponseMetadata': {'HTTPStatusCode': 403}}, 'PutObject')
+
+        with open(self._path, 'wb') as file:
+            file.write(b'url\na\n')
+        with patch.object(self._client, 'put_object', side_effect=_deny):
+            with self.assertRaises(RuntimeError):
+                s3_upload.upload_file(self._path, 's3://{b}/a.csv'.format(b=BUCKET), max_retries=3,
+                                      backoff_seconds=0.01, client=self._client)
+        self.assertEqual(['a.csv'], calls)
+
+    def test_is_retryable(self):
+        def _client_error(code, status):
+            return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}, 'PutObject')
+
+        self.assertTrue(s3_upload.is_retryable(_client_error('SlowDown', 503)))
+        self.assertTrue(s3_upload.is_retryable(_client_error('Unknown', 500)))
+        self.assertTrue(s3_upload.is_retryable(EndpointConnectionError(endpoint_url='https://s3.amazonaws.com')))
+        self.assertTrue(s3_upload.is_retryable(s3_upload.ChecksumMismatchError('mismatch')))
+        self.assertFalse(s3_upload.is_retryable(_client_error('NoSuchBucket', 404)))
+        self.assertFalse(s3_upload.is_retryable(_client_error('InvalidRequest', 400)))
+        self.assertFalse(s3_upload.is_retryable(FileNotFoundError('part')))
+
+    def test_upload_file_checksum_mismatch(self):
+        upload_part = self._client.upload_part
+
+        def _corrupt(**kwargs):
+            return dict(upload_part(**kwargs), ETag='"0123"') if kwargs['PartNumber'] == 3 else upload_part(**kwargs)
+
+        with patch.object(self._client, 'upload_part', side_effect=_corrupt):
+            with self.assertRaises(RuntimeError):
+                s3_upload.upload_file(self._path, 's3://{b}/a.csv'.format(b=BUCKET), PART_SIZE, max_retries=1,
+                                      backoff_seconds=0.01, client=self._client)
+
+        # failed upload is aborted, nothing is left in the bucket
+        self.assertNotIn('Uploads', self._client.list_multipart_uploads(Bucket=BUCKET))
+        self.assertNotIn('Contents', self._client.list_objects_v2(Bucket=BUCKET))
+
+    def test_upload_file_kms_encrypted(self):
+        put_object = self._client.put_object
+        with open(self._path, 'wb') as file:
+            file.write(b'url\na\n')
+
+        # ETags of SSE-KMS encrypted objects aren't md5 digests
+        def _kms(**kwargs):
+            return dict(put_object(**kwargs), ETag='"0123"', ServerSideEncryption='aws:kms')
+
+        with patch.object(self._client, 'put_object', side_effect=_kms):
+            s3_upload.upload_file(self._path, 's3://{b}/a.csv'.format(b=BUCKET), max_retries=0, client=self._client)
+        self.assertEqual(b'url\na\n', self._get_object('a.csv'))
+
+    def test_upload_data_frame(self):
+        data_frame = pd.DataFrame({'url': ['a', 'b'], 'title': ['t1', 't2']})
+        bytes_uploaded = s3_upload.upload_data_frame(data_frame, 's3://{b}/gh_data.csv.gz'.format(b=BUCKET),
+                                                     'csv.gz', client=self._client)
+
+        with open(os.path.join(self._dir.name, 'gh_data.csv.gz'), 'wb') as file:
+            file.write(self._get_object('gh_data.csv.gz'))
+        self.assertEqual(bytes_uploaded, os.path.getsize(file.name))
+        pd.testing.assert_frame_equal(data_frame, pd.read_csv(file.name))
+
+        with self.assertRaises(RuntimeError):
+            s3_upload.upload_data_frame(data_frame, 's3://missing-bucket/gh_data.csv', max_retries=0,
+                                        client=self._client)
+
+    def test_write_data_frame(self):
+        data_frame = pd.DataFrame({'url': ['a', 'b'], 'title': ['t1', 't2']})
+        # s3 urls are uploaded with upload_data_frame, other paths are written as is
+        with patch('src.utils.s3_upload.upload_file', wraps=s3_upload.upload_file) as mock_upload:
+            s3_upload.write_data_frame(data_frame, 's3://{b}/gh_data.csv'.format(b=BUCKET), part_size=PART_SIZE,
+                                       client=self._client)
+            s3_upload.write_data_frame(data_frame, os.path.join(self._dir.name, 'gh_data.csv'))
+
+        mock_upload.assert_called_once()
+        self.assertEqual(b'url,title\na,t1\nb,t2\n', self._get_object('gh_data.csv'))
+        pd.testing.assert_frame_equal(data_frame, pd.read_csv(os.path.join(self._dir.name, 'gh_data.csv')))
+
+
+if __name__ == '__main__':
+    unittest.main()
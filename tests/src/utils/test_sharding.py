@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+import src.utils.event_processing as event_processing
+import src.utils.output_writer as output_writer
+import src.utils.sharding as sharding
+
+REPO_NAMES = ['org{o}/repo{n}'.format(o=n % 7, n=n) for n in range(200)]
+
+
+class ShardingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_select_shard(self):
+        shards = [sharding.select_shard(REPO_NAMES, i, 4) for i in range(4)]
+        # every repo is in exactly one shard, shards are roughly balanced
+        self.assertEqual(set(REPO_NAMES), set.union(*shards))
+        self.assertEqual(len(REPO_NAMES), sum(len(shard) for shard in shards))
+        self.assertTrue(all(30 < len(shard) < 70 for shard in shards))
+        # same partitioning between runs, regardless of order
+        self.assertEqual(shards[1], sharding.select_shard(reversed(REPO_NAMES), 1, 4))
+        self.assertEqual(set(REPO_NAMES), sharding.select_shard(REPO_NAMES, 0, 1))
+        with self.assertRaises(ValueError):
+            sharding.select_shard(REPO_NAMES, 4, 4)
+
+    def test_merge_shards(self):
+        paths = [os.path.join(self._dir.name, 'gh_data.shard-{i}-of-3.csv'.format(i=i)) for i in range(3)]
+        output_writer.write_data_frame(pd.DataFrame({
+            'url': ['a', 'b'], 'updated_at': ['2020-03-01T10:00:00Z', '2020-03-01T10:00:00Z'], 'title': ['a1', 'b1']}),
+            paths[0])
+        # no events in second shard
+        output_writer.write_data_frame(pd.DataFrame(), paths[1])
+        with self.assertRaises(TimeoutError):
+            sharding.merge_shards(paths, os.path.join(self._dir.name, 'gh_data.csv'), poll_seconds=0)
+
+        output_writer.write_data_frame(pd.DataFrame({
+            'url': ['c', 'a'], 'updated_at': ['2020-03-01T10:00:00Z', '2020-03-02T10:00:00Z'], 'title': ['c1', 'a2']}),
+            paths[2])
+        path = os.path.join(self._dir.name, 'gh_data.csv')
+        self.assertEqual(3, sharding.merge_shards(paths, path))
+
+        df = output_writer.read_data_frame(path)
+        self.assertEqual(['a', 'b', 'c'], df.url.tolist())
+        # last updated record is kept across shards
+        self.assertEqual('a2', df.title.iloc[0])
+
+    def test_merge_shards_same_as_unsharded(self):
+        events = pd.DataFrame({
+            'repo_name': ['org/a', 'org/b', 'org/c', 'org/a', 'org/d'],
+            'event_type': ['IssuesEvent', 'IssuesEvent', 'PullRequestEvent', 'IssuesEvent', 'PullRequestEvent'],
+            'id': ['123', None, '456', '123', '789'],
+            'number': ['1', '2', None, '1', '7'],
+            'url': ['https://github.com/org/a/issues/1', 'https://github.com/org/b/issues/2',
+                    'https://github.com/org/c/pull/3', 'https://github.com/org/a/issues/1',
+                    'https://github.com/org/d/pull/7'],
+            'created_at': ['2020-03-01T10:00:00Z'] * 5,
+            'updated_at': ['2020-03-01T10:00:00Z', '2020-03-01T11:00:00Z', '2020-03-01T12:00:00Z',
+                           '2020-03-02T10:00:00Z', '2020-03-02T11:00:00Z'],
+            'closed_at': [None, None, None, '2020-03-02T10:00:00Z', None],
+            'title': ['a1', 'b1', 'c1', 'a2', 'd1']})
+        unsharded_path = os.path.join(self._dir.name, 'gh_data.csv')
+        output_writer.write_data_frame(event_processing.process_event_shard(events.copy()), unsharded_path)
+
+        paths = [os.path.join(self._dir.name, 'gh_data.shard-{i}-of-2.csv'.format(i=i)) for i in range(2)]
+        for i, path in enumerate(paths):
+            shard = events[[sharding.get_shard_id(name, 2) == i for name in events.repo_name]]
+            output_writer.write_data_frame(event_processing.process_event_shard(shard.copy()), path)
+        merged_path = os.path.join(self._dir.name, 'gh_data.merged.csv')
+        sharding.merge_shards(paths, merged_path)
+
+        with open(unsharded_path) as unsharded, open(merged_path) as merged:
+            self.assertEqual(sorted(unsharded.read().splitlines()), sorted(merged.read().splitlines()))
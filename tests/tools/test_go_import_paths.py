@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'tools'))
+
+from go_import_paths import get_module_roots, resolve_import_path  # noqa: E402
+
+
+class GoImportPathsTestCase(unittest.TestCase):
+
+    def test_resolve_import_path(self):
+        self.assertEqual(resolve_import_path('github.com/foo/bar/pkg/util'),
+                         ('github.com/foo/bar', 'https://github.com/foo/bar'))
+        self.assertEqual(resolve_import_path('golang.org/x/net/http2'),
+                         ('golang.org/x/net', 'https://github.com/golang/net'))
+        self.assertEqual(resolve_import_path('k8s.io/client-go/tools'),
+                         ('k8s.io/client-go', 'https://github.com/kubernetes/client-go'))
+        self.assertEqual(resolve_import_path('google.golang.org/grpc/codes'),
+                         ('google.golang.org/grpc', 'https://github.com/grpc/grpc-go'))
+        self.assertEqual(resolve_import_path('gopkg.in/yaml.v2'),
+                         ('gopkg.in/yaml.v2', 'https://github.com/go-yaml/yaml'))
+        self.assertEqual(resolve_import_path('gopkg.in/src-d/go-git.v4/plumbing'),
+                         ('gopkg.in/src-d/go-git.v4', 'https://github.com/src-d/go-git'))
+        self.assertEqual(resolve_import_path('gitlab.com/foo/bar'), ('gitlab.com/foo/bar', None))
+        self.assertIsNone(resolve_import_path('github.com/foo'))
+        self.assertIsNone(resolve_import_path('go.vanity.io/pkg'))
+
+    def test_get_module_roots(self):
+        roots, unresolved = get_module_roots(['github.com', 'github.com/foo', 'github.com/foo/bar',
+                                              'github.com/foo/bar/util', 'golang.org', 'golang.org/x',
+                                              'golang.org/x/net', 'go.vanity.io', 'go.vanity.io/pkg'])
+        self.assertEqual(roots, {'github.com/foo/bar': 'https://github.com/foo/bar',
+                                 'golang.org/x/net': 'https://github.com/golang/net'})
+        self.assertEqual(unresolved, ['go.vanity.io', 'go.vanity.io/pkg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'tools'))
+
+from go_module_parser import parse_go_mod, parse_gopkg_lock  # noqa: E402
+
+GO_MOD = """module github.com/org/app // app module
+
+go 1.15
+
+require (
+\tgithub.com/foo/bar v1.0.0
+\tgithub.com/old/lib v0.1.0 // indirect
+\tgithub.com/org/app/sub v0.0.0
+)
+
+require k8s.io/api v0.18.2
+
+require (
+\t"github.com/quoted/mod" v1.2.3
+)
+
+replace github.com/old/lib => github.com/new/lib v0.2.0
+
+replace (
+\tgithub.com/org/app/sub => ./sub
+\tgithub.com/foo/bar v1.0.0 => github.com/foo/bar v1.0.1
+)
+
+exclude github.com/excluded/mod v1.0.0
+"""
+
+GOPKG_LOCK = """# This file is autogenerated, do not edit; changes may be undone by the next 'dep ensure'.
+
+
+[[projects]]
+  digest = "1:abc"
+  name = "github.com/foo/bar"
+  packages = ["."]
+  revision = "abc"
+
+[[projects]]
+  name = "golang.org/x/net"  # comment
+  packages = ["http2", "context"]
+
+[solve-meta]
+  analyzer-name = "dep"
+  input-imports = ["github.com/not/a/project"]
+"""
+
+
+class GoModuleParserTestCase(unittest.TestCase):
+
+    def test_parse_go_mod(self):
+        self.assertEqual(parse_go_mod(GO_MOD), ['github.com/foo/bar', 'github.com/new/lib', 'k8s.io/api',
+                                                'github.com/quoted/mod'])
+
+    def test_parse_go_mod_single_require(self):
+        self.assertEqual(parse_go_mod("module m\nrequire github.com/foo/bar v1.0.0\n"), ['github.com/foo/bar'])
+        self.assertEqual(parse_go_mod("module m\n"), [])
+
+    def test_parse_gopkg_lock(self):
+        self.assertEqual(parse_gopkg_lock(GOPKG_LOCK), ['github.com/foo/bar', 'golang.org/x/net'])
+
+
+if __name__ == '__main__':
+    unittest.main()
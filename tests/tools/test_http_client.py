@@ -0,0 +1,168 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'tools'))
+
+from http_cache import HttpCache  # noqa: E402
+from http_client import RateLimitedSession, TokenBucket  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves responses queued per path, records peak no of concurrent requests."""
+
+    responses = {}
+    requests = []
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.active += 1
+            StubHandler.peak = max(StubHandler.peak, StubHandler.active)
+            StubHandler.requests.append((self.path, self.headers.get('If-None-Match')))
+            queue = StubHandler.responses.get(self.path, [])
+            status, headers = queue.pop(0) if len(queue) > 1 else (queue or [(200, {})])[0]
+            if 'ETag' in headers and self.headers.get('If-None-Match') == headers['ETag']:
+                status = 304
+        time.sleep(0.05)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+        with StubHandler.lock:
+            StubHandler.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class RateLimitedSessionTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls._url = 'http://127.0.0.1:{port}'.format(port=cls._server.server_address[1])
+        threading.Thread(target=cls._server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._server.shutdown()
+        cls._server.server_close()
+
+    def setUp(self):
+        StubHandler.responses = {}
+        StubHandler.requests = []
+        StubHandler.active = 0
+        StubHandler.peak = 0
+
+    def test_retry_after(self):
+        StubHandler.responses['/limited'] = [(429, {'Retry-After': '0.2'}), (200, {})]
+        session = RateLimitedSession(default_limit=(2, 100.0))
+        start = time.monotonic()
+        response = session.get(self._url + '/limited')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_retry_gives_up(self):
+        StubHandler.responses['/down'] = [(503, {})]
+        session = RateLimitedSession(default_limit=(2, 100.0), max_retries=2, backoff_factor=0.01)
+        response = session.get(self._url + '/down')
+        self.assertEqual(response.status_code, 503)
+
+    def test_not_found_not_retried(self):
+        StubHandler.responses['/missing'] = [(404, {}), (200, {})]
+        session = RateLimitedSession(default_limit=(2, 100.0))
+        self.assertEqual(session.get(self._url + '/missing').status_code, 404)
+
+    def test_rate_limit_reset(self):
+        reset = str(int(time.time()) + 1)
+        StubHandler.responses['/exhausted'] = [(403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': reset}),
+                                               (200, {})]
+        session = RateLimitedSession(default_limit=(2, 100.0))
+        response = session.get(self._url + '/exhausted')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(time.time(), float(reset) - 0.01)
+
+    def test_per_host_concurrency(self):
+        session = RateLimitedSession(host_limits={'127.0.0.1': (2, 1000.0)})
+        threads = [threading.Thread(target=session.get, args=(self._url + '/item',)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(StubHandler.peak, 2)
+        self.assertGreaterEqual(StubHandler.peak, 1)
+
+    def test_cache_serves_fresh_response(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HttpCache(os.path.join(cache_dir, 'cache.sqlite'), ttl=60)
+            session = RateLimitedSession(default_limit=(2, 100.0), cache=cache)
+            self.assertEqual(session.get(self._url + '/fresh').text, 'ok')
+            response = session.get(self._url + '/fresh')
+            cache.close()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'ok')
+        self.assertEqual(len(StubHandler.requests), 1)
+
+    def test_cache_revalidates_stale_response(self):
+        StubHandler.responses['/stale'] = [(200, {'ETag': '"v1"'})]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = HttpCache(os.path.join(cache_dir, 'cache.sqlite'), ttl=0)
+            session = RateLimitedSession(default_limit=(2, 100.0), cache=cache)
+            session.get(self._url + '/stale')
+            response = session.get(self._url + '/stale')
+            cache.close()
+        # second request is conditional, 304 is answered from the cache
+        self.assertEqual(StubHandler.requests, [('/stale', None), ('/stale', '"v1"')])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 'ok')
+
+    def test_cache_persists_between_sessions(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = os.path.join(cache_dir, 'cache.sqlite')
+            cache = HttpCache(path, host_ttls={'127.0.0.1': 60})
+            RateLimitedSession(cache=cache).get(self._url + '/persisted')
+            cache.close()
+            cache = HttpCache(path, ttl=0, host_ttls={'127.0.0.1': 60})
+            response = RateLimitedSession(cache=cache).get(self._url + '/persisted')
+            cache.close()
+        self.assertEqual(response.text, 'ok')
+        self.assertEqual(len(StubHandler.requests), 1)
+
+
+class TokenBucketTestCase(unittest.TestCase):
+
+    def test_acquire_waits_for_tokens(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(6):
+            bucket.acquire()
+        # 2 tokens upfront, then 4 more at 2 per second
+        self.assertAlmostEqual(now[0], 2.0)
+
+    def test_pause_until(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=10.0, capacity=1, clock=lambda: now[0], sleep=sleep)
+        bucket.pause_until(5.0)
+        bucket.acquire()
+        self.assertAlmostEqual(now[0], 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
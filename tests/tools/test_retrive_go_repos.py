@@ -0,0 +1,244 @@
+import os
+import sys
+import tempfile
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'tools'))
+
+import retrive_go_repos  # noqa: E402
+from retrive_go_repos import GoRepoCrawler  # noqa: E402
+
+GO_MOD = """module github.com/org/app
+
+go 1.13
+
+require (
+\tgithub.com/foo/bar v1.0.0
+\tgithub.com/foo/bar/sub v1.0.0
+\tgithub.com/baz/qux v0.2.0
+)
+
+require go.vanity.io/baz v1.1.0
+"""
+
+PKG_PAGE = 'Repository: <a href="https://github.com/{repo}">https://github.com/{repo}</a>\n'
+
+VALID_REPO = {'archived': False, 'disabled': False, 'language': 'Go', 'updated_at': '2020-05-01T00:00:00Z'}
+
+
+class FakeSession:
+    """Serves canned responses by url, counts requests."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = Counter()
+
+    def get(self, url, **kwargs):
+        self.requests[url] += 1
+        status, body = self.responses.get(url, (404, ''))
+        response = MagicMock(status_code=status, text=body if isinstance(body, str) else '')
+        response.json.return_value = body
+        return response
+
+
+class FailingSession(FakeSession):
+    """Fails requests of given urls, serves others like FakeSession."""
+
+    def __init__(self, responses, failing_urls):
+        super().__init__(responses)
+        self.failing_urls = failing_urls
+
+    def get(self, url, **kwargs):
+        if url in self.failing_urls:
+            self.requests[url] += 1
+            raise ConnectionError('Connection reset')
+        return super().get(url, **kwargs)
+
+
+def get_responses():
+    return {
+        'https://raw.githubusercontent.com/org/app/master/go.mod': (200, GO_MOD),
+        'https://pkg.go.dev/github.com/foo/bar?tab=overview': (200, PKG_PAGE.format(repo='foo/bar')),
+        'https://pkg.go.dev/github.com/foo/bar/sub?tab=overview': (200, PKG_PAGE.format(repo='foo/bar')),
+        'https://pkg.go.dev/github.com/baz/qux?tab=overview': (200, PKG_PAGE.format(repo='baz/qux')),
+        'https://pkg.go.dev/go.vanity.io/baz?tab=overview': (200, PKG_PAGE.format(repo='baz/qux')),
+        'https://api.github.com/repos/foo/bar': (200, VALID_REPO),
+        'https://api.github.com/repos/baz/qux': (200, dict(VALID_REPO, archived=True)),
+    }
+
+
+class GoRepoCrawlerTestCase(unittest.TestCase):
+
+    def test_get_dependancy_data(self):
+        http = FakeSession(get_responses())
+        crawler = GoRepoCrawler(http)
+        crawler.get_dependancy_data('org/app')
+
+        self.assertEqual(crawler.dependancy_urls, {'https://github.com/foo/bar'})
+        self.assertEqual(crawler.crawled_repos, {'org/app'})
+        self.assertEqual(crawler.pkg_repos, {'github.com/foo/bar': ['https://github.com/foo/bar'],
+                                             'github.com/baz/qux': ['https://github.com/baz/qux'],
+                                             'go.vanity.io/baz': ['https://github.com/baz/qux']})
+        self.assertEqual(crawler.repo_validity, {'https://github.com/foo/bar': True,
+                                                 'https://github.com/baz/qux': False})
+        # every dependancy repo is validated once, pkg.go.dev is used only for vanity import path
+        self.assertEqual(http.requests['https://api.github.com/repos/foo/bar'], 1)
+        self.assertEqual(http.requests['https://api.github.com/repos/baz/qux'], 1)
+        self.assertEqual([url for url in http.requests if url.startswith('https://pkg.go.dev')],
+                         ['https://pkg.go.dev/go.vanity.io/baz?tab=overview'])
+
+    def test_pkg_crawled_once(self):
+        http = FakeSession(get_responses())
+        crawler = GoRepoCrawler(http)
+        crawler.get_go_pkg_github_repo_details('github.com/baz/qux')
+        crawler.get_go_pkg_github_repo_details('github.com/baz/qux')
+        self.assertEqual(http.requests['https://pkg.go.dev/github.com/baz/qux?tab=overview'], 1)
+        self.assertEqual(crawler.dependancy_urls, set())
+
+    def test_failed_requests_not_memoized(self):
+        responses = get_responses()
+        pkg_url = 'https://pkg.go.dev/go.vanity.io/baz?tab=overview'
+        http = FailingSession(responses, {pkg_url, 'https://api.github.com/repos/foo/bar'})
+        crawler = GoRepoCrawler(http)
+
+        with self.assertRaises(ConnectionError):
+            crawler.get_go_pkg_github_repo_details('go.vanity.io/baz')
+        with self.assertRaises(RuntimeError):
+            crawler.add_module_root('github.com/foo/bar', 'https://github.com/foo/bar')
+        # rate limited validation isn't recorded either
+        responses['https://api.github.com/repos/baz/qux'] = (403, {})
+        with self.assertRaises(RuntimeError):
+            crawler.add_module_root('github.com/baz/qux', 'https://github.com/baz/qux')
+        self.assertEqual({}, crawler.repo_validity)
+        self.assertEqual({}, crawler.pkg_repos)
+
+        # claims of failed packages are released, so later repos crawl them again
+        http.failing_urls.clear()
+        responses['https://api.github.com/repos/baz/qux'] = (200, VALID_REPO)
+        crawler.get_go_pkg_github_repo_details('go.vanity.io/baz')
+        crawler.add_module_root('github.com/foo/bar', 'https://github.com/foo/bar')
+        self.assertEqual(2, http.requests[pkg_url])
+        self.assertEqual({'https://github.com/foo/bar', 'https://github.com/baz/qux'}, crawler.dependancy_urls)
+        self.assertEqual({'https://github.com/foo/bar': True, 'https://github.com/baz/qux': True},
+                         crawler.repo_validity)
+
+    def test_save_and_load_state(self):
+        crawler = GoRepoCrawler(FakeSession(get_responses()))
+        crawler.repo_urls.add('https://github.com/org/app')
+        crawler.get_dependancy_data('org/app')
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            path = os.path.join(state_dir, 'state.json')
+            crawler.save_state(path)
+            http = FakeSession(get_responses())
+            resumed = GoRepoCrawler(http)
+            resumed.load_state(path)
+
+        self.assertEqual(resumed.to_dict(), crawler.to_dict())
+        # resumed crawl doesn't request already crawled packages again
+        resumed.get_go_pkg_github_repo_details('go.vanity.io/baz')
+        self.assertEqual(sum(http.requests.values()), 0)
+
+    def test_crawl_org_skips_crawled_repos(self):
+        responses = get_responses()
+        repo = dict(VALID_REPO, html_url='https://github.com/org/app', full_name='org/app')
+        responses['https://api.github.com/orgs/org/repos?per_page=100&page=1'] = (200, [repo])
+        responses['https://api.github.com/orgs/org/repos?per_page=100&page=2'] = (200, [])
+        http = FakeSession(responses)
+        crawler = GoRepoCrawler(http)
+        crawler.crawled_repos.add('org/app')
+        done = MagicMock()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            crawler.crawl_orgs(['org'], executor, on_repo_done=done)
+
+        self.assertEqual(crawler.repo_urls, {'https://github.com/org/app'})
+        self.assertEqual(http.requests['https://raw.githubusercontent.com/org/app/master/go.mod'], 0)
+        done.assert_not_called()
+
+    def test_state_removed_after_completed_crawl(self):
+        responses = get_responses()
+        repo = dict(VALID_REPO, html_url='https://github.com/org/app', full_name='org/app')
+        responses['https://api.github.com/orgs/org/repos?per_page=100&page=1'] = (200, [repo])
+        responses['https://api.github.com/orgs/org/repos?per_page=100&page=2'] = (200, [])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_path = os.path.join(tmp_dir, 'state.json')
+            argv = ['retrive_go_repos.py', '-o', 'org', '-r', os.path.join(tmp_dir, 'repo-list.json')]
+
+            def _run(session):
+                with patch.object(retrive_go_repos, 'RateLimitedSession', return_value=session), \
+                        patch.object(retrive_go_repos, 'CRAWL_STATE_PATH', state_path), \
+                        patch.object(retrive_go_repos, 'HTTP_CACHE_PATH', ''), patch.object(sys, 'argv', argv):
+                    retrive_go_repos.main()
+
+            # failed repo keeps the state, so next run resumes the crawl
+            _run(FailingSession(responses, {'https://raw.githubusercontent.com/org/app/master/go.mod'}))
+            self.assertTrue(os.path.isfile(state_path))
+
+            # completed crawl removes it, so next run reads go.mod files again
+            _run(FakeSession(responses))
+            self.assertFalse(os.path.isfile(state_path))
+            http = FakeSession(responses)
+            _run(http)
+            self.assertEqual(1, http.requests['https://raw.githubusercontent.com/org/app/master/go.mod'])
+
+    def test_get_dependancy_data_from_vendor_tree(self):
+        responses = get_responses()
+        del responses['https://raw.githubusercontent.com/org/app/master/go.mod']
+        responses['https://api.github.com/repos/org/app/commits/master'] = (200, {'sha': 'abc'})
+        tree = ['vendor', 'vendor/github.com', 'vendor/github.com/foo', 'vendor/github.com/foo/bar',
+                'vendor/github.com/foo/bar/sub', 'vendor/go.vanity.io', 'vendor/go.vanity.io/baz']
+        responses['https://api.github.com/repos/org/app/git/trees/abc?recursive=1'] = \
+            (200, {'truncated': False, 'tree': [{'path': path, 'type': 'tree'} for path in tree] +
+                   [{'path': 'vendor/modules.txt', 'type': 'blob'}]})
+        http = FakeSession(responses)
+        crawler = GoRepoCrawler(http)
+        crawler.get_dependancy_data('org/app')
+
+        self.assertEqual(crawler.dependancy_urls, {'https://github.com/foo/bar'})
+        self.assertEqual(crawler.pkg_repos, {'github.com/foo/bar': ['https://github.com/foo/bar'],
+                                             'go.vanity.io/baz': ['https://github.com/baz/qux']})
+        # only vanity import path is looked up on pkg.go.dev
+        self.assertEqual([url for url in http.requests if url.startswith('https://pkg.go.dev')],
+                         ['https://pkg.go.dev/go.vanity.io/baz?tab=overview'])
+
+    def test_truncated_vendor_tree_falls_back(self):
+        responses = get_responses()
+        del responses['https://raw.githubusercontent.com/org/app/master/go.mod']
+        responses['https://api.github.com/repos/org/app/commits/master'] = (200, {'sha': 'abc'})
+        responses['https://api.github.com/repos/org/app/git/trees/abc?recursive=1'] = \
+            (200, {'truncated': True, 'tree': []})
+        responses['https://api.github.com/repos/org/app/git/trees/abc'] = \
+            (200, {'tree': [{'path': 'vendor', 'url': 'https://api.github.com/vendor'}]})
+        http = FakeSession(responses)
+        GoRepoCrawler(http).get_dependancy_data('org/app')
+        self.assertEqual(http.requests['https://api.github.com/vendor'], 1)
+
+    def test_get_repo_list(self):
+        responses = get_responses()
+        other_go_mod = "module github.com/other/tool\n\nrequire github.com/foo/bar/v2 v2.0.0\n"
+        responses['https://raw.githubusercontent.com/other/tool/master/go.mod'] = (200, other_go_mod)
+        for org, name in [('org', 'app'), ('other', 'tool')]:
+            repo = dict(VALID_REPO, html_url='https://github.com/{org}/{name}'.format(org=org, name=name),
+                        full_name='{org}/{name}'.format(org=org, name=name))
+            responses['https://api.github.com/orgs/{org}/repos?per_page=100&page=1'.format(org=org)] = (200, [repo])
+            responses['https://api.github.com/orgs/{org}/repos?per_page=100&page=2'.format(org=org)] = (200, [])
+        http = FakeSession(responses)
+        crawler = GoRepoCrawler(http)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            crawler.crawl_orgs(['org', 'other'], executor)
+
+        self.assertEqual(crawler.get_repo_list(['org', 'other']), [
+            {'ecosystem': 'org', 'urls': ['https://github.com/foo/bar', 'https://github.com/org/app']},
+            {'ecosystem': 'other', 'urls': ['https://github.com/foo/bar', 'https://github.com/other/tool']}])
+        # dependancy shared by both organizations is validated once
+        self.assertEqual(http.requests['https://api.github.com/repos/foo/bar'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
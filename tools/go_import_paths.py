@@ -0,0 +1,93 @@
+"""Resolve GO import paths to module roots and github repos offline, using known hosting layouts."""
+
+from typing import Iterable, Optional, Tuple
+
+# Hosts whose module root is host/owner/repo
+REPO_HOSTS = {'github.com', 'gitlab.com', 'bitbucket.org'}
+
+# Import path prefixes mirrored on github as prefix/repo -> github.com/owner/repo
+GITHUB_MIRRORS = {
+    'golang.org/x': 'golang',
+    'k8s.io': 'kubernetes',
+    'sigs.k8s.io': 'kubernetes-sigs',
+    'go.uber.org': 'uber-go',
+    'go.etcd.io': 'etcd-io',
+    'knative.dev': 'knative',
+    'kubevirt.io': 'kubevirt',
+    'istio.io': 'istio',
+    'helm.sh': 'helm',
+}
+
+# Module roots hosted on github under a different name
+GITHUB_REPOS = {
+    'google.golang.org/grpc': 'grpc/grpc-go',
+    'google.golang.org/protobuf': 'protocolbuffers/protobuf-go',
+    'google.golang.org/genproto': 'googleapis/go-genproto',
+    'google.golang.org/api': 'googleapis/google-api-go-client',
+    'google.golang.org/appengine': 'golang/appengine',
+    'cloud.google.com/go': 'googleapis/google-cloud-go',
+    'go.opencensus.io': 'census-instrumentation/opencensus-go',
+    'gotest.tools': 'gotestyourself/gotest.tools',
+}
+
+
+def _get_gopkg_in_repo(parts) -> Optional[Tuple[str, str]]:
+    """Resolve gopkg.in/pkg.vN (github.com/go-pkg/pkg) and gopkg.in/owner/pkg.vN (github.com/owner/pkg)."""
+    if len(parts) >= 2 and '.v' in parts[1]:
+        name = parts[1].rsplit('.v', 1)[0]
+        return '/'.join(parts[:2]), 'go-{name}/{name}'.format(name=name)
+    if len(parts) >= 3 and '.v' in parts[2]:
+        return '/'.join(parts[:3]), '{owner}/{name}'.format(owner=parts[1], name=parts[2].rsplit('.v', 1)[0])
+    return None
+
+
+def resolve_import_path(import_path: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Get (module root, github repo url) of an import path, None when the path can't be resolved offline.
+
+    Github repo url is None for modules hosted outside github (e.g. gitlab.com/owner/repo).
+    """
+    parts = import_path.strip('/').split('/')
+    if parts[0] in REPO_HOSTS:
+        if len(parts) < 3:
+            return None
+        url = 'https://github.com/{owner}/{repo}'.format(owner=parts[1], repo=parts[2]) \
+            if parts[0] == 'github.com' else None
+        return '/'.join(parts[:3]), url
+
+    if parts[0] == 'gopkg.in':
+        resolved = _get_gopkg_in_repo(parts)
+        return (resolved[0], 'https://github.com/' + resolved[1]) if resolved else None
+
+    path = '/'.join(parts)
+    for prefix, repo in GITHUB_REPOS.items():
+        if path == prefix or path.startswith(prefix + '/'):
+            return prefix, 'https://github.com/' + repo
+
+    for prefix, owner in GITHUB_MIRRORS.items():
+        prefix_len = len(prefix.split('/'))
+        if path.startswith(prefix + '/') and len(parts) > prefix_len:
+            name = parts[prefix_len]
+            return '/'.join(parts[:prefix_len + 1]), 'https://github.com/{owner}/{repo}'.format(owner=owner,
+                                                                                             repo=name)
+    return None
+
+
+def get_module_roots(paths: Iterable[str]):
+    """
+    Split directory paths (e.g. of a vendor folder) into resolved {module root: github repo url} and paths that
+    need to be looked up online (vanity import paths).
+
+    Parent directories of resolved module roots (e.g. github.com/owner) are dropped.
+    """
+    paths = [path.strip('/') for path in paths]
+    roots = {}
+    for path in paths:
+        resolved = resolve_import_path(path)
+        if resolved:
+            roots[resolved[0]] = resolved[1]
+
+    parents = {'/'.join(root.split('/')[:i]) for root in roots for i in range(1, len(root.split('/')))}
+    unresolved = [path for path in paths if path not in parents and path.split('/')[0] not in REPO_HOSTS and
+                  resolve_import_path(path) is None]
+    return roots, unresolved
@@ -0,0 +1,84 @@
+"""Parse GO dependancy files (go.mod, Gopkg.lock) into lists of module paths."""
+
+import re
+from typing import List
+
+# Directive with its arguments on the same line, e.g. `require github.com/foo/bar v1.0.0`
+_DIRECTIVE_LINE = re.compile(r'^(module|go|require|replace|exclude|retract)\s+(.*)$')
+
+# Opening line of a directive block, e.g. `require (`
+_DIRECTIVE_BLOCK = re.compile(r'^(module|go|require|replace|exclude|retract)\s*\($')
+
+
+def _strip_comment(line: str) -> str:
+    """Remove `//` comment and surrounding whitespace from go.mod line."""
+    return line.split('//', 1)[0].strip()
+
+
+def _unquote(token: str) -> str:
+    """Remove quotes around go.mod token."""
+    return token.strip('"`')
+
+
+def parse_go_mod_directives(text: str):
+    """Get (directive, arguments) for every directive of go.mod file, block directives yield one per line."""
+    block = None
+    for line in text.splitlines():
+        line = _strip_comment(line)
+        if not line:
+            continue
+        if block:
+            if line == ')':
+                block = None
+            else:
+                yield block, [_unquote(token) for token in line.split()]
+            continue
+
+        match = _DIRECTIVE_BLOCK.match(line)
+        if match:
+            block = match.group(1)
+            continue
+        match = _DIRECTIVE_LINE.match(line)
+        if match:
+            yield match.group(1), [_unquote(token) for token in match.group(2).split()]
+
+
+def parse_go_mod(text: str) -> List[str]:
+    """
+    Get module paths required in go.mod file, in file order without duplicates.
+
+    All `require` directives and blocks are considered. Modules replaced by another module take the replacement's
+    path, modules replaced by a local directory (./ or ../) are part of the repo itself and are left out.
+    """
+    required = []
+    replacements = {}
+    for directive, args in parse_go_mod_directives(text):
+        if directive == 'require' and args:
+            required.append(args[0])
+        elif directive == 'replace' and '=>' in args:
+            arrow = args.index('=>')
+            if arrow > 0 and len(args) > arrow + 1:
+                replacements[args[0]] = args[arrow + 1]
+
+    modules = []
+    for module in required:
+        module = replacements.get(module, module)
+        if not module.startswith('.') and not module.startswith('/') and module not in modules:
+            modules.append(module)
+    return modules
+
+
+def parse_gopkg_lock(text: str) -> List[str]:
+    """Get project names locked in Gopkg.lock file, in file order without duplicates."""
+    projects = []
+    in_project = False
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if line.startswith('['):
+            in_project = line == '[[projects]]'
+        elif in_project and line.startswith('name'):
+            key, _, value = line.partition('=')
+            name = value.strip().strip('"')
+            if key.strip() == 'name' and name and name not in projects:
+                projects.append(name)
+    return projects
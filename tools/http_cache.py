@@ -0,0 +1,80 @@
+"""Persistent HTTP response cache backed by SQLite, supports TTL and conditional revalidation."""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Status codes stored in the cache, a missing go.mod / Gopkg.lock is as stable as an existing one
+CACHEABLE_STATUS_CODES = {200, 404}
+
+
+class HttpCache:
+    """
+    URL keyed response cache.
+
+    Entries younger than the TTL are served without any request. Older entries are revalidated with
+    `If-None-Match`/`If-Modified-Since`, a 304 (which doesn't count against the GitHub rate limit) refreshes them.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 60 * 60, host_ttls: Dict[str, float] = None):
+        """Open (or create) cache database at path, host_ttls overrides ttl (seconds) per host."""
+        self.ttl = ttl
+        self.host_ttls = host_ttls or {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, status INTEGER, "
+                             "headers TEXT, body BLOB, fetched_at REAL)")
+
+    def get_ttl(self, host: str) -> float:
+        """Get TTL of given host."""
+        return self.host_ttls.get(host, self.ttl)
+
+    def get(self, url: str):
+        """Get cached (response, age in seconds) for url, None when url isn't cached."""
+        with self._lock:
+            row = self._db.execute("SELECT status, headers, body, fetched_at FROM responses WHERE url = ?",
+                                   (url,)).fetchone()
+        if row is None:
+            return None
+        status, headers, body, fetched_at = row
+        response = requests.Response()
+        response.url = url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response, time.time() - fetched_at
+
+    def get_validators(self, response: requests.Response) -> Dict[str, str]:
+        """Get conditional request headers for cached response."""
+        headers = {}
+        if 'ETag' in response.headers:
+            headers['If-None-Match'] = response.headers['ETag']
+        if 'Last-Modified' in response.headers:
+            headers['If-Modified-Since'] = response.headers['Last-Modified']
+        return headers
+
+    def put(self, url: str, response: requests.Response) -> None:
+        """Store response for url if its status is cacheable."""
+        if response.status_code not in CACHEABLE_STATUS_CODES:
+            return
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                             (url, response.status_code, json.dumps(dict(response.headers)), response.content,
+                              time.time()))
+
+    def touch(self, url: str) -> None:
+        """Mark cached response of url as revalidated now."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def close(self) -> None:
+        """Close cache database."""
+        with self._lock:
+            self._db.close()
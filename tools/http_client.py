@@ -0,0 +1,166 @@
+"""Rate limit aware HTTP client with per host concurrency limits, used by the Go repo crawler."""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HttpCache
+
+# Status codes retried with backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket allowing `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = 1, clock=time.monotonic, sleep=time.sleep):
+        """Create bucket, starts full."""
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause_until(self, until: float):
+        """Hold back all requests until given clock time, e.g. till rate limit reset."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, until)
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                    self._updated_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class RateLimitedSession:
+    """
+    Pooled HTTP session with per host concurrency limit and token bucket rate limit.
+
+    Retries connection errors and 429/5xx responses with exponential backoff, honoring `Retry-After`. GitHub
+    `X-RateLimit-Remaining`/`X-RateLimit-Reset` headers hold back further requests to that host till the reset.
+    With a cache, fresh responses are served from it and stale ones are revalidated with conditional requests.
+    """
+
+    def __init__(self, host_limits: Dict[str, Tuple[int, float]] = None, default_limit: Tuple[int, float] = (4, 5.0),
+                 headers: Dict[str, str] = None, max_retries: int = 5, backoff_factor: float = 1.0,
+                 max_wait: float = 900, sleep=time.sleep, cache: HttpCache = None):
+        """Create session, host_limits maps host name to (max concurrent requests, requests per second)."""
+        self.cache = cache
+        self.host_limits = host_limits or {}
+        self.default_limit = default_limit
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_wait = max_wait
+        self._sleep = sleep
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+        pool_size = max([default_limit[0]] + [limit[0] for limit in self.host_limits.values()])
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.host_limits), 1) + 1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(headers or {})
+
+    def _get_host(self, url: str) -> Tuple[threading.Semaphore, TokenBucket]:
+        """Get concurrency semaphore and token bucket of url's host."""
+        host = urlparse(url).hostname
+        with self._hosts_lock:
+            if host not in self._hosts:
+                concurrency, rate = self.host_limits.get(host, self.default_limit)
+                self._hosts[host] = (threading.BoundedSemaphore(concurrency),
+                                     TokenBucket(rate, capacity=concurrency, sleep=self._sleep))
+            return self._hosts[host]
+
+    def _get_retry_wait(self, response: requests.Response, attempt: int):
+        """Get seconds to wait before retrying, None when response shouldn't be retried."""
+        retry_after = response.headers.get('Retry-After')
+        if response.status_code in RETRY_STATUS_CODES or (retry_after and response.status_code == 403):
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            return self.backoff_factor * (2 ** attempt) + random.uniform(0, self.backoff_factor)
+
+        if response.status_code == 403 and response.headers.get('X-RateLimit-Remaining') == '0':
+            return max(0.0, float(response.headers.get('X-RateLimit-Reset', time.time())) - time.time())
+        return None
+
+    def _hold_host_on_rate_limit(self, bucket: TokenBucket, response: requests.Response):
+        """Pause host when GitHub reports rate limit got exhausted, even for successful responses."""
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            wait = float(response.headers.get('X-RateLimit-Reset', time.time())) - time.time()
+            if wait > 0:
+                logging.warning("Rate limit exhausted for {url}, waiting {s:.0f} seconds"
+                                .format(url=response.url, s=wait))
+                bucket.pause_until(time.monotonic() + min(wait, self.max_wait))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Get url from cache when fresh, else send (conditional) GET request and cache the response."""
+        if self.cache is None:
+            return self._send(url, **kwargs)
+
+        cached = self.cache.get(url)
+        if cached is not None:
+            cached_response, age = cached
+            if age < self.cache.get_ttl(urlparse(url).hostname):
+                return cached_response
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **self.cache.get_validators(cached_response))
+
+        response = self._send(url, **kwargs)
+        if cached is not None and response.status_code == 304:
+            self.cache.touch(url)
+            return cached_response
+        self.cache.put(url, response)
+        return response
+
+    def _send(self, url: str, **kwargs) -> requests.Response:
+        """Send GET request within host limits, retrying failures; returns last response."""
+        semaphore, bucket = self._get_host(url)
+        kwargs.setdefault('timeout', 30)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                with semaphore:
+                    response = self.session.get(url, **kwargs)
+            except requests.exceptions.ConnectionError as ex:
+                if attempt == self.max_retries:
+                    raise
+                wait = self.backoff_factor * (2 ** attempt)
+                logging.warning("Error while requesting {url}, retrying in {s:.1f} seconds. msg: {msg}"
+                                .format(url=url, s=wait, msg=str(ex)))
+                self._sleep(wait)
+                continue
+
+            wait = self._get_retry_wait(response, attempt)
+            if wait is None or attempt == self.max_retries:
+                self._hold_host_on_rate_limit(bucket, response)
+                return response
+
+            wait = min(wait, self.max_wait)
+            logging.warning("Got {status} for {url}, retrying in {s:.1f} seconds"
+                            .format(status=response.status_code, url=url, s=wait))
+            bucket.pause_until(time.monotonic() + wait)
+        return response
@@ -1,22 +1,38 @@
 """Get list of repo urls for a given organization with 1st level dependancy for GO language."""
 
+import argparse
 import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from urllib.request import urlopen, URLError
 
-import requests
 from bs4 import BeautifulSoup
 from dateutil.parser import isoparse
 import time
 
+from go_import_paths import get_module_roots, resolve_import_path
+from go_module_parser import parse_go_mod, parse_gopkg_lock
+from http_cache import HttpCache
+from http_client import RateLimitedSession
+
 """
 Configure below variables, which are used in get repo with dependancy details for GO.
 --------------------------------------------------------------------------------------------
 GITHUB_ACCESS_TOKEN: Github token to query github api
 REPO_UPDATED_WITHIN_N_DAYS: if None set then will retrive all repos
                             else will get only repos those updated in given N days
-ORGANIZATION: organition name (Ex openshift/knative/kubevirt)
+ORGANIZATION: organition name (Ex openshift/knative/kubevirt), can be overridden with --organizations
+MAX_WORKERS: no of repos crawled in parallel
+HOST_LIMITS: (max concurrent requests, requests per second) per host, pkg.go.dev throttles so keep it low
+HTTP_CACHE_PATH: sqlite file caching responses between runs, empty string disables cache
+HTTP_CACHE_TTL: seconds a cached response is used as is, older responses are revalidated (ETag/Last-Modified)
+RECURSIVE_TREE: fetch repo tree in one recursive call and resolve vendored packages offline from known hosting
+                layouts, pkg.go.dev is used only for vanity import paths. False walks the vendor folder level by level
+CRAWL_STATE_PATH: json file crawler state is saved to after every repo, an interrupted (or partly failed) crawl
+                  resumes from it. It is removed once a crawl completes without failed repos, so the next run
+                  crawls afresh. Remove the file to start a fresh crawl, empty string disables it
 
 Note: We are filtering out disabled and archived repos.
 """
@@ -26,16 +42,21 @@ ORGANIZATION = "kubevirt"
 LANGUAGE = "GO"
 ARCHIEVED = False
 DISABLED = False
+MAX_WORKERS = 8
+HOST_LIMITS = {
+    'api.github.com': (8, 10.0),
+    'raw.githubusercontent.com': (8, 20.0),
+    'pkg.go.dev': (2, 1.0),
+}
+HTTP_CACHE_PATH = ".http_cache.sqlite"
+HTTP_CACHE_TTL = 24 * 60 * 60
+RECURSIVE_TREE = True
+CRAWL_STATE_PATH = "crawl_state.json"
 
 # set logging level to INFO
 logging.getLogger().setLevel(logging.INFO)
 
 
-pkg_list = []
-repo_urls = []
-dependancy_urls = []
-
-
 def get_raw_urls():
     """Get different raw urls used in entire logic as dictionary."""
     return {
@@ -58,33 +79,9 @@ def check_repo_updated_date(date: str) -> bool:
     return updated_date > date_n_days_ago
 
 
-def get_go_pkg_data(pkg: str):
-    """Get go package info."""
-    raw_url = get_raw_urls().get('pkg_overview_url')
-    url = raw_url.format(pkg=pkg)
-    return requests.get(url)
-
-
-def get_dependancy_repo_url_from_text(text: str):
-    """Get Dependancy repo url from text retrived from package details."""
-    lines = list(filter(lambda x: ('Repository: <a href="https://github.com/' in x), text.split('\n')))
-    for line in lines:
-        soup = BeautifulSoup(line, features="html.parser")
-        github_url = soup.find('a').contents[0]
-        if "github.com/" in github_url and \
-                github_url not in dependancy_urls and \
-                is_valid_repo(get_repo_details(github_url.split("github.com/")[1])):
-            dependancy_urls.append(github_url)
-
-
-def get_go_pkg_github_repo_details(pkg: str):
-    """Get Go package and repo details."""
-    if pkg not in pkg_list:
-        pkg_list.append(pkg)
-
-        data = get_go_pkg_data(pkg)
-        if 'Repository: <a href="https://github.com/' in data.text:
-            get_dependancy_repo_url_from_text(data.text)
+def get_github_headers():
+    """Get headers used for github api requests."""
+    return {'Authorization': 'Bearer {token}'.format(token=GITHUB_ACCESS_TOKEN)}
 
 
 def is_valid_repo(item) -> bool:
@@ -101,210 +98,506 @@ def is_valid_repo(item) -> bool:
     return False
 
 
-def get_repo_details(org_repo: str):
-    """Get github repo details."""
-    url =  get_raw_urls().get('repo_details_url').format(org_repo=org_repo)
-    try:
-        result = requests.get(url, headers={'Authorization': 'Bearer {token}'.format(token=GITHUB_ACCESS_TOKEN)})
-        if result.status_code == 200:
-            return result.json()
-        else:
-            logging.error("Repo doesn't exist : {repo}".format(repo=org_repo))
-    except Exception as ex:
-        logging.error("Error while retriving repo details : {repo}, msg: {msg}".format(repo=org_repo, msg=str(ex)))
+def get_dependancy_repo_urls_from_text(text: str):
+    """Get Dependancy repo urls from text retrived from package details."""
+    lines = list(filter(lambda x: ('Repository: <a href="https://github.com/' in x), text.split('\n')))
+    urls = []
+    for line in lines:
+        soup = BeautifulSoup(line, features="html.parser")
+        github_url = soup.find('a').contents[0]
+        if "github.com/" in github_url:
+            urls.append(str(github_url))
+    return urls
 
-    return None
 
+class GoRepoCrawler:
+    """
+    Crawl GO repos along with their 1st level dependancies.
 
-def remove_unwanted_chars(line) -> str:
-    """Remove unwanted characters from string."""
-    return str(line).replace("\\t", "").replace("\\n'", "").replace("b'", "").strip()
+    Crawl state is kept in set/dict based indexes, so dedup of packages and urls is constant time. Packages are
+    memoized with the dependancy repo urls they map to and repos with their validity, so every package and
+    dependancy repo is looked up once. State can be saved to and loaded from a json file to resume a crawl.
+    """
 
+    def __init__(self, http: RateLimitedSession, recursive_tree: bool = True):
+        """Create crawler with empty state, all requests are sent through given session."""
+        self.http = http
+        self.recursive_tree = recursive_tree
+        self.repo_urls = set()
+        self.dependancy_urls = set()
+        self.crawled_repos = set()
+        self.org_repos = {}
+        self.repo_pkgs = {}
+        self.pkg_repos = {}
+        self.repo_validity = {}
+        self._pending_pkgs = set()
+        self._current = threading.local()
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        """Get serializable crawl state, packages still being crawled are left out."""
+        with self._lock:
+            return {
+                'repo_urls': sorted(self.repo_urls),
+                'dependancy_urls': sorted(self.dependancy_urls),
+                'crawled_repos': sorted(self.crawled_repos),
+                'org_repos': {org: dict(repos) for org, repos in self.org_repos.items()},
+                'repo_pkgs': {repo: sorted(pkgs) for repo, pkgs in self.repo_pkgs.items()},
+                'pkg_repos': dict(self.pkg_repos),
+                'repo_validity': dict(self.repo_validity),
+            }
+
+    def save_state(self, path: str):
+        """Save crawl state into json file, it is written to temp file first to avoid partial writes."""
+        tmp_path = "{path}.tmp".format(path=path)
+        with open(tmp_path, "w") as outfile:
+            json.dump(self.to_dict(), outfile)
+        os.replace(tmp_path, path)
+
+    def load_state(self, path: str):
+        """Load crawl state saved by save_state."""
+        with open(path) as infile:
+            state = json.load(infile)
+        with self._lock:
+            self.repo_urls = set(state['repo_urls'])
+            self.dependancy_urls = set(state['dependancy_urls'])
+            self.crawled_repos = set(state['crawled_repos'])
+            self.org_repos = state.get('org_repos', {})
+            self.repo_pkgs = {repo: set(pkgs) for repo, pkgs in state.get('repo_pkgs', {}).items()}
+            self.pkg_repos = state['pkg_repos']
+            self.repo_validity = state['repo_validity']
+        logging.info("Resuming crawl, {repos} repos and {pkgs} packages already crawled"
+                     .format(repos=len(self.crawled_repos), pkgs=len(self.pkg_repos)))
+
+    def claim_pkg(self, pkg: str) -> bool:
+        """Mark package as being crawled, returns False when it was already seen."""
+        with self._lock:
+            org_repo = getattr(self._current, 'org_repo', None)
+            if org_repo:
+                self.repo_pkgs.setdefault(org_repo, set()).add(pkg)
+            if pkg in self.pkg_repos or pkg in self._pending_pkgs:
+                return False
+            self._pending_pkgs.add(pkg)
+            return True
+
+    def resolve_pkg(self, pkg: str, urls):
+        """Record dependancy repo urls of crawled package."""
+        with self._lock:
+            self._pending_pkgs.discard(pkg)
+            self.pkg_repos[pkg] = urls
+
+    def release_pkg(self, pkg: str):
+        """Release claim of package which couldn't be crawled, so it is crawled again by later repos."""
+        with self._lock:
+            self._pending_pkgs.discard(pkg)
+
+    def crawl_pkg(self, pkg: str, get_urls):
+        """Crawl package once: claim it, get its dependancy repo urls with get_urls and record them. Claim is
+        released when get_urls fails."""
+        if not self.claim_pkg(pkg):
+            return
+        try:
+            urls = get_urls()
+        except Exception:
+            self.release_pkg(pkg)
+            raise
+        self.resolve_pkg(pkg, urls)
+
+    def get_go_pkg_data(self, pkg: str):
+        """Get go package info."""
+        raw_url = get_raw_urls().get('pkg_overview_url')
+        url = raw_url.format(pkg=pkg)
+        return self.http.get(url)
+
+    def is_valid_dependancy(self, github_url: str) -> bool:
+        """Validate dependancy repo, every repo is validated once. Raises RuntimeError when repo details couldn't be
+        retrived, validity isn't recorded then, so the package claim is released and the repo is validated again by
+        later repos (or a resumed crawl)."""
+        with self._lock:
+            if github_url in self.repo_validity:
+                return self.repo_validity[github_url]
+        details, failed = self.request_repo_details(github_url.split("github.com/")[1])
+        if failed:
+            raise RuntimeError("Could not validate dependancy repo {url}".format(url=github_url))
+        valid = is_valid_repo(details)
+        with self._lock:
+            self.repo_validity[github_url] = valid
+        return valid
+
+    def add_dependancy_repos(self, text: str):
+        """Add valid dependancy repos found in package details, returns all github repo urls found."""
+        urls = get_dependancy_repo_urls_from_text(text)
+        self.add_dependancy_repo_urls(urls)
+        return urls
+
+    def add_dependancy_repo_urls(self, urls):
+        """Add valid dependancy repos among given github repo urls."""
+        for github_url in urls:
+            if github_url not in self.dependancy_urls and self.is_valid_dependancy(github_url):
+                with self._lock:
+                    self.dependancy_urls.add(github_url)
+
+    def get_pkg_repo_urls(self, pkg: str):
+        """Get dependancy repo urls of package from pkg.go.dev, adding valid ones."""
+        data = self.get_go_pkg_data(pkg)
+        if 'Repository: <a href="https://github.com/' in data.text:
+            return self.add_dependancy_repos(data.text)
+        return []
 
-def get_dependancy_data_from_go_mod_file(org_repo: str):
-    """Get Dependancy repo details from go.mod file."""
-    content_raw_url =  get_raw_urls().get('go_mod_file_url').format(org_repo=org_repo)
-    dependancy_section_started = False
-    dependancy_section_ended = False
+    def get_go_pkg_github_repo_details(self, pkg: str):
+        """Get Go package and repo details."""
+        self.crawl_pkg(pkg, lambda: self.get_pkg_repo_urls(pkg))
 
-    for line in urlopen(content_raw_url):
-        str_line = remove_unwanted_chars(line)
-        if dependancy_section_started is False and "require" in str_line:
-            dependancy_section_started = True
+    def request_repo_details(self, org_repo: str):
+        """Get github repo details along with whether the request failed. Missing repo (404) is not a failure,
+        its details are None."""
+        url = get_raw_urls().get('repo_details_url').format(org_repo=org_repo)
+        try:
+            result = self.http.get(url, headers=get_github_headers())
+            if result.status_code == 200:
+                return result.json(), False
+            if result.status_code == 404:
+                logging.error("Repo doesn't exist : {repo}".format(repo=org_repo))
+                return None, False
+            logging.error("Error while retriving repo details : {repo}, status: {status}"
+                          .format(repo=org_repo, status=result.status_code))
+        except Exception as ex:
+            logging.error("Error while retriving repo details : {repo}, msg: {msg}"
+                          .format(repo=org_repo, msg=str(ex)))
+
+        return None, True
+
+    def get_raw_file_text(self, url: str):
+        """Get content of a raw file, None when file doesn't exist."""
+        result = self.http.get(url)
+        if result.status_code != 200:
+            return None
+        return result.text
+
+    def add_module_root(self, root: str, github_url: str):
+        """Add github repo of module root resolved offline, github_url is None for modules hosted elsewhere."""
+        def _get_urls():
+            urls = [github_url] if github_url else []
+            self.add_dependancy_repo_urls(urls)
+            return urls
+
+        self.crawl_pkg(root, _get_urls)
+
+    def get_go_module_github_repo_details(self, module: str):
+        """Get github repo of GO module, resolved offline from known hosting layouts, else looked up on pkg.go.dev."""
+        resolved = resolve_import_path(module)
+        if resolved:
+            self.add_module_root(*resolved)
+        else:
+            self.get_go_pkg_github_repo_details(module)
 
-        if ")" in str_line:
-            dependancy_section_ended = True
+    def get_dependancy_data_from_go_mod_file(self, org_repo: str) -> bool:
+        """Get Dependancy repo details from go.mod file, returns False when there is no go.mod file."""
+        content_raw_url = get_raw_urls().get('go_mod_file_url').format(org_repo=org_repo)
+        text = self.get_raw_file_text(content_raw_url)
+        if text is None:
+            return False
 
-        if dependancy_section_ended and dependancy_section_started:
-            break
+        for module in parse_go_mod(text):
+            self.get_go_module_github_repo_details(module)
+        return True
 
-        splited_text = str_line.split(" ")
-        if len(splited_text) > 1:
-            pkg = splited_text[0].strip()
-            get_go_pkg_github_repo_details(pkg)
+    def get_dependancy_data_from_lock_file(self, org_repo: str) -> bool:
+        """Get Dependancy repo details from Gopkg.lock file, returns False when there is no Gopkg.lock file."""
+        content_raw_url = get_raw_urls().get('gopkg_lock_file_url').format(org_repo=org_repo)
+        text = self.get_raw_file_text(content_raw_url)
+        if text is None:
+            return False
 
+        for module in parse_gopkg_lock(text):
+            self.get_go_module_github_repo_details(module)
+        return True
 
-def get_dependancy_data_from_lock_file(org_repo: str):
-    """Get Dependancy repo details from Gopkg.lock file."""
-    content_raw_url = get_raw_urls().get('gopkg_lock_file_url').format(org_repo=org_repo)
-    for line in urlopen(content_raw_url):
-        str_line = remove_unwanted_chars(line)
-        if str_line.startswith('name = '):
-            splited_text = str_line.split("=")
-            if len(splited_text) > 1:
-                pkg = splited_text[1].strip().replace('"', '')
-                get_go_pkg_github_repo_details(pkg)
+    def get_dependancy_data_from_vendor_folder(self, org_repo: str):
+        """Get Dependancy repo details from vendor folder."""
+        sha = self.get_commit_sha(org_repo)
+        if self.recursive_tree and self.get_dependancy_data_from_vendor_tree(org_repo, sha):
+            return
 
+        vendor_folder_git_url = self.get_vendor_folder_git_tree_url(org_repo, sha)
+        if vendor_folder_git_url:
+            self.get_dependancy_repo_from_vendor(vendor_folder_git_url, 0, "")
+        else:
+            logging.error("Unble to find dependancy file (go.mod/Gopkg.lock) or Vendor folder for '{org_repo}'"
+                          .format(org_repo=org_repo))
 
-def get_dependancy_data_from_vendor_folder(org_repo: str):
-    """Get Dependancy repo details from vendor folder."""
-    sha = get_commit_sha(org_repo)
-    vendor_folder_git_url = get_vendor_folder_git_tree_url(org_repo, sha)
-    if vendor_folder_git_url:
-        get_dependancy_repo_from_vendor(vendor_folder_git_url, 0, "")
-    else:
-        logging.error("Unble to find dependancy file (go.mod/Gopkg.lock) or Vendor folder for '{org_repo}'"
-                      .format(org_repo=org_repo))
+    def get_dependancy_data(self, org_repo: str):
+        """
+        Get Dependancy repo details.
 
+        After anlysing few repos, we came up with below logic to get dependant github repos for a repo.
 
-def get_dependancy_data(org_repo: str):
-    """
-    Get Dependancy repo details.
+        if go.mod file present in the repo:
+            then we are taking dependant go modules mentioned in require directives (after replace directives).
+        else if Gopkg.lock file present in the repo:
+            then we are taking all the dependant projects mentioned into that file.
+        else if If Vendor folder present inside repo:
+            then we are taking dependency packages based on sub-folder structure.
 
-    After anlysing few repos, we came up with below logic to get dependant github repos for a repo.
+        Modules are resolved to github repos offline when their hosting layout is known (see go_import_paths.py),
+        else pkg.go.dev package page is scraped.
 
-    if go.mod file present in the repo:
-        then we are taking dependant go packages mentioned into require space.
-    else if Gopkg.lock file present in the repo:
-        then we are taking all the dependant packages mentioned into that file.
-    else if If Vendor folder present inside repo:
-        then we are taking dependency packages based on sub-folder structure.
-
-    Note:  Tried to use asyncio for parallel execution but we are facing issue with pkg.go.dev url,
-    as its limitting no of request,  so removed that code.
-    """
-    try:
-        get_dependancy_data_from_go_mod_file(org_repo)
-    except URLError:
+        Note: Repos are crawled in parallel, pkg.go.dev limits no of requests so every host has its own
+        concurrency and rate limit (see HOST_LIMITS).
+        """
+        self._current.org_repo = org_repo
         try:
-            get_dependancy_data_from_lock_file(org_repo)
-        except URLError:
-            get_dependancy_data_from_vendor_folder(org_repo)
-
-
-def get_commit_sha(org_repo: str):
-    """Get commit sha for a github repo."""
-    commit_raw_url = get_raw_urls().get('repo_commit_url')
-    url = commit_raw_url.format(org_repo=org_repo)
-    try:
-        result = requests.get(url, headers={'Authorization': 'Bearer {token}'.format(token=GITHUB_ACCESS_TOKEN)})
-        if result.status_code == 200:
-            return result.json()['sha']
-        else:
-            logging.error("repo doesn't exist : " + org_repo)
-    except Exception as ex:
-        logging.error("Error while retriving commit details for repo : {repo}, msg : {msg}"
-                      .format(repo=org_repo, msg=str(ex)))
-    return None
+            if not self.get_dependancy_data_from_go_mod_file(org_repo) and \
+                    not self.get_dependancy_data_from_lock_file(org_repo):
+                self.get_dependancy_data_from_vendor_folder(org_repo)
+        finally:
+            self._current.org_repo = None
+        with self._lock:
+            self.crawled_repos.add(org_repo)
+
+    def get_commit_sha(self, org_repo: str):
+        """Get commit sha for a github repo."""
+        commit_raw_url = get_raw_urls().get('repo_commit_url')
+        url = commit_raw_url.format(org_repo=org_repo)
+        try:
+            result = self.http.get(url, headers=get_github_headers())
+            if result.status_code == 200:
+                return result.json()['sha']
+            else:
+                logging.error("repo doesn't exist : " + org_repo)
+        except Exception as ex:
+            logging.error("Error while retriving commit details for repo : {repo}, msg : {msg}"
+                          .format(repo=org_repo, msg=str(ex)))
+        return None
+
+    def get_vendor_folder_git_tree_url(self, org_repo: str, sha: str):
+        """Get vendor folder git tree url."""
+        repo_structure_raw_url = get_raw_urls().get('repo_structure_url')
+        url = repo_structure_raw_url.format(org_repo=org_repo, sha=sha)
 
+        try:
+            result = self.http.get(url, headers=get_github_headers())
+            if result.status_code == 200:
+                vendor_folder_info = list(filter(lambda x: (x['path'] == "vendor"), result.json()['tree']))
+                if len(vendor_folder_info) > 0:
+                    return vendor_folder_info[0]['url']
+            else:
+                logging.error("repo doesn't exist : " + org_repo)
+        except Exception as ex:
+            logging.error("Error while retriving repo structure details {repo}, msg: {msg}"
+                          .format(repo=org_repo, msg=str(ex)))
+
+        return None
+
+    def get_dependancy_data_from_vendor_tree(self, org_repo: str, sha: str) -> bool:
+        """
+        Get Dependancy repo details from vendor folder of the recursive repo tree, fetched in a single request.
+
+        Module roots are derived offline from known hosting layouts, only vanity import paths are looked up on
+        pkg.go.dev. Returns False when tree couldn't be used (no vendor folder, truncated tree), so caller falls back
+        to walking the vendor folder.
+        """
+        url = get_raw_urls().get('repo_structure_url').format(org_repo=org_repo, sha=sha) + '?recursive=1'
+        try:
+            result = self.http.get(url, headers=get_github_headers())
+        except Exception as ex:
+            logging.error("Error while retriving repo tree {repo}, msg: {msg}".format(repo=org_repo, msg=str(ex)))
+            return False
 
-def get_vendor_folder_git_tree_url(org_repo: str, sha: str):
-    """Get vendor folder git tree url."""
-    repo_structure_raw_url = get_raw_urls().get('repo_structure_url')
-    url = repo_structure_raw_url.format(org_repo=org_repo, sha=sha)
+        if result.status_code != 200:
+            return False
+        json_data = result.json()
+        if json_data.get('truncated'):
+            logging.warning("Repo tree of '{repo}' is truncated, walking vendor folder".format(repo=org_repo))
+            return False
+
+        paths = [item['path'][len('vendor/'):] for item in json_data.get('tree', [])
+                 if item['type'] == 'tree' and item['path'].startswith('vendor/')]
+        if not paths:
+            return False
+
+        roots, unresolved = get_module_roots(paths)
+        for root, github_url in roots.items():
+            self.add_module_root(root, github_url)
+        self.get_dependancy_repo_from_vanity_paths(unresolved)
+        return True
 
-    try:
-        result = requests.get(url, headers={'Authorization': 'Bearer {token}'.format(token=GITHUB_ACCESS_TOKEN)})
+    def get_dependancy_repo_from_vanity_paths(self, paths):
+        """Look up vanity import paths (host/x, else host/x/y) on pkg.go.dev, same as walking the vendor folder."""
+        def _get_urls(pkg):
+            data = self.get_go_pkg_data(pkg)
+            if 'Repository: <a href="https://github.com/' in data.text:
+                return self.add_dependancy_repos(data.text)
+            if '404 Not Found' in data.text:
+                sub_paths = [path for path in paths if path.startswith(pkg + '/')]
+                for sub_pkg in sorted({'/'.join(path.split('/')[:3]) for path in sub_paths}):
+                    self.get_go_pkg_github_repo_details(sub_pkg)
+            return []
+
+        for pkg in sorted({'/'.join(path.split('/')[:2]) for path in paths if len(path.split('/')) >= 2}):
+            self.crawl_pkg(pkg, lambda: _get_urls(pkg))
+
+    def get_dependancy_repo_from_vendor(self, git_tree_url: str, level: int, path: str):
+        """Get dependancy repo list from vendor folder."""
+        result = self.http.get(git_tree_url, headers=get_github_headers())
         if result.status_code == 200:
-            vendor_folder_info = list(filter(lambda x: (x['path'] == "vendor"), result.json()['tree']))
-            if len(vendor_folder_info) > 0:
-                return vendor_folder_info[0]['url']
-        else:
-            logging.error("repo doesn't exist : " + org_repo)
-    except Exception as ex:
-        logging.error("Error while retriving repo structure details {repo}, msg: {msg}"
-                      .format(repo=org_repo, msg=str(ex)))
-
-    return None
-
-
-def get_dependancy_repo_from_vendor(git_tree_url: str, level: int, path: str):
-    """Get dependancy repo list from vendor folder."""
-    result = requests.get(git_tree_url, headers={'Authorization': 'Bearer {token}'.format(token=GITHUB_ACCESS_TOKEN)})
-    if result.status_code == 200:
-        json_data = result.json()
-        if 'tree' in json_data:
-            if level == 0:
-                for item in result.json()['tree']:
-                    get_dependancy_repo_from_vendor(item['url'], 1, item['path'])
-            elif level == 1 or level == 2:
-                for item in json_data['tree']:
-                    pkg = path + "/" + item['path']
-                    if pkg not in pkg_list:
-                        pkg_list.append(pkg)
-
-                        data = get_go_pkg_data(pkg)
+            json_data = result.json()
+            if 'tree' in json_data:
+                if level == 0:
+                    for item in json_data['tree']:
+                        self.get_dependancy_repo_from_vendor(item['url'], 1, item['path'])
+                elif level == 1 or level == 2:
+                    def _get_urls(pkg, item):
+                        data = self.get_go_pkg_data(pkg)
                         if 'Repository: <a href="https://github.com/' in data.text:
-                            get_dependancy_repo_url_from_text(data.text)
-                        elif '404 Not Found' in data.text and level == 1:
-                            get_dependancy_repo_from_vendor(item['url'], 2, pkg)
-
-
-def save_data_into_file():
-    """Save data into different json files."""
-    distinct_repo_urls = sorted(set(repo_urls))
-    distinct_dependancy_urls =  sorted(set(dependancy_urls))
-
-    # Serializing json and writing to a file
-    json_object = json.dumps(distinct_repo_urls, indent=4)
-    with open("repo_urls.json", "w") as outfile:
-        outfile.write(json_object)
-
-    # Serializing json and writing to a file
-    json_object = json.dumps(distinct_dependancy_urls, indent=4)
-    with open("dependancy_urls.json", "w") as outfile:
-        outfile.write(json_object)
-
-    # combine repo_urls and dependancy_urls
-    combined_list = distinct_repo_urls + distinct_dependancy_urls
-    combined_list = sorted(set(combined_list))
-
-    # Serializing json and writing to a file
-    json_object = json.dumps(combined_list, indent=4)
-    with open("combined_list.json", "w") as outfile:
-        outfile.write(json_object)
-
-    logging.info("No of '{ecosystem}' repos : {count}".format(ecosystem=ORGANIZATION, count=len(repo_urls)))
-    logging.info("No of 1st level dependancies : {count}".format(count=len(dependancy_urls)))
-    logging.info("No of combined dependancies : {count}".format(count=len(combined_list)))
+                            return self.add_dependancy_repos(data.text)
+                        if '404 Not Found' in data.text and level == 1:
+                            self.get_dependancy_repo_from_vendor(item['url'], 2, pkg)
+                        return []
+
+                    for item in json_data['tree']:
+                        pkg = path + "/" + item['path']
+                        self.crawl_pkg(pkg, lambda: _get_urls(pkg, item))
+
+    def submit_org(self, org: str, executor: ThreadPoolExecutor):
+        """Submit all valid repos of organization for crawling, repos crawled already (e.g. by a resumed crawl) are
+        skipped. Returns futures of submitted repos."""
+        page_no = 1
+        do_next_call = True
+        futures = []
+        while do_next_call:
+
+            raw_url = get_raw_urls().get('org_repo_url')
+            url = raw_url.format(org=org, page_no=page_no)
+            data = self.http.get(url, headers=get_github_headers())
+            logging.info("Github url: {url}, No of records : {count}".format(url=url, count=len(data.json())))
+            for item in data.json():
+                if is_valid_repo(item):
+                    with self._lock:
+                        self.repo_urls.add(item['html_url'])
+                        self.org_repos.setdefault(org, {})[item['full_name']] = item['html_url']
+                    if item['full_name'] not in self.crawled_repos:
+                        futures.append(executor.submit(self.get_dependancy_data, item['full_name']))
+
+            page_no = page_no + 1
+            if len(data.json()) == 0:
+                do_next_call = False
+        return futures
+
+    def crawl_orgs(self, orgs, executor: ThreadPoolExecutor, on_repo_done=None) -> int:
+        """Crawl all valid repos of organizations, dependancies shared by organizations are crawled once. Returns
+        no of repos which failed, those are not marked as crawled."""
+        futures = []
+        for org in orgs:
+            futures.extend(self.submit_org(org, executor))
+
+        failed = 0
+        for future in futures:
+            try:
+                future.result()
+            except Exception as ex:
+                failed += 1
+                logging.error("Error while retriving dependancies, msg: {msg}".format(msg=str(ex)))
+            if on_repo_done:
+                on_repo_done()
+        return failed
+
+    def get_org_dependancy_urls(self, org: str):
+        """Get valid dependancy repo urls of organization's repos."""
+        urls = set()
+        for org_repo in self.org_repos.get(org, {}):
+            for pkg in self.repo_pkgs.get(org_repo, ()):
+                urls.update(url for url in self.pkg_repos.get(pkg) or [] if self.repo_validity.get(url))
+        return urls
+
+    def get_repo_list(self, orgs):
+        """Get repos along with their dependancies per organization, in repo-list.json format."""
+        return [{'ecosystem': org,
+                 'urls': sorted(set(self.org_repos.get(org, {}).values()) | self.get_org_dependancy_urls(org))}
+                for org in orgs]
+
+    def save_repo_list(self, orgs, path: str):
+        """Save repos along with their dependancies per organization into repo-list.json file."""
+        repo_list = self.get_repo_list(orgs)
+        with open(path, "w") as outfile:
+            outfile.write(json.dumps(repo_list, indent=2))
+            outfile.write("\n")
+        for item in repo_list:
+            logging.info("No of '{ecosystem}' repos with dependancies : {count}"
+                         .format(ecosystem=item['ecosystem'], count=len(item['urls'])))
+
+    def save_data_into_file(self, orgs):
+        """Save data into different json files."""
+        distinct_repo_urls = sorted(self.repo_urls)
+        distinct_dependancy_urls = sorted(self.dependancy_urls)
+
+        # Serializing json and writing to a file
+        json_object = json.dumps(distinct_repo_urls, indent=4)
+        with open("repo_urls.json", "w") as outfile:
+            outfile.write(json_object)
+
+        # Serializing json and writing to a file
+        json_object = json.dumps(distinct_dependancy_urls, indent=4)
+        with open("dependancy_urls.json", "w") as outfile:
+            outfile.write(json_object)
+
+        # combine repo_urls and dependancy_urls
+        combined_list = sorted(self.repo_urls | self.dependancy_urls)
+
+        # Serializing json and writing to a file
+        json_object = json.dumps(combined_list, indent=4)
+        with open("combined_list.json", "w") as outfile:
+            outfile.write(json_object)
+
+        logging.info("No of '{ecosystem}' repos : {count}".format(ecosystem=", ".join(orgs),
+                                                                  count=len(self.repo_urls)))
+        logging.info("No of 1st level dependancies : {count}".format(count=len(self.dependancy_urls)))
+        logging.info("No of combined dependancies : {count}".format(count=len(combined_list)))
 
 
 def main():
     """Start of the logic."""
-    page_no = 1
-    do_next_call = True
+    parser = argparse.ArgumentParser(description="Get list of GO repo urls for organizations with 1st level "
+                                                 "dependancies")
+    parser.add_argument('-o', '--organizations', metavar='ORG', type=str, nargs='+', default=[ORGANIZATION],
+                        help='Organizations to crawl in one run, dependancies shared by them are crawled once')
+    parser.add_argument('-r', '--repo-list', type=str, default='',
+                        help='Write repos with dependancies per organization into given file in repo-list.json '
+                             'format (e.g. ../src/utils/data_assets/repo-list.json) instead of the json lists')
+    args = parser.parse_args()
+
+    http = RateLimitedSession(host_limits=HOST_LIMITS,
+                              cache=HttpCache(HTTP_CACHE_PATH, ttl=HTTP_CACHE_TTL) if HTTP_CACHE_PATH else None)
+    crawler = GoRepoCrawler(http, recursive_tree=RECURSIVE_TREE)
+    if CRAWL_STATE_PATH and os.path.isfile(CRAWL_STATE_PATH):
+        crawler.load_state(CRAWL_STATE_PATH)
+
+    def save_state():
+        if CRAWL_STATE_PATH:
+            crawler.save_state(CRAWL_STATE_PATH)
 
     start_time = time.time()
 
-    while do_next_call:
-
-        raw_url = get_raw_urls().get('org_repo_url')
-        url = raw_url.format(org=ORGANIZATION, page_no=page_no)
-        data = requests.get(url, headers={'Authorization': 'Bearer {token}'.format(token=GITHUB_ACCESS_TOKEN)})
-        logging.info("Github url: {url}, No of records : {count}".format(url=url, count=len(data.json())))
-        for item in data.json():
-            if is_valid_repo(item):
-                repo_urls.append(item['html_url'])
-                get_dependancy_data(item['full_name'])
-
-        page_no = page_no + 1
-        if len(data.json()) == 0:
-            do_next_call = False
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            failed = crawler.crawl_orgs(args.organizations, executor, on_repo_done=save_state)
+    finally:
+        save_state()
 
     logging.info("Total time taken to retrive dependancies {min:.2f} minutes"
-                 .format(min=(time.time() - start_time / 60)))
+                 .format(min=(time.time() - start_time) / 60))
 
-    save_data_into_file()
+    if args.repo_list:
+        crawler.save_repo_list(args.organizations, args.repo_list)
+    else:
+        crawler.save_data_into_file(args.organizations)
+
+    # a completed crawl isn't resumed, next run reads changed dependancy files again
+    if failed:
+        logging.warning("{n} repos failed, next run resumes the crawl from {path}"
+                        .format(n=failed, path=CRAWL_STATE_PATH))
+    elif CRAWL_STATE_PATH and os.path.isfile(CRAWL_STATE_PATH):
+        os.remove(CRAWL_STATE_PATH)
     logging.info("Process completed successfully")
 
 